@@ -0,0 +1,151 @@
+"""
+单写者并发压力测试与吞吐对比
+
+- actor_stress: 多个客户端同时上报同一组设备（含并发的首次上报，即并发追加新设备）+ 切换状态，
+  结束后校验没有丢失更新、没有重复设备、切换次数与请求数一致，不满足即抛出 AssertionError
+- actor_vs_legacy: 同样负载下，单写者路由与旧版（线程池 + 列表扫描）路由的吞吐对比；
+  legacy_preempt 在旧版查找与写入之间切换线程，用来确认校验能发现竞争（该行的 lost / duplicate 应大于 0）
+
+同一套校验也在 tests/test_actor.py 中自动运行。
+"""
+
+import asyncio
+import re
+import time
+
+from bench.common import latency_summary, make_record, scenario
+
+
+def _body(device_id: str, seq: int) -> dict:
+    return {
+        "device_id": device_id,
+        "device_name": device_id,
+        "is_active": "Using",
+        "timestamp": time.time(),
+        "battery_percent": seq % 101,
+        "active_app": {"name": "app", "title": f"seq-{seq}"},
+    }
+
+
+async def _drive(target, path: str, workers: int, devices: int, reports_per_worker: int, prefix: str = "shared"):
+    """所有 worker 共用同一组设备: 第 i 轮大家同时上报同一个设备（前 devices 轮都是首次上报，并发追加新设备）
+
+    -> (耗时, 延迟, {设备: [(seq, 发出时间, 收到响应时间)]})
+    """
+    sessions = [await target.session() for _ in range(workers)]
+    ids = [f"{prefix}-{n}" for n in range(devices)]
+    history = {}
+    latencies = []
+
+    async def worker(w, sess):
+        for i in range(reports_per_worker):
+            device_id = ids[i % devices]
+            seq = i * workers + w
+            t0 = time.perf_counter()
+            r = await sess.request("POST", path, _body(device_id, seq))
+            t1 = time.perf_counter()
+            latencies.append(t1 - t0)
+            assert r.status == 200, r.body
+            history.setdefault(device_id, []).append((seq, t0, t1))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w, s) for w, s in enumerate(sessions)))
+    elapsed = time.perf_counter() - start
+    for s in sessions:
+        await s.close()
+    return elapsed, latencies, history
+
+
+def _check(devices, history):
+    """-> (丢失的更新, 重复的设备)
+
+    同一设备的并发上报没有唯一正确的先后，按寄存器的线性一致性判断: 最终值必须来自某次上报 W，
+    且不存在在 W 收到响应之后才发出的另一次上报（否则 W 已被覆盖，却又"复活"，即更新丢失）。
+    设备缺失也计为丢失。
+    """
+    seen = {}
+    duplicates = 0
+    for dev in devices:
+        if dev["id"] not in history:
+            continue
+        if dev["id"] in seen:
+            duplicates += 1
+        seen[dev["id"]] = dev
+    lost = 0
+    for device_id, writes in history.items():
+        dev = seen.get(device_id)
+        if dev is None:
+            lost += 1
+            continue
+        last_sent = max(sent for _, sent, _ in writes)
+        allowed = {f"seq-{seq}" for seq, _, acked in writes if acked >= last_sent}
+        if (dev.get("active_app") or {}).get("title") not in allowed:
+            lost += 1
+    return lost, duplicates
+
+
+@scenario("actor_stress")
+async def bench_actor_stress(target, reporter, quick):
+    workers = 32
+    devices = 64
+    reports = 100 if quick else 300
+    toggles = 100 if quick else 500
+    control = await target.session()
+
+    async def toggler():
+        sess = await target.session()
+        for i in range(toggles):
+            r = await sess.request("GET", f"/api/status/set?status={i % 2}&secret={target.secret}")
+            assert r.status == 200 and r.json()["success"], r.body
+        await sess.close()
+
+    drive = _drive(target, f"/api/device/report/?secret={target.secret}", workers, devices, reports)
+    (elapsed, latencies, history), _ = await asyncio.gather(drive, toggler())
+
+    r = await control.request("GET", f"/api/status/query?secret={target.secret}")
+    lost, duplicates = _check(r.json()["device"], history)
+    metrics_text = (await control.request("GET", "/metrics")).body.decode()
+    switches = int(re.search(r"^sleepy_status_switches (\d+)", metrics_text, re.M).group(1))
+    await control.close()
+
+    reporter.emit(make_record(
+        "actor_stress", target.transport,
+        {"workers": workers, "devices": devices, "reports_per_worker": reports, "toggles": toggles},
+        {
+            "requests_per_sec": round(workers * reports / elapsed, 1),
+            "lost_updates": lost,
+            "duplicate_devices": duplicates,
+            "status_switches": switches,
+            **latency_summary(latencies),
+        },
+    ))
+    assert lost == 0 and duplicates == 0, f"lost={lost} duplicates={duplicates}"
+    assert switches == toggles, f"switches={switches} expected={toggles}"
+
+
+@scenario("actor_vs_legacy")
+async def bench_actor_vs_legacy(target, reporter, quick):
+    workers = 32
+    devices = 64
+    reports = 100 if quick else 300
+    routes = {
+        "actor": (f"/api/device/report/?secret={target.secret}", f"/api/status/query?secret={target.secret}"),
+        "legacy": (f"/__bench/legacy_report?secret={target.secret}", "/__bench/legacy_devices"),
+        "legacy_preempt": (f"/__bench/legacy_report?preempt=1&secret={target.secret}", "/__bench/legacy_devices"),
+    }
+    control = await target.session()
+    for name, (path, listing) in routes.items():
+        elapsed, latencies, history = await _drive(target, path, workers, devices, reports, prefix=name)
+        r = await control.request("GET", listing)
+        lost, duplicates = _check(r.json()["device"], history)
+        reporter.emit(make_record(
+            "actor_vs_legacy", target.transport,
+            {"impl": name, "workers": workers, "devices": devices, "reports_per_worker": reports},
+            {
+                "requests_per_sec": round(workers * reports / elapsed, 1),
+                "lost_updates": lost,
+                "duplicate_devices": duplicates,
+                **latency_summary(latencies),
+            },
+        ))
+    await control.close()
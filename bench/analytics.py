@@ -0,0 +1,114 @@
+"""
+应用使用时长统计基准
+
+- analytics:
+  - ingest: 写入者每次应用上报时 AppAnalytics.observe() 的开销（同一应用延长区间 / 切换应用结束区间），
+    以及开启统计时 /api/device/report 的吞吐
+  - query: 导入 retention_days 天的历史（每天 devices 台设备 × apps 个应用）后，
+    /api/analytics/apps 与 /api/analytics/heatmap 在不同范围下的延迟；耗时只与范围内的天数有关
+  同时校验导入后的总时长与查询结果一致
+"""
+
+import asyncio
+import datetime
+import time
+
+from bench.common import latency_summary, make_record, scenario
+from bench.hot_paths import report_body
+
+
+def _observe_cost(settings, reports: int, switch_every: int) -> float:
+    """每次 observe 的平均耗时（秒）；每 switch_every 次上报切换一次应用"""
+    from analytics import AppAnalytics
+    from records import DeviceRecord
+
+    analytics = AppAnalytics(settings)
+    now = time.time() - reports
+    records = [
+        DeviceRecord(id=f"dev-{n % 100}", name="X", last_seen=now + n, active_code=1,
+                     app_name=f"app-{(n // switch_every) % 20}")
+        for n in range(reports)
+    ]
+    start = time.perf_counter()
+    for record in records:
+        analytics.observe(record)
+    return (time.perf_counter() - start) / reports
+
+
+@scenario("analytics", transports=("asgi",))
+async def bench_analytics(target, reporter, quick):
+    import main
+
+    settings = main.config.analytics
+    data = main.data_store
+    reports = 20000 if quick else 200000
+    devices = 50 if quick else 200
+    apps = 20
+    rounds = 50 if quick else 200
+    auth = {"X-Secret": target.secret}
+
+    # ---- ingest ----
+    extend = _observe_cost(settings, reports, switch_every=reports)
+    switch = _observe_cost(settings, reports, switch_every=1)
+    sessions = [await target.session() for _ in range(16)]
+    path = f"/api/device/report/?secret={target.secret}"
+    count = 2000 if quick else 10000
+
+    async def worker(offset, sess):
+        for i in range(offset, count, len(sessions)):
+            r = await sess.request("POST", path, report_body(f"analytics-{i % 100}", i))
+            assert r.status == 200, r.body
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i, s) for i, s in enumerate(sessions)))
+    elapsed = time.perf_counter() - start
+    for s in sessions:
+        await s.close()
+    reporter.emit(make_record(
+        "analytics", target.transport, {"case": "ingest", "reports": reports},
+        {
+            "observe_extend_ns": round(extend * 1e9, 1),
+            "observe_switch_ns": round(switch * 1e9, 1),
+            "http_reports_per_sec": round(count / elapsed, 1),
+        },
+    ))
+
+    # ---- query: 导入完整保留期的历史 ----
+    await data.clear_devices()
+    data.analytics.discard_all(time.time())
+    today = datetime.date.fromtimestamp(time.time())
+    days = settings.retention_days
+    per_device = sum(60.0 * (a + 1) for a in range(apps))
+    for back in range(days):
+        item = {
+            "type": "analytics",
+            "day": (today - datetime.timedelta(days=back)).isoformat(),
+            "apps": {f"dev-{d}": {f"app-{a}": 60.0 * (a + 1) for a in range(apps)} for d in range(devices)},
+            "hours": {f"dev-{d}": [10.0] * 24 for d in range(devices)},
+        }
+        await data.import_analytics(item)
+
+    sess = await target.session()
+    for label, value in (("today", "today"), ("7d", "7d"), ("full", f"{days}d")):
+        for endpoint in ("apps", "heatmap"):
+            samples = []
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                r = await sess.request("GET", f"/api/analytics/{endpoint}?range={value}", headers=auth)
+                samples.append(time.perf_counter() - t0)
+                assert r.status == 200, r.body
+            if endpoint == "apps":
+                # 单台设备的总时长 = 每天的时长 × 天数（ingest 阶段的设备不影响）
+                r = await sess.request("GET", f"/api/analytics/apps?range={value}&device=dev-0", headers=auth)
+                body = r.json()
+                span = (datetime.date.fromisoformat(body["range"]["to"])
+                        - datetime.date.fromisoformat(body["range"]["from"])).days + 1
+                assert abs(body["total"] - per_device * span) < 1, (body["total"], per_device * span)
+            reporter.emit(make_record(
+                "analytics", target.transport,
+                {"case": "query", "endpoint": endpoint, "range": label, "devices": devices, "apps": apps},
+                latency_summary(samples),
+            ))
+    r = await sess.request("GET", "/api/analytics/apps?range=bogus", headers=auth)
+    assert r.status == 400, r.status
+    await sess.close()
@@ -0,0 +1,103 @@
+"""
+基准测试用的应用入口
+
+在 server/main.py 的 app 上额外挂几个探针路由:
+- /__bench/open, /__bench/auth: 单独度量鉴权依赖的开销
+- /__bench/legacy_report: 旧版上报实现（线程池 + 列表扫描），用于和单写者对比；?preempt=1 时在查找与写入之间切换线程
+- /__bench/sort_on_read: 每次请求现场排序的设备列表，用于和维护好的有序索引对比
+
+uvicorn 子进程通过 "bench.app_factory:app" 加载，进程内模式调用 build_app()。
+"""
+
+import time
+from typing import List
+
+from fastapi import Security
+from fastapi.responses import Response
+
+from bench.common import setup_path
+
+_PROBES_INSTALLED = False
+
+# 旧版实现直接修改的共享列表
+legacy_devices: List = []
+
+
+def _install_probes(app):
+    global _PROBES_INSTALLED
+    if _PROBES_INSTALLED:
+        return
+    from models.api import DeviceInfo
+    from models.device_status import DeviceStatus
+    from utils import verify_secret
+
+    @app.get("/__bench/open")
+    async def bench_open():
+        return {"success": True}
+
+    @app.get("/__bench/auth")
+    async def bench_auth(_: bool = Security(verify_secret)):
+        return {"success": True}
+
+    @app.post("/__bench/legacy_report")
+    def bench_legacy_report(status: DeviceStatus, preempt: bool = False, _: bool = Security(verify_secret)):
+        # 与单写者改造前的 report_device_status 完全相同。
+        # CPython 只在循环回跳 / 函数调用处切换线程，原实现从查找结束到写入之间恰好没有切换点，
+        # 所以在有 GIL 的构建上测不出竞争；preempt=1 时在这里让出 GIL，模拟无 GIL 构建或中间有 I/O 时的线程切换
+        dev_entry = DeviceInfo(
+            id=status.device_id,
+            name=status.device_name,
+            last_seen=time.time(),
+            battery_percent=status.battery_percent,
+            battery_status=status.battery_status,
+            active_app=status.active_app.model_dump() if status.active_app else None,
+        )
+        for i, dev in enumerate(legacy_devices):
+            if dev.id == status.device_id:
+                if preempt:
+                    time.sleep(0)
+                legacy_devices[i] = dev_entry
+                break
+        else:
+            if preempt:
+                time.sleep(0)
+            legacy_devices.append(dev_entry)
+        return {"success": True}
+
+    @app.get("/__bench/sort_on_read")
+    async def bench_sort_on_read(sort: str):
+        # 与 ?sort= 相同的输出，但每次请求都在快照上重新排序
+        import main
+        from encoding import assemble_list
+        from store import SORT_KEYS
+
+        key = SORT_KEYS[sort]
+        view = main.data_store.current.devices
+        keyed = sorted(key(view.record(s), s) for s, _ in view.encoded_from(0))
+        frags = [f for f in (view.encoded(k[-1])[1] for k in keyed) if f is not None]
+        return Response(content=b'{"device":' + assemble_list(frags) + b"}", media_type="application/json")
+
+    @app.get("/__bench/legacy_devices")
+    async def bench_legacy_devices():
+        return {"device": [d.model_dump() for d in legacy_devices]}
+
+    _PROBES_INSTALLED = True
+
+
+def build_app():
+    """返回 main.app，并把全局数据重置为全新状态"""
+    setup_path()
+    import main
+    from data import Data
+
+    # 每次运行从空状态开始，也不写状态文件
+    main.config = main.config.model_copy(update={
+        "main": main.config.main.model_copy(update={"state_file": None}),
+    })
+    main.data_store = Data(main.config)
+    legacy_devices.clear()
+    _install_probes(main.app)
+    return main.app
+
+
+app = build_app()
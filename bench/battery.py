@@ -0,0 +1,134 @@
+"""
+电量遥测基准
+
+- battery:
+  - ingest: 写入者每次上报 BatteryTracker.observe() 的开销（电量不变 / 变化），以及 /api/device/report 的吞吐
+  - accuracy: 模拟放电（负载在 10%/小时 ~ 40%/小时之间分段变化，每 10 秒上报一次整数电量），
+    记录每次上报时预测的耗尽时间与实际耗尽时间的误差分布（最后一小时内 / 全程）
+  - events: 经 HTTP 上报一台设备从 25% 放电到 0%，检查 battery_low 事件
+    （20 / 10 / 5% 与预计剩余时间）按顺序送达监听者，且 /api/status/query 中带有 battery_estimate
+"""
+
+import asyncio
+import random
+import time
+
+from bench.common import make_record, percentiles, scenario
+from bench.hot_paths import report_body
+
+
+def _observe_cost(settings, reports: int, change_every: int) -> float:
+    from battery import BatteryTracker
+
+    tracker = BatteryTracker(settings)
+    now = time.time()
+    start = time.perf_counter()
+    for n in range(reports):
+        tracker.observe(f"dev-{n % 100}", now + n, 100 - (n // change_every) % 100, "False")
+    return (time.perf_counter() - start) / reports
+
+
+def _discharge(seed: int = 3):
+    """-> [(时间, 整数电量)]，负载每 20 分钟随机变化"""
+    rng = random.Random(seed)
+    level, ts, out = 100.0, 0.0, []
+    rate = 0.0
+    while level > 0:
+        if ts % 1200 == 0:
+            rate = rng.uniform(10, 40) / 3600
+        out.append((ts, int(level)))
+        level -= rate * 10
+        ts += 10
+    return out, ts
+
+
+@scenario("battery", transports=("asgi",))
+async def bench_battery(target, reporter, quick):
+    import main
+    from battery import BatteryTracker
+
+    settings = main.config.battery
+    data = main.data_store
+    reports = 20000 if quick else 200000
+
+    # ---- ingest ----
+    steady = _observe_cost(settings, reports, change_every=reports)
+    changing = _observe_cost(settings, reports, change_every=1)
+    sessions = [await target.session() for _ in range(16)]
+    path = f"/api/device/report/?secret={target.secret}"
+    count = 2000 if quick else 10000
+
+    async def worker(offset, sess):
+        for i in range(offset, count, len(sessions)):
+            r = await sess.request("POST", path, report_body(f"battery-{i % 100}", i))
+            assert r.status == 200, r.body
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i, s) for i, s in enumerate(sessions)))
+    elapsed = time.perf_counter() - start
+    for s in sessions:
+        await s.close()
+    reporter.emit(make_record(
+        "battery", target.transport, {"case": "ingest", "reports": reports},
+        {
+            "observe_steady_ns": round(steady * 1e9, 1),
+            "observe_change_ns": round(changing * 1e9, 1),
+            "http_reports_per_sec": round(count / elapsed, 1),
+        },
+    ))
+
+    # ---- accuracy ----
+    points, empty_at = _discharge()
+    tracker = BatteryTracker(settings)
+    errors, last_hour = [], []
+    for ts, percent in points:
+        estimate, _ = tracker.observe("phone", ts, percent, "False")
+        left = estimate["time_to_empty"] if estimate else None
+        if left is None:
+            continue
+        error = abs(ts + left - empty_at) / 60
+        errors.append(error)
+        if empty_at - ts <= 3600:
+            last_hour.append(error)
+    reporter.emit(make_record(
+        "battery", target.transport, {"case": "accuracy", "hours": round(empty_at / 3600, 1)},
+        {
+            **{f"error_{k}_min": round(v, 1) for k, v in percentiles(errors).items()},
+            **{f"last_hour_error_{k}_min": round(v, 1) for k, v in percentiles(last_hour).items()},
+            "predictions": len(errors),
+        },
+    ))
+
+    # ---- events ----
+    received = []
+
+    async def listener(payload):
+        if payload["event"] == "battery_low" and payload.get("devices") == ["battery-events"]:
+            received.append(payload["battery"])
+
+    data.add_listener(listener)
+    sess = await target.session()
+    try:
+        # 服务端按收到上报的时间估计速率: 每 20ms 掉 1%，预计剩余时间很快低于 warn_minutes
+        t0 = time.perf_counter()
+        for n in range(26):
+            body = report_body("battery-events", 0)
+            body["battery_percent"] = 25 - n
+            r = await sess.request("POST", path, body)
+            assert r.status == 200, r.body
+            await asyncio.sleep(0.02)
+        elapsed = time.perf_counter() - t0
+        await asyncio.sleep(0.05)
+        r = await sess.request("GET", "/api/status/query?fields=id,battery_estimate", headers={"X-Secret": target.secret})
+        estimate = next(d["battery_estimate"] for d in r.json()["device"] if d["id"] == "battery-events")
+    finally:
+        data.remove_listener(listener)
+        await sess.close()
+    crossed = [(e["reason"], e["threshold"]) for e in received]
+    assert [c for c in crossed if c[0] == "percent"] == [("percent", 20), ("percent", 10), ("percent", 5)], crossed
+    assert ("time_to_empty", int(settings.warn_minutes)) in crossed, crossed
+    assert estimate is not None and estimate["state"] == "discharging" and estimate["rate"] < 0, estimate
+    reporter.emit(make_record(
+        "battery", target.transport, {"case": "events"},
+        {"events": len(received), "reports": 26, "elapsed_ms": round(elapsed * 1000, 1)},
+    ))
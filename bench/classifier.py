@@ -0,0 +1,196 @@
+"""
+窗口标题分类基准
+
+- classifier:
+  - rules: rules 条规则（exact / prefix / keyword 各约三分之一，另有 regex 条正则）的编译耗时，
+    以及每次上报的分类开销: 未缓存（每个标题都不同）/ 已缓存（同一窗口反复上报），
+    并与逐条比较全部规则的做法对比；结果与逐条比较逐一校验
+  - ingest: 配置了规则时 /api/device/report/ 的吞吐（与不配置对比），并检查 skip / not_using / relabel
+    经 /api/status/query 的效果
+"""
+
+import asyncio
+import random
+import re
+import time
+from urllib.parse import quote
+
+from bench.common import make_record, scenario
+from bench.hot_paths import report_body
+
+WORDS = (
+    "project", "report", "music", "video", "meeting", "notes", "settings", "browser", "terminal", "editor",
+    "mail", "chat", "game", "photo", "design", "server", "backup", "player", "reader", "viewer",
+)
+ACTIONS = ("skip", "not_using", "relabel")
+
+
+def _rules(count: int, regexes: int, seed: int = 5):
+    from config.schema import ClassifierRule
+
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        match = ("exact", "prefix", "keyword")[i % 3]
+        pattern = f"{rng.choice(WORDS)}-{i} {rng.choice(WORDS)}"
+        if match == "prefix":
+            pattern += " - "
+        elif match == "keyword":
+            pattern = f"[{pattern}]"
+        action = ACTIONS[i % 3]
+        rules.append(ClassifierRule(match=match, pattern=pattern, action=action, label=f"label-{i}" if action == "relabel" else None))
+    for i in range(regexes):
+        rules.append(ClassifierRule(match="regex", pattern=rf"^{WORDS[i % len(WORDS)]} #\d+ - (?:{i}|x{i})$", action="not_using"))
+    return rules
+
+
+def _hit(rule, n: int) -> str:
+    """一个命中该规则的标题"""
+    if rule.match == "exact":
+        return rule.pattern
+    if rule.match == "prefix":
+        return f"{rule.pattern}{n}"
+    if rule.match == "keyword":
+        return f"tab {n} {rule.pattern} - Browser"
+    return f"{WORDS[n % len(WORDS)]} #{n} - {n}"
+
+
+def _titles(rules, count: int, seed: int = 6):
+    """约一半不命中任何规则，其余命中随机的一条"""
+    rng = random.Random(seed)
+    out = []
+    for n in range(count):
+        if n % 2:
+            out.append(f"{rng.choice(WORDS)} {rng.choice(WORDS)} - document {n}.txt - Editor")
+        else:
+            out.append(_hit(rng.choice(rules), n))
+    return out
+
+
+def _linear(rules):
+    compiled = [re.compile(r.pattern) if r.match == "regex" else None for r in rules]
+
+    def classify(title):
+        for rule, regex in zip(rules, compiled):
+            if rule.match == "exact":
+                hit = title == rule.pattern
+            elif rule.match == "prefix":
+                hit = title.startswith(rule.pattern)
+            elif rule.match == "keyword":
+                hit = rule.pattern in title
+            else:
+                hit = regex.search(title) is not None
+            if hit:
+                return rule
+        return None
+
+    return classify
+
+
+@scenario("classifier", transports=("asgi",))
+async def bench_classifier(target, reporter, quick):
+    import main
+    from classifier import compile_rules
+
+    sizes = (1000, 5000) if quick else (1000, 5000, 20000)
+    regexes = 50
+    lookups = 5000 if quick else 50000
+
+    # ---- rules ----
+    for count in sizes:
+        rules = _rules(count, regexes)
+        t0 = time.perf_counter()
+        classifier = compile_rules(rules)
+        compile_ms = (time.perf_counter() - t0) * 1000
+        titles = _titles(rules, lookups)
+
+        t0 = time.perf_counter()
+        results = [classifier.classify("app.exe", title) for title in titles]
+        cold = (time.perf_counter() - t0) / lookups
+
+        hot = titles[:200]
+        t0 = time.perf_counter()
+        for n in range(lookups):
+            classifier.classify("app.exe", hot[n % 200])
+        warm = (time.perf_counter() - t0) / lookups
+
+        linear = _linear(rules)
+        sample = titles[:max(200, lookups // 50)]
+        t0 = time.perf_counter()
+        expected = [linear(title) for title in sample]
+        naive = (time.perf_counter() - t0) / len(sample)
+        for title, got, exp in zip(sample, results, expected):
+            assert (got.index if got else None) == (rules.index(exp) if exp else None), (title, got and got.as_dict())
+        matched = sum(r is not None for r in results)
+        reporter.emit(make_record(
+            "classifier", target.transport, {"case": "rules", "rules": count + regexes, "regex": regexes},
+            {
+                "compile_ms": round(compile_ms, 1),
+                "cold_us": round(cold * 1e6, 2),
+                "cached_us": round(warm * 1e6, 3),
+                "linear_us": round(naive * 1e6, 1),
+                "matched_ratio": round(matched / lookups, 3),
+            },
+        ))
+
+    # ---- ingest ----
+    data = main.data_store
+    previous = data.classifier
+    path = f"/api/device/report/?secret={target.secret}"
+    count = 2000 if quick else 10000
+    rules = _rules(5000, regexes)
+    titles = _titles(rules, count)
+
+    async def run():
+        sessions = [await target.session() for _ in range(16)]
+
+        async def worker(offset, sess):
+            for i in range(offset, count, len(sessions)):
+                body = report_body(f"classify-{i % 100}", i)
+                body["active_app"]["title"] = titles[i]
+                r = await sess.request("POST", path, body)
+                assert r.status == 200, r.body
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i, s) for i, s in enumerate(sessions)))
+        elapsed = time.perf_counter() - start
+        for s in sessions:
+            await s.close()
+        return count / elapsed
+
+    try:
+        data.classifier = None
+        plain = await run()
+        data.classifier = compile_rules(rules)
+        classified = await run()
+
+        # 效果: 先上报普通窗口，再依次上报命中各动作的标题
+        sess = await target.session()
+        by_action = {action: _hit(next(r for r in rules if r.action == action), 0) for action in ACTIONS}
+        label = next(r.label for r in rules if r.action == "relabel")
+
+        async def report(title):
+            body = report_body("classify-effect", 0)
+            body["active_app"]["title"] = title
+            r = await sess.request("POST", path, body)
+            assert r.status == 200, r.body
+            r = await sess.request("GET", "/api/status/query?device=classify-effect&fields=active_app,using")
+            return r.json()["device"][0]
+
+        base = await report("main.py - sleepy - Visual Studio Code")
+        assert base["using"] is True, base
+        skipped = await report(by_action["skip"])
+        assert skipped["active_app"]["title"] == base["active_app"]["title"], skipped
+        idle = await report(by_action["not_using"])
+        assert idle["using"] is False, idle
+        relabeled = await report(by_action["relabel"])
+        assert relabeled["active_app"]["name"] == label and relabeled["using"] is True, relabeled
+        r = await sess.request("GET", f"/api/device/classify?title={quote(by_action['skip'])}", headers={"X-Secret": target.secret})
+        assert r.json()["action"] == "skip", r.body
+        await sess.close()
+    finally:
+        data.classifier = previous
+    reporter.emit(make_record(
+        "classifier", target.transport, {"case": "ingest", "rules": len(rules), "reports": count},
+        {"reports_per_sec": round(classified, 1), "without_rules_per_sec": round(plain, 1)},
+    ))
@@ -0,0 +1,500 @@
+"""
+基准测试公共工具
+
+- AsgiClient: 进程内直接驱动 ASGI 应用（含 lifespan），不经过网络
+- HttpConnection / UvicornProcess: 在子进程中启动 uvicorn，通过本地 TCP 请求
+- 结果统一输出为 JSON Lines，便于跨提交对比（见 bench/compare.py）
+"""
+
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROOT, "server")
+
+FORMAT_VERSION = 1
+
+
+def setup_path():
+    """服务端模块以顶层名导入（from data import Data），需要把 server/ 放进 sys.path"""
+    if SERVER_DIR not in sys.path:
+        sys.path.insert(0, SERVER_DIR)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    # config.yaml 按相对路径读取
+    os.chdir(ROOT)
+
+
+# ---- 统计 ----
+
+
+def percentiles(samples: List[float], points=(50, 90, 99)) -> Dict[str, float]:
+    if not samples:
+        return {f"p{p}": 0.0 for p in points}
+    ordered = sorted(samples)
+    out = {}
+    for p in points:
+        idx = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        out[f"p{p}"] = ordered[idx]
+    return out
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """秒 -> 微秒，保留均值与常用分位数"""
+    us = [s * 1e6 for s in samples]
+    summary = {k + "_us": round(v, 2) for k, v in percentiles(us).items()}
+    summary["mean_us"] = round(sum(us) / len(us), 2) if us else 0.0
+    summary["max_us"] = round(max(us), 2) if us else 0.0
+    return summary
+
+
+# ---- 结果输出 ----
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+_ENV: Optional[Dict[str, Any]] = None
+
+
+def environment() -> Dict[str, Any]:
+    global _ENV
+    if _ENV is None:
+        _ENV = {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        }
+    return _ENV
+
+
+def make_record(bench: str, transport: str, params: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "format": FORMAT_VERSION,
+        "bench": bench,
+        "transport": transport,
+        "params": params,
+        "results": results,
+        "env": environment(),
+        "time": time.time(),
+    }
+
+
+class Reporter:
+    """把每条结果写到 stdout（人读）和可选的 JSONL 文件（机读）"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._fp = open(path, "a", encoding="utf-8") if path else None
+
+    def emit(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, sort_keys=True)
+        if self._fp:
+            self._fp.write(line + "\n")
+            self._fp.flush()
+        params = " ".join(f"{k}={v}" for k, v in record["params"].items())
+        print(f"[{record['bench']}/{record['transport']}] {params}")
+        for k, v in record["results"].items():
+            print(f"    {k}: {v}")
+
+    def close(self):
+        if self._fp:
+            self._fp.close()
+
+
+# ---- 场景注册 ----
+
+SCENARIOS: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {}
+
+
+def scenario(name: str, transports: Tuple[str, ...] = ("asgi", "uvicorn")):
+    """注册一个场景；场景函数签名为 async def fn(target, reporter, quick)"""
+
+    def deco(fn):
+        SCENARIOS[name] = (fn, transports)
+        return fn
+
+    return deco
+
+
+# ---- 进程内 ASGI ----
+
+
+class Response:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def _split_target(path: str) -> Tuple[str, bytes]:
+    parts = urlsplit(path)
+    return parts.path, parts.query.encode()
+
+
+class AsgiStream:
+    """一个长连接响应（SSE），chunks 中依次放入 (到达时间, 数据块)"""
+
+    def __init__(self):
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.status: Optional[int] = None
+        self.disconnected = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    async def next_event(self, timeout: float = 10.0) -> Tuple[float, bytes]:
+        return await asyncio.wait_for(self.chunks.get(), timeout)
+
+    async def close(self):
+        self.disconnected.set()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+class AsgiClient:
+    def __init__(self, app):
+        self.app = app
+        self.state: Dict[str, Any] = {}
+        self._lifespan_task: Optional[asyncio.Task] = None
+        self._lifespan_in: Optional[asyncio.Queue] = None
+        self._lifespan_out: Optional[asyncio.Queue] = None
+
+    async def startup(self):
+        self._lifespan_in = asyncio.Queue()
+        self._lifespan_out = asyncio.Queue()
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": self.state}
+        self._lifespan_task = asyncio.create_task(
+            self.app(scope, self._lifespan_in.get, self._lifespan_out.put)
+        )
+        await self._lifespan_in.put({"type": "lifespan.startup"})
+        msg = await self._lifespan_out.get()
+        if msg["type"] != "lifespan.startup.complete":
+            raise RuntimeError(f"lifespan startup failed: {msg}")
+
+    async def shutdown(self):
+        if self._lifespan_task is None:
+            return
+        await self._lifespan_in.put({"type": "lifespan.shutdown"})
+        await self._lifespan_out.get()
+        await self._lifespan_task
+        self._lifespan_task = None
+
+    def _scope(self, method: str, path: str, headers: Optional[Dict[str, str]]) -> Dict[str, Any]:
+        route_path, query = _split_target(path)
+        raw_headers = [(b"host", b"bench")]
+        for k, v in (headers or {}).items():
+            raw_headers.append((k.lower().encode(), v.encode()))
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": route_path,
+            "raw_path": route_path.encode(),
+            "query_string": query,
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+            "state": dict(self.state),
+        }
+
+    async def request(
+        self, method: str, path: str, json_body: Any = None, headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        body = b""
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers["content-type"] = "application/json"
+        scope = self._scope(method, path, headers)
+        sent = False
+        status = 0
+        resp_headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status, resp_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                resp_headers = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return Response(status, resp_headers, b"".join(chunks))
+
+    async def stream(self, path: str, headers: Optional[Dict[str, str]] = None) -> AsgiStream:
+        handle = AsgiStream()
+        scope = self._scope("GET", path, headers)
+        sent = False
+        started = asyncio.get_running_loop().create_future()
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await handle.disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                handle.status = message["status"]
+                if not started.done():
+                    started.set_result(None)
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                if chunk:
+                    handle.chunks.put_nowait((time.perf_counter(), chunk))
+
+        handle.task = asyncio.create_task(self.app(scope, receive, send))
+        await started
+        return handle
+
+
+# ---- 本地 uvicorn ----
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class HttpConnection:
+    """极简 HTTP/1.1 keep-alive 客户端（只为基准测试服务，无额外依赖）"""
+
+    def __init__(self, host: str, port: int, uds: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.uds = uds
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self):
+        if self.uds:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.uds)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.writer = None
+
+    def _send_head(self, method: str, path: str, body: bytes, headers: Optional[Dict[str, str]]):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        for k, v in (headers or {}).items():
+            lines.append(f"{k}: {v}")
+        lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+
+    async def _read_head(self) -> Tuple[int, Dict[str, str]]:
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        return status, headers
+
+    async def _read_chunk(self) -> bytes:
+        size_line = await self.reader.readline()
+        size = int(size_line.split(b";")[0], 16)
+        data = await self.reader.readexactly(size) if size else b""
+        await self.reader.readline()
+        return data
+
+    async def request(
+        self, method: str, path: str, json_body: Any = None, headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        body = b""
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+        try:
+            self._send_head(method, path, body, headers)
+            await self.writer.drain()
+            status, resp_headers = await self._read_head()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            # 空闲连接被服务端按 keep-alive 超时关闭，重连后重发一次
+            await self.close()
+            await self.connect()
+            self._send_head(method, path, body, headers)
+            await self.writer.drain()
+            status, resp_headers = await self._read_head()
+        if resp_headers.get("transfer-encoding") == "chunked":
+            parts = []
+            while True:
+                chunk = await self._read_chunk()
+                if not chunk:
+                    break
+                parts.append(chunk)
+            data = b"".join(parts)
+        else:
+            data = await self.reader.readexactly(int(resp_headers.get("content-length", 0)))
+        return Response(status, [(k.encode(), v.encode()) for k, v in resp_headers.items()], data)
+
+    async def stream(self, path: str, headers: Optional[Dict[str, str]] = None) -> "HttpStream":
+        self._send_head("GET", path, b"", headers)
+        await self.writer.drain()
+        status, _ = await self._read_head()
+        return HttpStream(self, status)
+
+
+class HttpStream:
+    def __init__(self, conn: HttpConnection, status: int):
+        self.conn = conn
+        self.status = status
+
+    async def next_event(self, timeout: float = 10.0) -> Tuple[float, bytes]:
+        chunk = await asyncio.wait_for(self.conn._read_chunk(), timeout)
+        return time.perf_counter(), chunk
+
+    async def close(self):
+        await self.conn.close()
+
+
+class UvicornProcess:
+    """在子进程中运行 uvicorn（单 worker），用完即销毁，保证每个场景状态独立"""
+
+    def __init__(self, app_path: str = "bench.app_factory:app", extra_args: Optional[List[str]] = None):
+        self.app_path = app_path
+        self.extra_args = extra_args or []
+        self.host = "127.0.0.1"
+        self.port = free_port()
+        self.proc: Optional[subprocess.Popen] = None
+
+    def __enter__(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join([ROOT, SERVER_DIR, env.get("PYTHONPATH", "")])
+        cmd = [
+            sys.executable, "-m", "uvicorn", self.app_path,
+            "--host", self.host, "--port", str(self.port),
+            "--log-level", "warning", "--no-access-log",
+        ] + self.extra_args
+        self.proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=0.2):
+                    return self
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError("uvicorn did not start in time")
+
+    def __exit__(self, *exc):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.proc = None
+
+    async def connection(self) -> HttpConnection:
+        return await HttpConnection(self.host, self.port).connect()
+
+
+# ---- 统一的目标抽象 ----
+
+
+class Target:
+    """场景只面向这个接口编写，transport 决定请求走进程内 ASGI 还是本地 uvicorn"""
+
+    def __init__(self, transport: str, secret: str):
+        self.transport = transport
+        self.secret = secret
+        self.client: Optional[AsgiClient] = None
+        self.server: Optional[UvicornProcess] = None
+
+    async def __aenter__(self):
+        if self.transport == "asgi":
+            from bench.app_factory import build_app
+
+            self.client = AsgiClient(build_app())
+            await self.client.startup()
+        else:
+            self.server = UvicornProcess().__enter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.client is not None:
+            await self.client.shutdown()
+        if self.server is not None:
+            self.server.__exit__()
+
+    async def session(self):
+        """返回一个可发请求的会话（ASGI 下共享同一个 client，uvicorn 下为独立 keep-alive 连接）"""
+        if self.client is not None:
+            return _AsgiSession(self.client)
+        return await self.server.connection()
+
+
+class _AsgiSession:
+    def __init__(self, client: AsgiClient):
+        self.client = client
+
+    async def request(self, *args, **kwargs) -> Response:
+        return await self.client.request(*args, **kwargs)
+
+    async def stream(self, path: str, headers: Optional[Dict[str, str]] = None):
+        return await self.client.stream(path, headers)
+
+    async def close(self):
+        pass
+
+
+def load_secret() -> str:
+    setup_path()
+    from config import get_config
+
+    return get_config().main.secret
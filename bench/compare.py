@@ -0,0 +1,68 @@
+"""
+对比两次基准结果
+
+    python -m bench.compare base.jsonl new.jsonl [--threshold 10]
+
+按 (bench, transport, params) 对齐记录；延迟类指标（*_us）变大、吞吐类指标
+（*_per_sec）变小、内存类指标（bytes_*）变大超过阈值即视为回归，退出码为 1。
+"""
+
+import argparse
+import json
+import sys
+
+
+def _key(record):
+    return (record["bench"], record["transport"], json.dumps(record["params"], sort_keys=True))
+
+
+def load(path):
+    records = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rec = json.loads(line)
+                records[_key(rec)] = rec  # 同一组合以最后一次为准
+    return records
+
+
+def _direction(metric: str) -> int:
+    """+1: 越大越好, -1: 越小越好, 0: 不参与判定"""
+    if metric.endswith("_per_sec"):
+        return 1
+    if metric.endswith("_us") or metric.startswith("bytes_"):
+        return -1
+    return 0
+
+
+def compare(base, new, threshold: float):
+    regressions = 0
+    for key in sorted(set(base) & set(new)):
+        bench, transport, params = key
+        b, n = base[key]["results"], new[key]["results"]
+        for metric in sorted(set(b) & set(n)):
+            direction = _direction(metric)
+            if not direction or not isinstance(b[metric], (int, float)) or not b[metric]:
+                continue
+            change = (n[metric] - b[metric]) / abs(b[metric]) * 100
+            worse = change * direction < -threshold
+            regressions += worse
+            flag = "REGRESSION" if worse else ""
+            print(f"{bench}/{transport} {params} {metric}: {b[metric]} -> {n[metric]} ({change:+.1f}%) {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="回归判定阈值（百分比）")
+    args = parser.parse_args(argv)
+    regressions = compare(load(args.base), load(args.new), args.threshold)
+    print(f"\n{regressions} regression(s) over {args.threshold}%")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
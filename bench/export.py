@@ -0,0 +1,104 @@
+"""
+历史列式导出基准
+
+- export:
+  - format: entries 条原始历史经 /api/history/export 导出为 csv / scol（安装了 pyarrow 时还有 parquet）的
+    吞吐与大小；scol 写入临时文件后用 ColumnarFile（mmap）读回，校验行数与列值
+  - memory: 进程内直接迭代 columnar.chunks()，用 tracemalloc 记录 entries 与 4 × entries 条时的峰值内存，
+    两者应接近（与数据量无关，只与块大小有关）
+"""
+
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bench.common import make_record, scenario
+
+
+def _fill(store, entries: int, start: float):
+    for i in range(entries):
+        app = f"app-{i % 13}.exe"
+        store.add(start + i, f"dev-{i % 50}", app, f"{app} - document {i % 997}", i % 3 != 0, i % 100, i % 5 != 0)
+
+
+def _peak(store, fmt: str) -> int:
+    import columnar
+
+    tracemalloc.start()
+    try:
+        for _ in columnar.chunks("history", store.scan(), fmt):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@scenario("export", transports=("asgi",))
+async def bench_export(target, reporter, quick):
+    import main
+    import columnar
+    from history import HistoryStore
+
+    entries = 100000 if quick else 1000000
+    data = main.data_store
+    settings = main.config.history.model_copy(update={"enabled": True})
+    auth = {"X-Secret": target.secret}
+    previous = data.history
+    data.history = store = HistoryStore(settings)
+    try:
+        start = time.time() - entries
+        _fill(store, entries, start)
+        await data.maintain_history()
+
+        # ---- format ----
+        formats = ["csv", "scol"] + (["parquet"] if columnar.parquet_available() else [])
+        sess = await target.session()
+        for fmt in formats:
+            t0 = time.perf_counter()
+            r = await sess.request("GET", f"/api/history/export?table=history&format={fmt}", headers=auth)
+            elapsed = time.perf_counter() - t0
+            assert r.status == 200, r.body
+            body = r.body
+            if fmt == "csv":
+                assert body.count(b"\n") == entries + 1
+            elif fmt == "scol":
+                with tempfile.NamedTemporaryFile(suffix=".scol", delete=False) as f:
+                    f.write(body)
+                try:
+                    with columnar.ColumnarFile(f.name) as cf:
+                        assert cf.rows == entries, cf.rows
+                        t0 = time.perf_counter()
+                        total = sum(sum(view) for view in cf.column("battery"))
+                        scan = time.perf_counter() - t0
+                        assert total == sum(i % 100 for i in range(entries)), total
+                finally:
+                    os.remove(f.name)
+            metrics = {
+                "rows_per_sec": round(entries / elapsed, 1),
+                "bytes_per_row": round(len(body) / entries, 1),
+                "elapsed_ms": round(elapsed * 1000, 1),
+            }
+            if fmt == "scol":
+                metrics["mmap_column_sum_ms"] = round(scan * 1000, 2)
+            reporter.emit(make_record("export", target.transport, {"case": "format", "format": fmt, "entries": entries}, metrics))
+        r = await sess.request("GET", "/api/history/export?format=bogus", headers=auth)
+        assert r.status == 400, r.status
+        await sess.close()
+
+        # ---- memory ----
+        for fmt in ("csv", "scol"):
+            small = _peak(store, fmt)
+            _fill(store, entries * 3, start - entries * 3)
+            large = _peak(store, fmt)
+            reporter.emit(make_record(
+                "export", target.transport, {"case": "memory", "format": fmt},
+                {
+                    "entries": entries, "peak_kib": round(small / 1024, 1),
+                    "entries_4x": len(store), "peak_4x_kib": round(large / 1024, 1),
+                },
+            ))
+            data.history = store = HistoryStore(settings)
+            _fill(store, entries, start)
+    finally:
+        data.history = previous
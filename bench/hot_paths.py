@@ -0,0 +1,425 @@
+"""
+服务端热路径基准: 上报吞吐、查询延迟（含投影 / 过滤 / 分页）、SSE 扇出、长轮询唤醒、鉴权开销、内存占用（含设备记录布局）
+"""
+
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from bench.common import latency_summary, make_record, scenario
+
+
+def report_body(device_id: str, n: int = 0) -> dict:
+    return {
+        "device_id": device_id,
+        "device_name": device_id.upper(),
+        "is_active": "Using",
+        "timestamp": time.time(),
+        "battery_percent": n % 100,
+        "battery_status": "False",
+        "active_app": {"name": "Code.exe", "title": f"main.py - sleepy - Visual Studio Code #{n % 7}"},
+    }
+
+
+async def _fill_devices(target, start: int, stop: int, concurrency: int = 16):
+    sessions = [await target.session() for _ in range(concurrency)]
+
+    async def worker(offset, sess):
+        for n in range(start + offset, stop, concurrency):
+            r = await sess.request("POST", f"/api/device/report/?secret={target.secret}", report_body(f"dev-{n}", n))
+            assert r.status == 200, r.body
+
+    await asyncio.gather(*(worker(i, s) for i, s in enumerate(sessions)))
+    for s in sessions:
+        await s.close()
+
+
+@scenario("ingest")
+async def bench_ingest(target, reporter, quick):
+    total = 2000 if quick else 20000
+    concurrency = 16
+    devices = 100
+    sessions = [await target.session() for _ in range(concurrency)]
+    latencies = []
+    path = f"/api/device/report/?secret={target.secret}"
+
+    # 预热
+    for i in range(devices):
+        await sessions[0].request("POST", path, report_body(f"dev-{i}", i))
+
+    async def worker(offset, sess):
+        for n in range(offset, total, concurrency):
+            t0 = time.perf_counter()
+            r = await sess.request("POST", path, report_body(f"dev-{n % devices}", n))
+            latencies.append(time.perf_counter() - t0)
+            assert r.status == 200, r.body
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i, s) for i, s in enumerate(sessions)))
+    elapsed = time.perf_counter() - start
+    for s in sessions:
+        await s.close()
+
+    reporter.emit(make_record(
+        "ingest", target.transport,
+        {"requests": total, "concurrency": concurrency, "devices": devices},
+        {"requests_per_sec": round(total / elapsed, 1), **latency_summary(latencies)},
+    ))
+
+
+@scenario("query")
+async def bench_query(target, reporter, quick):
+    sizes = [10, 100, 1000] if quick else [10, 100, 1000, 10000]
+    queries = 200 if quick else 1000
+    sess = await target.session()
+    filled = 0
+    for size in sizes:
+        await _fill_devices(target, filled, size)
+        filled = size
+        latencies = []
+        body_len = 0
+        for _ in range(queries):
+            t0 = time.perf_counter()
+            r = await sess.request("GET", "/api/status/query")
+            latencies.append(time.perf_counter() - t0)
+            body_len = len(r.body)
+        assert r.status == 200 and len(r.json()["device"]) == size
+        reporter.emit(make_record(
+            "query", target.transport,
+            {"devices": size, "queries": queries},
+            {"response_bytes": body_len, **latency_summary(latencies)},
+        ))
+    await sess.close()
+
+
+@scenario("query_filtered")
+async def bench_query_filtered(target, reporter, quick):
+    size = 2000 if quick else 10000
+    queries = 100 if quick else 500
+    await _fill_devices(target, 0, size)
+    sess = await target.session()
+    cases = {
+        "full": "/api/status/query",
+        "fields": "/api/status/query?fields=id,using",
+        "using": "/api/status/query?using=true&fields=id",
+        "device": "/api/status/query?device=dev-1,dev-500,dev-1999",
+        "page": "/api/status/query?limit=100",
+    }
+    for name, path in cases.items():
+        latencies = []
+        for _ in range(queries):
+            t0 = time.perf_counter()
+            r = await sess.request("GET", path)
+            latencies.append(time.perf_counter() - t0)
+        assert r.status == 200, r.body
+        reporter.emit(make_record(
+            "query_filtered", target.transport,
+            {"devices": size, "case": name, "queries": queries},
+            {"response_bytes": len(r.body), "returned": len(r.json()["device"]), **latency_summary(latencies)},
+        ))
+    await sess.close()
+
+
+@scenario("query_sorted")
+async def bench_query_sorted(target, reporter, quick):
+    size = 10000
+    queries = 50 if quick else 300
+    await _fill_devices(target, 0, size)
+    sess = await target.session()
+    for sort in ("using_first", "last_seen", "name"):
+        cases = {
+            "maintained": f"/api/status/query?sort={sort}",
+            "sort_on_read": f"/__bench/sort_on_read?sort={sort}",
+        }
+        samples = {name: [] for name in cases}
+        ids = {}
+        # 交错执行，减少漂移带来的偏差
+        for _ in range(queries):
+            for name, path in cases.items():
+                t0 = time.perf_counter()
+                r = await sess.request("GET", path)
+                samples[name].append(time.perf_counter() - t0)
+                assert r.status == 200, r.body
+        # 两条路径的输出顺序必须一致
+        for name, path in cases.items():
+            ids[name] = [d["id"] for d in (await sess.request("GET", path)).json()["device"]]
+        assert ids["maintained"] == ids["sort_on_read"], sort
+        for name, values in samples.items():
+            reporter.emit(make_record(
+                "query_sorted", target.transport,
+                {"devices": size, "sort": sort, "case": name, "queries": queries},
+                latency_summary(values),
+            ))
+    await sess.close()
+
+
+@scenario("report_latency")
+async def bench_report_latency(target, reporter, quick):
+    """时钟不同步的客户端上报后，服务端估计的时钟偏差误差与各段延迟"""
+    import random
+
+    devices = 50
+    reports = 20 if quick else 100
+    rng = random.Random(38)
+    skews = {f"skew-{n}": rng.uniform(-30, 30) for n in range(devices)}
+    sess = await target.session()
+    path = f"/api/device/report/?secret={target.secret}"
+    for _ in range(reports):
+        for device_id, skew in skews.items():
+            body = report_body(device_id)
+            body["timestamp"] = time.time() + skew
+            r = await sess.request("POST", path, body)
+            assert r.status == 200, r.body
+
+    r = await sess.request("GET", f"/api/device/latency?secret={target.secret}")
+    assert r.status == 200, r.body
+    result = r.json()
+    await sess.close()
+
+    # 客户端时间 = 真实时间 + skew，所以估计的偏差应接近 -skew（多出的部分是最小网络延迟）
+    errors = [abs(result["devices"][d]["clock_offset"] + skew) for d, skew in skews.items()]
+    aggregate = result["aggregate"]
+    reporter.emit(make_record(
+        "report_latency", target.transport,
+        {"devices": devices, "reports_per_device": reports},
+        {
+            "offset_error_max_ms": round(max(errors) * 1e3, 3),
+            "offset_error_mean_ms": round(sum(errors) / len(errors) * 1e3, 3),
+            **{f"{seg}_mean_us": round((aggregate[seg]["mean"] or 0) * 1e6, 2) for seg in ("transit", "queue", "end_to_end")},
+        },
+    ))
+
+
+@scenario("sse_fanout")
+async def bench_sse_fanout(target, reporter, quick):
+    sizes = [10, 100] if quick else [10, 100, 1000]
+    rounds = 10 if quick else 30
+    control = await target.session()
+    streams = []
+    status = 0
+    for size in sizes:
+        while len(streams) < size:
+            sess = await target.session()
+            stream = await sess.stream("/api/status/events")
+            await stream.next_event()  # 初始快照
+            streams.append(stream)
+
+        latencies = []
+        last_arrivals = []
+        for _ in range(rounds):
+            status ^= 1
+            t0 = time.perf_counter()
+            r = await control.request("GET", f"/api/status/set?status={status}&secret={target.secret}")
+            assert r.status == 200, r.body
+            arrivals = await asyncio.gather(*(s.next_event() for s in streams))
+            deltas = [t - t0 for t, _ in arrivals]
+            latencies.extend(deltas)
+            last_arrivals.append(max(deltas))
+
+        reporter.emit(make_record(
+            "sse_fanout", target.transport,
+            {"subscribers": size, "rounds": rounds},
+            {
+                **latency_summary(latencies),
+                "last_subscriber_mean_us": round(sum(last_arrivals) / len(last_arrivals) * 1e6, 2),
+            },
+        ))
+
+    for s in streams:
+        await s.close()
+    await control.close()
+
+
+@scenario("auth")
+async def bench_auth(target, reporter, quick):
+    n = 2000 if quick else 10000
+    sess = await target.session()
+    cases = {
+        "open": "/__bench/open",
+        "auth_ok": f"/__bench/auth?secret={target.secret}",
+        "auth_header": "/__bench/auth",
+        "auth_denied": "/__bench/auth?secret=wrong",
+    }
+    headers = {"auth_header": {"X-Secret": target.secret}}
+    samples = {k: [] for k in cases}
+    # 交错执行，减少漂移带来的偏差
+    for _ in range(n):
+        for name, path in cases.items():
+            t0 = time.perf_counter()
+            r = await sess.request("GET", path, headers=headers.get(name))
+            samples[name].append(time.perf_counter() - t0)
+            assert r.status == (403 if name == "auth_denied" else 200), (name, r.status)
+    await sess.close()
+
+    open_mean = sum(samples["open"]) / n
+    for name, values in samples.items():
+        summary = latency_summary(values)
+        summary["overhead_vs_open_us"] = round((sum(values) / n - open_mean) * 1e6, 2)
+        reporter.emit(make_record("auth", target.transport, {"case": name, "requests": n}, summary))
+
+
+@scenario("memory", transports=("asgi",))
+async def bench_memory(target, reporter, quick):
+    devices = 1000 if quick else 10000
+    subscribers = 100 if quick else 1000
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        await _fill_devices(target, 0, devices)
+        gc.collect()
+        after_devices = tracemalloc.get_traced_memory()[0]
+
+        sess = await target.session()
+        streams = []
+        for _ in range(subscribers):
+            stream = await sess.stream("/api/status/events")
+            await stream.next_event()
+            streams.append(stream)
+        gc.collect()
+        after_subs = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    for s in streams:
+        await s.close()
+
+    reporter.emit(make_record(
+        "memory", target.transport,
+        {"devices": devices, "subscribers": subscribers},
+        {
+            "bytes_per_device": round((after_devices - base) / devices, 1),
+            "bytes_per_subscriber": round((after_subs - after_devices) / subscribers, 1),
+        },
+    ))
+
+
+def _device_reports(count: int):
+    """count 台设备的上报；应用名 / 窗口标题取自有限的集合，接近真实分布"""
+    from models.device_status import DeviceStatus
+
+    apps = [f"App{i}.exe" for i in range(50)]
+    reports = []
+    for n in range(count):
+        app = apps[n % len(apps)]
+        reports.append(DeviceStatus(
+            device_id=f"dev-{n}",
+            device_name=f"DEV-{n % 1000}",
+            is_active=("Using", "Locked", "Inactive")[n % 3],
+            timestamp=0,
+            battery_percent=n % 100,
+            battery_status=("True", "False")[n % 2],
+            active_app={"name": app, "title": f"{app} - document {n % 20}"},
+        ))
+    return reports
+
+
+def _traced(build):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        keep = build()
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    return used, keep
+
+
+@scenario("memory_records", transports=("asgi",))
+async def bench_memory_records(target, reporter, quick):
+    """存储中每台设备的内存: 旧版 DeviceInfo 列表 vs 紧凑记录，以及完整的 DeviceStore"""
+    import main
+    from data import Data
+    from encoding import assemble_list
+    from models.api import DeviceInfo
+    from records import DeviceRecord
+
+    devices = 100000
+    reports = _device_reports(devices)
+    now = time.time()
+
+    def legacy():
+        return [
+            DeviceInfo(
+                id=r.device_id,
+                name=r.device_name,
+                last_seen=now,
+                battery_percent=r.battery_percent,
+                battery_status=r.battery_status,
+                active_app=r.active_app.model_dump() if r.active_app else None,
+            )
+            for r in reports
+        ]
+
+    def compact():
+        return [DeviceRecord.from_report(r, now) for r in reports]
+
+    results = {}
+    for name, build in (("legacy_models", legacy), ("compact_records", compact)):
+        used, keep = _traced(build)
+        del keep
+        results[name] = used
+
+    # 完整存储: 记录 + 预编码 JSON + 各索引 + 已发布快照
+    data = Data(main.config)
+    await data.start()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        for start in range(0, devices, 5000):
+            await asyncio.gather(*(data.update_device(r, now) for r in reports[start:start + 5000]))
+        gc.collect()
+        results["device_store"] = tracemalloc.get_traced_memory()[0] - base
+        # 匿名访问者读取一次全部设备后，脱敏版（默认配置隐藏 active_app.title）才被编码并缓存
+        frags, _ = data.select_devices(data.current, authenticated=False)
+        assemble_list(frags)
+        del frags
+        gc.collect()
+        results["device_store_after_public_read"] = tracemalloc.get_traced_memory()[0] - base
+    finally:
+        tracemalloc.stop()
+    await data.stop()
+
+    for name, used in results.items():
+        reporter.emit(make_record(
+            "memory_records", target.transport,
+            {"devices": devices, "layout": name},
+            {"bytes_per_device": round(used / devices, 1)},
+        ))
+
+
+@scenario("longpoll")
+async def bench_longpoll(target, reporter, quick):
+    sizes = [100, 500] if quick else [100, 1000, 2000]
+    control = await target.session()
+    status = 0
+    for size in sizes:
+        version = (await control.request("GET", "/api/status/query")).json()["version"]
+        sessions = [await target.session() for _ in range(size)]
+
+        async def waiter(sess):
+            r = await sess.request("GET", f"/api/status/query?since={version}&wait=30")
+            return time.perf_counter(), r.status
+
+        tasks = [asyncio.create_task(waiter(s)) for s in sessions]
+        # 等待所有请求挂起
+        await asyncio.sleep(0.5 + size / 1000)
+        status ^= 1
+        t0 = time.perf_counter()
+        r = await control.request("GET", f"/api/status/set?status={status}&secret={target.secret}")
+        assert r.status == 200, r.body
+        results = await asyncio.gather(*tasks)
+        assert all(code == 200 for _, code in results), {code for _, code in results}
+        for s in sessions:
+            await s.close()
+        reporter.emit(make_record(
+            "longpoll", target.transport,
+            {"waiters": size},
+            latency_summary([t - t0 for t, _ in results]),
+        ))
+    await control.close()
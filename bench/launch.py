@@ -0,0 +1,135 @@
+"""
+启动方式基准
+
+- launch: 同样的负载下对比几种启动方式的吞吐和 p99 延迟，每种方式一个独立的 uvicorn 子进程:
+  - default: 只装了 fastapi / uvicorn 时 uvicorn.run("main:app") 的效果（asyncio + h11，访问日志开启）
+  - tuned: server/launcher.py 按配置生成的参数（uvloop + httptools，关闭访问日志）
+  - tuned_uds: 同上，改为监听 Unix 域套接字（反向代理在同一台机器上时）
+
+子进程入口: python -m bench.launch <方式> <端口或套接字路径>
+"""
+
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.common import (
+    ROOT, SERVER_DIR, HttpConnection, free_port, latency_summary, make_record, scenario, setup_path,
+)
+from bench.hot_paths import report_body
+
+VARIANTS = ("default", "tuned", "tuned_uds")
+
+
+def serve(variant: str, where: str):
+    setup_path()
+    import uvicorn
+
+    if variant == "default":
+        options = {"loop": "asyncio", "http": "h11", "host": "127.0.0.1", "port": int(where)}
+    else:
+        import launcher
+        from config import get_config
+
+        config = get_config()
+        update = {"uds": where} if variant == "tuned_uds" else {"host": "127.0.0.1", "port": int(where)}
+        options = launcher.uvicorn_options(
+            config.model_copy(update={"main": config.main.model_copy(update={"access_log": False, **update})})
+        )
+    uvicorn.run("bench.app_factory:app", **options)
+
+
+class _Server:
+    def __init__(self, variant: str, tmp: str):
+        self.variant = variant
+        self.uds = os.path.join(tmp, "sleepy.sock") if variant == "tuned_uds" else None
+        self.port = free_port()
+        self.proc = None
+
+    def __enter__(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join([ROOT, SERVER_DIR, env.get("PYTHONPATH", "")])
+        where = self.uds or str(self.port)
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "bench.launch", self.variant, where],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"{self.variant} server exited during startup")
+            try:
+                if self.uds:
+                    with socket.socket(socket.AF_UNIX) as s:
+                        s.connect(self.uds)
+                else:
+                    socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError(f"{self.variant} server did not start in time")
+
+    def __exit__(self, *exc):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    async def connection(self) -> HttpConnection:
+        return await HttpConnection("127.0.0.1", self.port, uds=self.uds).connect()
+
+
+async def _load(server: _Server, method: str, path, total: int, concurrency: int):
+    sessions = [await server.connection() for _ in range(concurrency)]
+    latencies = []
+
+    async def worker(offset, sess):
+        for n in range(offset, total, concurrency):
+            t0 = time.perf_counter()
+            r = await sess.request(method, *path(n))
+            latencies.append(time.perf_counter() - t0)
+            assert r.status == 200, r.body
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i, s) for i, s in enumerate(sessions)))
+    elapsed = time.perf_counter() - start
+    for s in sessions:
+        await s.close()
+    return elapsed, latencies
+
+
+@scenario("launch", transports=("uvicorn",))
+async def bench_launch(target, reporter, quick):
+    total = 2000 if quick else 20000
+    concurrency = 32
+    devices = 100
+    report = f"/api/device/report/?secret={target.secret}"
+    cases = {
+        "report": ("POST", lambda n: (report, report_body(f"dev-{n % devices}", n))),
+        "query": ("GET", lambda n: ("/api/status/query?limit=20",)),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant in VARIANTS:
+            with _Server(variant, tmp) as server:
+                conn = await server.connection()
+                for i in range(devices):
+                    await conn.request("POST", report, report_body(f"dev-{i}", i))
+                await conn.close()
+                for case, (method, path) in cases.items():
+                    elapsed, latencies = await _load(server, method, path, total, concurrency)
+                    reporter.emit(make_record(
+                        "launch", "uvicorn",
+                        {"variant": variant, "case": case, "requests": total, "concurrency": concurrency},
+                        {"requests_per_sec": round(total / elapsed, 1), **latency_summary(latencies)},
+                    ))
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], sys.argv[2])
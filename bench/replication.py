@@ -0,0 +1,205 @@
+"""
+主从复制基准（leader 与 follower 各为一个本机 uvicorn 子进程）
+
+- replication: 一个 leader + 两个 follower
+  - propagation: 在 leader 上切换状态，到各 follower 的 SSE 收到 status_updated 的时间
+  - converge: 并发上报一批设备，从 leader 全部确认到 follower 版本号追上 leader 的时间
+  - catchup: 之后启动第三个 follower，从开始监听到全量快照同步完成的时间
+  同时校验 follower 的设备列表与 leader 一致、follower 上的写操作返回 409
+
+收敛、follower 重启后追上与只读的断言也在 tests/test_replication.py 中自动运行。
+
+子进程入口: python -m bench.replication <leader|follower> <端口> [leader 地址]
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from bench.common import ROOT, SERVER_DIR, HttpConnection, free_port, latency_summary, make_record, scenario, setup_path
+from bench.hot_paths import report_body
+
+
+def serve(role: str, port: str, leader: str = None):
+    setup_path()
+    import uvicorn
+
+    import launcher
+    import main
+
+    config = main.config
+    main.config = config.model_copy(update={
+        "replication": config.replication.model_copy(update={"role": role, "leader": leader}),
+    })
+    options = launcher.uvicorn_options(main.config.model_copy(update={
+        "main": config.main.model_copy(update={"host": "127.0.0.1", "port": int(port), "uds": None}),
+    }))
+    uvicorn.run("bench.app_factory:app", **options)
+
+
+class _Node:
+    def __init__(self, role: str, leader: str = None):
+        self.role = role
+        self.port = free_port()
+        self.args = [role, str(self.port)] + ([leader] if leader else [])
+        self.proc = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join([ROOT, SERVER_DIR, env.get("PYTHONPATH", "")])
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "bench.replication"] + self.args,
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 20
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"{self.role} exited during startup")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError(f"{self.role} did not start in time")
+
+    def __exit__(self, *exc):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+    async def connection(self) -> HttpConnection:
+        return await HttpConnection("127.0.0.1", self.port).connect()
+
+
+async def _status(conn: HttpConnection, secret: str):
+    r = await conn.request("GET", "/api/replication/status", headers={"X-Secret": secret})
+    assert r.status == 200, r.body
+    return r.json()
+
+
+async def _wait_version(conn: HttpConnection, secret: str, version: int, timeout: float = 30) -> float:
+    """等待 follower 应用到指定版本，返回等待时间"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        st = await _status(conn, secret)
+        if st["synced"] and st["version"] >= version:
+            return time.perf_counter() - start
+        await asyncio.sleep(0.002)
+    raise AssertionError(f"follower did not reach version {version} in {timeout}s")
+
+
+async def _devices(conn: HttpConnection, secret: str):
+    r = await conn.request("GET", "/api/status/query?sort=name", headers={"X-Secret": secret})
+    assert r.status == 200, r.body
+    body = r.json()
+    return body["version"], body["status"]["id"], body["device"]
+
+
+async def _next_event(stream, name: str, timeout: float = 10) -> float:
+    """读 SSE 直到出现指定事件，返回收到时间"""
+    while True:
+        at, chunk = await stream.next_event(timeout)
+        for line in chunk.decode().splitlines():
+            if line.startswith("data: ") and json.loads(line[6:]).get("event") == name:
+                return at
+
+
+@scenario("replication", transports=("uvicorn",))
+async def bench_replication(target, reporter, quick):
+    secret = target.secret
+    devices = 1000 if quick else 10000
+    switches = 20 if quick else 100
+    concurrency = 16
+    report = f"/api/device/report/?secret={secret}"
+    auth = {"X-Secret": secret}
+
+    with _Node("leader") as leader, _Node("follower", leader.url) as f1, _Node("follower", leader.url) as f2:
+        lconn = await leader.connection()
+        fconns = [await f1.connection(), await f2.connection()]
+        for conn in fconns:
+            await _wait_version(conn, secret, 0)
+
+        # ---- propagation: 状态切换到 follower SSE ----
+        streams = []
+        for node in (f1, f2):
+            stream = await (await node.connection()).stream("/api/status/events")
+            await stream.next_event()  # 初始 snapshot
+            streams.append(stream)
+        samples = []
+        for n in range(switches):
+            sent = time.perf_counter()
+            r = await lconn.request("GET", f"/api/status/set?status={n % 2}", headers=auth)
+            assert r.status == 200, r.body
+            for stream in streams:
+                samples.append(await _next_event(stream, "status_updated") - sent)
+        for stream in streams:
+            await stream.close()
+        reporter.emit(make_record(
+            "replication", "uvicorn", {"case": "propagation", "followers": 2, "switches": switches},
+            latency_summary(samples),
+        ))
+
+        # ---- converge: 批量上报后 follower 追上 leader ----
+        sessions = [await leader.connection() for _ in range(concurrency)]
+
+        async def worker(offset, sess):
+            for i in range(offset, devices, concurrency):
+                r = await sess.request("POST", report, report_body(f"dev-{i}", i))
+                assert r.status == 200, r.body
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i, s) for i, s in enumerate(sessions)))
+        acked = time.perf_counter()
+        for s in sessions:
+            await s.close()
+        version = (await _status(lconn, secret))["version"]
+        lags = [await _wait_version(conn, secret, version) for conn in fconns]
+        reporter.emit(make_record(
+            "replication", "uvicorn", {"case": "converge", "followers": 2, "devices": devices},
+            {
+                "reports_per_sec": round(devices / (acked - start), 1),
+                "converge_ms": round((time.perf_counter() - acked) * 1000, 2),
+                "first_follower_ms": round(lags[0] * 1000, 2),
+            },
+        ))
+
+        # ---- 一致性与只读 ----
+        expected = await _devices(lconn, secret)
+        assert len(expected[2]) == devices
+        for conn in fconns:
+            assert await _devices(conn, secret) == expected, "follower diverged from leader"
+            r = await conn.request("POST", report, report_body("dev-0", 0))
+            assert r.status == 409, r.status
+
+        # ---- catchup: 新 follower 全量同步 ----
+        with _Node("follower", leader.url) as f3:
+            started = time.perf_counter()
+            conn = await f3.connection()
+            await _wait_version(conn, secret, version)
+            elapsed = time.perf_counter() - started
+            assert await _devices(conn, secret) == expected, "late follower diverged from leader"
+            await conn.close()
+        reporter.emit(make_record(
+            "replication", "uvicorn", {"case": "catchup", "devices": devices},
+            {"snapshot_sync_ms": round(elapsed * 1000, 2)},
+        ))
+
+        await lconn.close()
+        for conn in fconns:
+            await conn.close()
+
+
+if __name__ == "__main__":
+    serve(*sys.argv[1:])
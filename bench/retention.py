@@ -0,0 +1,141 @@
+"""
+历史保留与降采样基准
+
+- retention:
+  - downsample: devices 台设备 × days 天、每分钟一条的历史（前 30 分钟使用中，电量逐渐下降），
+    retention_days=1 / minute_days=2: 最近一天保留原始数据，再往前一天降为分钟汇总，更早的合并为小时汇总。
+    记录 Data.maintain_history() 的总耗时、每一步（写入者内）的耗时分布，
+    以及同时进行的 /api/device/report 的延迟（降采样期间上报不会被长时间阻塞）
+  同时校验分钟 / 小时汇总的 using 比例与电量范围和生成的数据一致，以及导出 / 导入后汇总不变
+"""
+
+import asyncio
+import time
+
+from bench.common import latency_summary, make_record, scenario
+from bench.hot_paths import report_body
+
+
+def _battery(minute: int) -> int:
+    return 100 - (minute // 6) % 100
+
+
+def _fill(store, devices: int, days: int, start: float):
+    """每分钟一条；前 30 分钟使用中，应用每 15 分钟切换（切换时为索引条目，其余为采样）"""
+    for minute in range(days * 1440):
+        ts = start + minute * 60
+        using = minute % 60 < 30
+        app = f"app-{(minute // 15) % 4}.exe"
+        indexed = minute % 15 == 0
+        for d in range(devices):
+            store.add(ts, f"dev-{d}", app, f"{app} - window", using, _battery(minute), indexed)
+
+
+def _check(store, start: float):
+    minutes = store.rollups.series("minute", "dev-0")
+    hours = store.rollups.series("hour", "dev-0")
+    assert minutes is not None and hours is not None
+    for row in minutes.rows(0, float("inf"), 1 << 30)[:-1]:  # 最后一分钟还在累计中
+        minute = int(row["time"] - start) // 60
+        assert row["using"] == (1.0 if minute % 60 < 30 else 0.0), row
+        assert row["battery_min"] == row["battery_max"] == _battery(minute), row
+        assert row["seconds"] == 60, row
+    for row in hours.rows(0, float("inf"), 1 << 30):
+        first = int(row["time"] - start) // 60
+        batteries = [_battery(m) for m in range(first, first + 60)]
+        assert abs(row["using"] - 0.5) < 1e-6, row
+        assert (row["battery_min"], row["battery_max"]) == (min(batteries), max(batteries)), row
+    return len(minutes), len(hours)
+
+
+@scenario("retention", transports=("asgi",))
+async def bench_retention(target, reporter, quick):
+    import main
+    from history import HistoryStore, parse_entry
+    from retention import parse_row
+
+    devices = 20 if quick else 100
+    days = 3
+    data = main.data_store
+    settings = main.config.history.model_copy(update={"enabled": True, "retention_days": 1, "minute_days": 2})
+    previous = data.history
+    data.history = store = HistoryStore(settings)
+    try:
+        now = time.time()
+        start = now - now % 3600 - days * 86400
+        _fill(store, devices, days, start)
+        raw_before = len(store)
+
+        # 记录每一步在写入者内的耗时
+        steps = []
+        retention_step = store.retention_step
+
+        def timed_step(*args):
+            t0 = time.perf_counter()
+            try:
+                return retention_step(*args)
+            finally:
+                steps.append(time.perf_counter() - t0)
+
+        store.retention_step = timed_step
+
+        sessions = [await target.session() for _ in range(8)]
+        path = f"/api/device/report/?secret={target.secret}"
+        latencies = []
+        done = asyncio.Event()
+
+        async def worker(offset, sess):
+            i = offset
+            while not done.is_set():
+                t0 = time.perf_counter()
+                r = await sess.request("POST", path, report_body(f"retention-{i % 100}", i))
+                latencies.append(time.perf_counter() - t0)
+                assert r.status == 200, r.body
+                i += len(sessions)
+
+        workers = [asyncio.create_task(worker(i, s)) for i, s in enumerate(sessions)]
+        t0 = time.perf_counter()
+        await data.maintain_history()
+        elapsed = time.perf_counter() - t0
+        done.set()
+        await asyncio.gather(*workers)
+        for s in sessions:
+            await s.close()
+        minute_rows, hour_rows = _check(store, start)
+        sess = await target.session()
+        r = await sess.request(
+            "GET", f"/api/history/rollups?device=dev-0&resolution=hour&limit={hour_rows}", headers={"X-Secret": target.secret},
+        )
+        assert r.status == 200 and r.json()["count"] == hour_rows, r.body
+        await sess.close()
+        reporter.emit(make_record(
+            "retention", target.transport, {"case": "downsample", "devices": devices, "days": days},
+            {
+                "raw_before": raw_before,
+                "raw_after": len(store),
+                "minute_rows": minute_rows * devices,
+                "hour_rows": hour_rows * devices,
+                "maintain_ms": round(elapsed * 1000, 1),
+                "steps": len(steps),
+                "step_p50_us": latency_summary(steps)["p50_us"],
+                "step_max_us": latency_summary(steps)["max_us"],
+                "reports_during": len(latencies),
+                **{"report_" + k: v for k, v in latency_summary(latencies).items()},
+            },
+        ))
+
+        # ---- 导出 / 导入后汇总不变 ----
+        records = list(store.export_records())
+        restored = HistoryStore(settings)
+        for item in records:
+            if item["type"] == "rollup":
+                restored.import_rollup(parse_row(item))
+        restored.import_entries([parse_entry(item) for item in records if item["type"] == "history"], now)
+        for resolution in ("minute", "hour"):
+            a = store.rollups.series(resolution, "dev-0")
+            b = restored.rollups.series(resolution, "dev-0")
+            # 导入时早于保留期的原始数据会继续降采样，只比较已有汇总的范围
+            end = a.times[-1]
+            assert a.rows(0, end, 1 << 30) == b.rows(0, end, 1 << 30), resolution
+    finally:
+        data.history = previous
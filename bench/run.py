@@ -0,0 +1,65 @@
+"""
+运行基准测试
+
+    python -m bench.run                       # 全部场景，进程内 ASGI + 本地 uvicorn
+    python -m bench.run --quick -t asgi       # 快速模式，只跑进程内
+    python -m bench.run -s ingest,query -o results.jsonl
+
+结果以 JSON Lines 追加写入 --out 文件，用 bench/compare.py 对比两次运行。
+"""
+
+import argparse
+import asyncio
+import importlib
+import sys
+
+from bench.common import SCENARIOS, Reporter, Target, load_secret
+
+# 场景模块（导入即注册）
+MODULES = ["bench.hot_paths", "bench.actor", "bench.tenants", "bench.launch", "bench.replication", "bench.webhooks", "bench.analytics", "bench.search", "bench.retention", "bench.battery", "bench.export", "bench.classifier"]
+
+
+async def run(names, transports, reporter, quick):
+    secret = load_secret()
+    for name in names:
+        fn, supported = SCENARIOS[name]
+        for transport in transports:
+            if transport not in supported:
+                continue
+            async with Target(transport, secret) as target:
+                await fn(target, reporter, quick)
+
+
+def main(argv=None):
+    for mod in MODULES:
+        importlib.import_module(mod)
+
+    parser = argparse.ArgumentParser(description="Sleepy server benchmarks")
+    parser.add_argument("-s", "--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景名")
+    parser.add_argument("-t", "--transport", choices=["asgi", "uvicorn", "both"], default="both")
+    parser.add_argument("-o", "--out", help="追加写入结果的 JSONL 文件")
+    parser.add_argument("-q", "--quick", action="store_true", help="缩小规模，用于冒烟")
+    parser.add_argument("--list", action="store_true", help="列出可用场景")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (_, transports) in SCENARIOS.items():
+            print(f"{name:<16} {','.join(transports)}")
+        return 0
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    transports = ["asgi", "uvicorn"] if args.transport == "both" else [args.transport]
+
+    reporter = Reporter(args.out)
+    try:
+        asyncio.run(run(names, transports, reporter, args.quick))
+    finally:
+        reporter.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+设备历史全文检索基准
+
+- search:
+  - ingest: 开启历史时 HistoryStore.observe() 每次状态转换的开销、段合并耗时，以及 /api/device/report 的吞吐
+  - query: entries 条历史（中英文混合的窗口标题）上，/api/search 各类查询（词 / 前缀 / 短语 / 中文 / 时间范围）
+    的延迟，与逐条扫描全部标题的对比；同时校验命中数与扫描结果一致
+"""
+
+import asyncio
+import random
+import time
+from urllib.parse import quote
+
+from bench.common import latency_summary, make_record, scenario
+from bench.hot_paths import report_body
+
+APPS = ["Code.exe", "chrome.exe", "Zoom.exe", "WeChat.exe", "飞书.exe", "explorer.exe", "Spotify.exe", "腾讯会议.exe"]
+WORDS = [
+    "main.py", "sleepy", "README", "weekly", "sync", "standup", "review", "design", "release", "notes",
+    "YouTube", "GitHub", "issue", "pull", "request", "dashboard", "metrics", "budget", "planning", "retro",
+    "周例会", "项目评审", "会议室", "产品设计", "需求讨论", "文件传输助手", "工作群", "技术分享", "季度总结", "面试",
+]
+
+QUERIES = [
+    ("term", "zoom", lambda t: "zoom" in t.lower()),
+    ("prefix", "stand*", lambda t: any(w.lower().startswith("stand") for w in t.split())),
+    ("phrase", '"weekly sync"', lambda t: "weekly sync" in t.lower()),
+    ("cjk", "会议室", lambda t: "会议室" in t),
+    ("cjk_and_term", "周例会 zoom", lambda t: "周例会" in t and "zoom" in t.lower()),
+]
+
+
+def _corpus(n: int, start: float, seed: int = 7):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        app = rng.choice(APPS)
+        title = " ".join(rng.sample(WORDS, 3)) + f" - {app[:-4]} #{rng.randrange(1000)}"
+        rows.append((start + i * 2.0, f"dev-{i % 50}", app, title, True))
+    return rows
+
+
+@scenario("search", transports=("asgi",))
+async def bench_search(target, reporter, quick):
+    import main
+    from history import HistoryStore
+
+    entries = 50000 if quick else 500000
+    rounds = 30 if quick else 100
+    data = main.data_store
+    settings = main.config.history.model_copy(update={"enabled": True})
+    auth = {"X-Secret": target.secret}
+    previous = data.history
+    data.history = store = HistoryStore(settings)
+    try:
+        # ---- ingest ----
+        start = time.time() - entries * 2.0
+        rows = _corpus(entries, start)
+        t0 = time.perf_counter()
+        for row in rows:
+            store.add(*row)
+        add_cost = (time.perf_counter() - t0) / entries
+        segments_before = store.segments
+        t0 = time.perf_counter()
+        await data.maintain_history()
+        merge_ms = (time.perf_counter() - t0) * 1000
+
+        sessions = [await target.session() for _ in range(16)]
+        path = f"/api/device/report/?secret={target.secret}"
+        count = 2000 if quick else 10000
+
+        async def worker(offset, sess):
+            for i in range(offset, count, len(sessions)):
+                r = await sess.request("POST", path, report_body(f"search-{i % 100}", i))
+                assert r.status == 200, r.body
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(i, s) for i, s in enumerate(sessions)))
+        elapsed = time.perf_counter() - t0
+        for s in sessions:
+            await s.close()
+        reporter.emit(make_record(
+            "search", target.transport, {"case": "ingest", "entries": entries},
+            {
+                "add_us": round(add_cost * 1e6, 2),
+                "segments_before_merge": segments_before,
+                "segments_after_merge": store.segments,
+                "merge_ms": round(merge_ms, 1),
+                "http_reports_per_sec": round(count / elapsed, 1),
+            },
+        ))
+
+        # ---- query ----
+        sess = await target.session()
+        titles = [row[3] for row in rows]
+        cases = [(name, q, check, None) for name, q, check in QUERIES]
+        # 最近 1% 的时间范围
+        recent = start + entries * 2.0 * 0.99
+        cases.append(("term_recent_1pct", "zoom", QUERIES[0][2], recent))
+        for name, q, check, lo in cases:
+            params = f"q={quote(q)}&limit=20" + (f"&from={lo}" if lo else "")
+            samples = []
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                r = await sess.request("GET", f"/api/search?{params}", headers=auth)
+                samples.append(time.perf_counter() - t0)
+                assert r.status == 200, r.body
+            # 逐条扫描作为对照，并校验命中数
+            t0 = time.perf_counter()
+            expected = [i for i, title in enumerate(titles) if check(title) and (lo is None or rows[i][0] >= lo)]
+            scan = time.perf_counter() - t0
+            r = await sess.request("GET", f"/api/search?{params.replace('limit=20', 'limit=500')}", headers=auth)
+            got = r.json()["hits"]
+            assert len(got) == min(500, len(expected)), (name, len(got), len(expected))
+            assert [h["time"] for h in got] == [rows[i][0] for i in reversed(expected)][:500], name
+            reporter.emit(make_record(
+                "search", target.transport, {"case": "query", "query": name, "entries": entries, "limit": 20},
+                {**latency_summary(samples), "matches": len(expected), "scan_ms": round(scan * 1000, 2)},
+            ))
+        r = await sess.request("GET", "/api/search?q=%22%22", headers=auth)
+        assert r.status == 400, r.status
+        await sess.close()
+    finally:
+        data.history = previous
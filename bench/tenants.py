@@ -0,0 +1,105 @@
+"""
+多租户基准
+
+- tenants: 一个进程加载数百个租户时，每个租户的内存占用（空租户 / 带少量设备），
+  以及首次访问（加载）与已加载租户的请求延迟
+"""
+
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from bench.common import latency_summary, make_record, scenario
+from bench.hot_paths import report_body
+
+TENANT_YAML = """\
+main:
+  secret: {secret}
+page:
+  title: {name}
+status:
+  status_list:
+    - id: 0
+      name: 在线
+    - id: 1
+      name: 离线
+"""
+
+
+@scenario("tenants", transports=("asgi",))
+async def bench_tenants(target, reporter, quick):
+    import main
+    from tenants import TenantRegistry
+
+    count = 200 if quick else 1000
+    devices = 5
+    secret = "tenant-secret"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in range(count):
+            (Path(tmp) / f"t{n}.yaml").write_text(TENANT_YAML.format(secret=secret, name=f"t{n}"), encoding="utf-8")
+
+        settings = main.config.tenants.model_copy(update={
+            "enabled": True, "mode": "path", "directory": tmp, "max_loaded": count,
+        })
+        previous = main.tenant_registry
+        main.tenant_registry = TenantRegistry(main.config.model_copy(update={"tenants": settings}))
+        sess = await target.session()
+        try:
+            # 空租户: 加载（第一次请求）
+            gc.collect()
+            tracemalloc.start()
+            base = tracemalloc.get_traced_memory()[0]
+            load_latencies = []
+            for n in range(count):
+                t0 = time.perf_counter()
+                r = await sess.request("GET", f"/t/t{n}/api/status/query")
+                load_latencies.append(time.perf_counter() - t0)
+                assert r.status == 200, r.body
+            gc.collect()
+            after_load = tracemalloc.get_traced_memory()[0]
+
+            # 每个租户上报几台设备
+            for n in range(count):
+                for d in range(devices):
+                    r = await sess.request("POST", f"/t/t{n}/api/device/report/?secret={secret}", report_body(f"dev-{d}", d))
+                    assert r.status == 200, r.body
+            gc.collect()
+            after_devices = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            warm_latencies = []
+            for n in range(count):
+                t0 = time.perf_counter()
+                r = await sess.request("GET", f"/t/t{n}/api/status/query")
+                warm_latencies.append(time.perf_counter() - t0)
+                assert r.status == 200 and len(r.json()["device"]) == devices, r.body
+
+            root_latencies = []
+            for _ in range(count):
+                t0 = time.perf_counter()
+                await sess.request("GET", "/api/status/query")
+                root_latencies.append(time.perf_counter() - t0)
+        finally:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            await sess.close()
+            await main.tenant_registry.stop()
+            main.tenant_registry = previous
+
+    reporter.emit(make_record(
+        "tenants", target.transport,
+        {"tenants": count, "devices_per_tenant": devices},
+        {
+            "bytes_per_empty_tenant": round((after_load - base) / count, 1),
+            "bytes_per_tenant": round((after_devices - base) / count, 1),
+        },
+    ))
+    for case, values in (("first_request", load_latencies), ("loaded", warm_latencies), ("root", root_latencies)):
+        reporter.emit(make_record(
+            "tenants", target.transport,
+            {"tenants": count, "case": case},
+            latency_summary(values),
+        ))
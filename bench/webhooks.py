@@ -0,0 +1,208 @@
+"""
+Webhook 推送基准（本地 HTTP 接收端代替真实的机器人 / 家庭自动化服务）
+
+- webhooks:
+  - burst: 连续切换状态，窗口内的事件合并为少数几次推送；接收端很慢时 /api/status/set 的延迟不受影响
+  - paced: 每隔一段时间切换一次，事件发布到接收端收到的延迟，以及复用的连接数
+  - outage: 接收端先返回 503，恢复后重试队列把全部事件送达；中途重启推送器（持久化队列）不丢事件
+  每次推送都校验 HMAC 签名
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import time
+
+from bench.common import latency_summary, make_record, scenario
+
+SECRET = "webhook-secret"
+
+
+class Receiver:
+    """极简 HTTP/1.1 接收端: 支持 keep-alive，可模拟故障和慢响应"""
+
+    def __init__(self):
+        self.server = None
+        self.port = 0
+        self.connections = 0
+        self.deliveries = []  # (收到时间, 请求体)
+        self.fail_until = 0.0
+        self.delay = 0.0
+        self.bad_signatures = 0
+        self.failures = []  # 返回 503 的时间
+        # 不为空时原样发回这段响应（模拟不合规的接收端），并关闭连接
+        self.reply = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/hook"
+
+    def events(self):
+        return [e for _, body in self.deliveries for e in body["events"]]
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b""):
+                        break
+                    k, _, v = h.decode().partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                raw = await reader.readexactly(int(headers.get("content-length", 0)))
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                if self.reply is not None:
+                    writer.write(self.reply)
+                    await writer.drain()
+                    return
+                if time.time() < self.fail_until:
+                    status = 503
+                    self.failures.append(time.time())
+                else:
+                    status = 200
+                    expected = "sha256=" + hmac.new(
+                        SECRET.encode(), headers["x-sleepy-timestamp"].encode() + b"." + raw, hashlib.sha256
+                    ).hexdigest()
+                    if not hmac.compare_digest(expected, headers.get("x-sleepy-signature", "")):
+                        self.bad_signatures += 1
+                    self.deliveries.append((time.time(), json.loads(raw)))
+                writer.write(f"HTTP/1.1 {status} X\r\nContent-Length: 0\r\n\r\n".encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _dispatcher(receiver: Receiver, coalesce: float, queue_file=None):
+    import main
+    from config.schema import WebhookTarget
+    from webhooks import WebhookDispatcher
+
+    settings = main.config.webhooks.model_copy(update={
+        "targets": [WebhookTarget(name="bench", url=receiver.url, secret=SECRET, coalesce=coalesce, max_batch=1000)],
+        "retry_base": 0.05,
+        "retry_max": 0.2,
+        "queue_file": queue_file,
+    })
+    return WebhookDispatcher(main.config.model_copy(update={"webhooks": settings}))
+
+
+async def _attach(dispatcher):
+    import main
+
+    await dispatcher.start()
+    main.data_store.add_listener(dispatcher.on_event)
+
+
+async def _detach(dispatcher):
+    import main
+
+    main.data_store.remove_listener(dispatcher.on_event)
+    await dispatcher.stop()
+
+
+async def _until(cond, timeout: float = 20):
+    start = time.perf_counter()
+    while not cond():
+        if time.perf_counter() - start > timeout:
+            raise AssertionError("webhook deliveries did not arrive in time")
+        await asyncio.sleep(0.005)
+    return time.perf_counter() - start
+
+
+@scenario("webhooks", transports=("asgi",))
+async def bench_webhooks(target, reporter, quick):
+    switches = 100 if quick else 500
+    paced = 20 if quick else 100
+    sess = await target.session()
+    auth = {"X-Secret": target.secret}
+
+    async def switch(n):
+        t0 = time.perf_counter()
+        r = await sess.request("GET", f"/api/status/set?status={n % 2}", headers=auth)
+        assert r.status == 200, r.body
+        return time.perf_counter() - t0
+
+    # ---- burst: 慢接收端 + 连续切换 ----
+    receiver = await Receiver().start()
+    receiver.delay = 0.2
+    dispatcher = _dispatcher(receiver, coalesce=0.5)
+    await _attach(dispatcher)
+    set_latencies = [await switch(n) for n in range(switches)]
+    await _until(lambda: len(receiver.events()) >= switches)
+    versions = [e["version"] for e in receiver.events()]
+    assert versions == sorted(versions) and receiver.bad_signatures == 0
+    reporter.emit(make_record(
+        "webhooks", target.transport, {"case": "burst", "switches": switches, "receiver_delay_ms": 200},
+        {"deliveries": len(receiver.deliveries), "connections": receiver.connections,
+         **{"set_" + k: v for k, v in latency_summary(set_latencies).items()}},
+    ))
+    await _detach(dispatcher)
+    await receiver.close()
+
+    # ---- paced: 逐个事件的推送延迟与连接复用 ----
+    receiver = await Receiver().start()
+    dispatcher = _dispatcher(receiver, coalesce=0.01)
+    await _attach(dispatcher)
+    delays = []
+    for n in range(paced):
+        sent = time.time()
+        await switch(n)
+        await _until(lambda: len(receiver.deliveries) > n)
+        delays.append(receiver.deliveries[n][0] - sent)
+        await asyncio.sleep(0.02)
+    assert receiver.bad_signatures == 0
+    reporter.emit(make_record(
+        "webhooks", target.transport, {"case": "paced", "switches": paced, "coalesce_ms": 10},
+        {"deliveries": len(receiver.deliveries), "connections": receiver.connections, **latency_summary(delays)},
+    ))
+    await _detach(dispatcher)
+    await receiver.close()
+
+    # ---- outage: 接收端故障期间重启推送器，恢复后全部送达 ----
+    with tempfile.TemporaryDirectory() as tmp:
+        queue_file = os.path.join(tmp, "webhooks.queue.jsonl")
+        receiver = await Receiver().start()
+        receiver.fail_until = time.time() + 3600
+        dispatcher = _dispatcher(receiver, coalesce=0.01, queue_file=queue_file)
+        await _attach(dispatcher)
+        for n in range(paced):
+            await switch(n)
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.3)
+        queued = len(dispatcher.queue)
+        await _detach(dispatcher)
+
+        dispatcher = _dispatcher(receiver, coalesce=0.01, queue_file=queue_file)
+        await _attach(dispatcher)
+        receiver.fail_until = 0
+        recovered = await _until(lambda: len(receiver.events()) >= paced)
+        assert len(dispatcher.queue) == 0 or await _until(lambda: len(dispatcher.queue) == 0) >= 0
+        assert receiver.bad_signatures == 0
+        reporter.emit(make_record(
+            "webhooks", target.transport, {"case": "outage", "switches": paced},
+            {"queued_before_restart": queued, "delivered_events": len(receiver.events()),
+             "recovery_ms": round(recovered * 1000, 2)},
+        ))
+        await _detach(dispatcher)
+        await receiver.close()
+    await sess.close()
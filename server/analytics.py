@@ -0,0 +1,296 @@
+"""
+应用使用时长统计（增量维护）
+
+每台设备保留一个进行中的区间: (应用名, 开始时间, 最后一次上报时间)。写入者应用上报时:
+- 仍在使用同一个应用，且距上次上报不超过 max_gap 秒: 只把区间延长到本次上报
+- 否则（切换了应用 / 不再使用 / 上报中断过）: 结束当前区间，按天、按小时拆分后累加到
+  该天的 apps[设备][应用] 与 hours[设备][小时]，再按本次上报开启新区间
+  上报中断超过 max_gap 时，区间只算到最后一次上报为止
+
+每天另外维护所有设备的合计，查询只合并范围内每天的合计（或指定设备的累加表）再加上
+仍在进行中的区间，与历史上报的数量和设备数无关。
+内存有界: 只保留最近 retention_days 天；每天每台设备最多 max_apps 个应用，其余计入 OTHER。
+日期与小时按 analytics.timezone 划分（为空则使用服务器本地时区）。
+
+导出 / 状态文件中每天一行（见 backup.py）:
+    {"type": "analytics", "day": "2026-10-19", "apps": {设备: {应用: 秒}}, "hours": {设备: [24 个秒数]}}
+"""
+
+import datetime
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from records import DeviceRecord
+
+OTHER = "(other)"
+
+_DAYS = re.compile(r"^(\d+)d$")
+
+
+class _Open:
+    """设备当前的使用区间"""
+
+    __slots__ = ("app", "start", "last")
+
+    def __init__(self, app: str, start: float):
+        self.app = app
+        self.start = start
+        self.last = start
+
+
+class _Day:
+    __slots__ = ("apps", "hours", "total_apps", "total_hours")
+
+    def __init__(self):
+        # 设备 -> 应用 -> 秒
+        self.apps: Dict[str, Dict[str, float]] = {}
+        # 设备 -> 24 个小时的使用秒数
+        self.hours: Dict[str, List[float]] = {}
+        # 所有设备合计，不按设备过滤的查询只读这两项
+        self.total_apps: Dict[str, float] = {}
+        self.total_hours: List[float] = [0.0] * 24
+
+    def add_apps(self, apps: Dict[str, float], sign: float = 1.0):
+        totals = self.total_apps
+        for app, seconds in apps.items():
+            value = totals.get(app, 0.0) + sign * seconds
+            if value > 1e-6:
+                totals[app] = value
+            else:
+                totals.pop(app, None)
+
+    def add_hours(self, hours: List[float], sign: float = 1.0):
+        totals = self.total_hours
+        for hour, seconds in enumerate(hours):
+            totals[hour] += sign * seconds
+
+
+class AppAnalytics:
+    """只由写入者修改；查询在事件循环上同步完成，读到的总是某次提交之后的状态"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.max_gap = settings.max_gap
+        self.tz = _timezone(settings.timezone)
+        self._open: Dict[str, _Open] = {}
+        self._days: Dict[int, _Day] = {}
+
+    # ---- 日期 ----
+
+    def day_of(self, ts: float) -> int:
+        return datetime.datetime.fromtimestamp(ts, self.tz).toordinal()
+
+    def today(self, now: float) -> int:
+        return self.day_of(now)
+
+    def _pieces(self, start: float, end: float) -> Iterator[Tuple[int, int, float]]:
+        """把 [start, end) 按本地时间的整点拆成 (日, 小时, 秒)"""
+        while start < end:
+            local = datetime.datetime.fromtimestamp(start, self.tz)
+            boundary = local.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+            stop = min(end, boundary.timestamp())
+            if stop <= start:  # 夏令时切换等导致的异常边界
+                stop = end
+            yield local.toordinal(), local.hour, stop - start
+            start = stop
+
+    # ---- 写入（写入者调用） ----
+
+    def observe(self, record: DeviceRecord):
+        """设备状态更新（上报 / 复制 / 导入）后调用"""
+        now = record.last_seen
+        # 没有上报 is_active（Unknown）时按正在使用计，只有明确未在使用才结束区间
+        app = record.app_name if record.using is not False else None
+        current = self._open.get(record.id)
+        if current is not None:
+            if app == current.app and 0 <= now - current.last <= self.max_gap:
+                current.last = now
+                return
+            self._close(record.id, current, now)
+        if app is not None:
+            self._open[record.id] = _Open(app, now)
+
+    def discard(self, device_id: str, now: float):
+        """设备被删除: 结束进行中的区间（已累计的时长保留）"""
+        current = self._open.pop(device_id, None)
+        if current is not None:
+            self._close(device_id, current, now)
+
+    def discard_all(self, now: float):
+        """清空设备: 结束全部进行中的区间"""
+        for device_id, current in list(self._open.items()):
+            self._close(device_id, current, now)
+
+    def retain(self, alive):
+        """丢弃已不存在的设备的区间（复制全量同步之后，alive 为设备存储）"""
+        for device_id in [d for d in self._open if d not in alive]:
+            del self._open[device_id]
+
+    def _close(self, device_id: str, interval: _Open, now: float):
+        end = now if 0 <= now - interval.last <= self.max_gap else interval.last
+        self._add(device_id, interval.app, interval.start, end)
+        self._open.pop(device_id, None)
+
+    def _add(self, device_id: str, app: str, start: float, end: float):
+        for day, hour, seconds in self._pieces(start, end):
+            stats = self._days.get(day)
+            if stats is None:
+                stats = self._days[day] = _Day()
+                self._expire(max(self._days))
+            apps = stats.apps.setdefault(device_id, {})
+            key = app if app in apps or len(apps) < self.settings.max_apps else OTHER
+            apps[key] = apps.get(key, 0.0) + seconds
+            stats.total_apps[key] = stats.total_apps.get(key, 0.0) + seconds
+            hours = stats.hours.get(device_id)
+            if hours is None:
+                hours = stats.hours[device_id] = [0.0] * 24
+            hours[hour] += seconds
+            stats.total_hours[hour] += seconds
+
+    def _expire(self, newest: int):
+        oldest = newest - self.settings.retention_days + 1
+        for day in [d for d in self._days if d < oldest]:
+            del self._days[day]
+
+    # ---- 查询 ----
+
+    def parse_range(self, value: str, now: float) -> Tuple[int, int]:
+        """today / yesterday / 7d / 2026-10-01 / 2026-10-01..2026-10-07 -> (首日, 末日)
+
+        末日不晚于今天；格式错误或首日早于保留期时抛出 ValueError
+        """
+        today = self.today(now)
+        value = (value or "today").strip()
+        match = _DAYS.match(value)
+        if value == "today":
+            first = last = today
+        elif value == "yesterday":
+            first = last = today - 1
+        elif match:
+            first, last = today - int(match.group(1)) + 1, today
+        else:
+            start, _, end = value.partition("..")
+            try:
+                first = datetime.date.fromisoformat(start).toordinal()
+                last = datetime.date.fromisoformat(end).toordinal() if end else first
+            except ValueError:
+                raise ValueError(f"Invalid range: {value!r}")
+        last = min(last, today)  # 未来的日期没有数据
+        if last < first:
+            raise ValueError(f"Invalid range: {value!r}")
+        if today - first >= self.settings.retention_days:
+            raise ValueError(f"Range starts before the {self.settings.retention_days}-day retention window")
+        return first, last
+
+    def _open_pieces(self, now: float, first: int, last: int, device: Optional[str]):
+        """进行中的区间（算到 now，上报中断超过 max_gap 的只算到最后一次上报）"""
+        items = [(device, self._open[device])] if device in self._open else [] if device else self._open.items()
+        for device_id, interval in items:
+            end = now if now - interval.last <= self.max_gap else interval.last
+            for day, hour, seconds in self._pieces(interval.start, end):
+                if first <= day <= last:
+                    yield device_id, interval.app, day, hour, seconds
+
+    def apps(self, first: int, last: int, now: float, device: Optional[str] = None) -> Dict[str, float]:
+        """范围内每个应用的使用秒数"""
+        totals: Dict[str, float] = {}
+        for day in range(first, last + 1):
+            stats = self._days.get(day)
+            if stats is None:
+                continue
+            apps = stats.apps.get(device, {}) if device else stats.total_apps
+            for app, seconds in apps.items():
+                totals[app] = totals.get(app, 0.0) + seconds
+        for _, app, _, _, seconds in self._open_pieces(now, first, last, device):
+            totals[app] = totals.get(app, 0.0) + seconds
+        return totals
+
+    def heatmap(self, first: int, last: int, now: float, device: Optional[str] = None) -> Dict[int, List[float]]:
+        """范围内每天 24 个小时的使用秒数"""
+        out = {day: [0.0] * 24 for day in range(first, last + 1)}
+        for day in out:
+            stats = self._days.get(day)
+            if stats is None:
+                continue
+            hours = stats.hours.get(device) if device else stats.total_hours
+            if hours is not None:
+                out[day] = list(hours)
+        for _, _, day, hour, seconds in self._open_pieces(now, first, last, device):
+            out[day][hour] += seconds
+        return out
+
+    # ---- 导出 / 导入 ----
+
+    def export_records(self) -> List[Dict[str, Any]]:
+        """每天一条记录；进行中的区间算到最后一次上报（不修改内部状态）"""
+        days: Dict[int, Tuple[Dict, Dict]] = {}
+        for day, stats in self._days.items():
+            days[day] = (
+                {d: dict(apps) for d, apps in stats.apps.items()},
+                {d: list(hours) for d, hours in stats.hours.items()},
+            )
+        for device_id, interval in self._open.items():
+            for day, hour, seconds in self._pieces(interval.start, interval.last):
+                apps, hours = days.setdefault(day, ({}, {}))
+                per_app = apps.setdefault(device_id, {})
+                per_app[interval.app] = per_app.get(interval.app, 0.0) + seconds
+                hours.setdefault(device_id, [0.0] * 24)[hour] += seconds
+        return [
+            {"type": "analytics", "day": datetime.date.fromordinal(day).isoformat(), "apps": apps, "hours": hours}
+            for day, (apps, hours) in sorted(days.items())
+        ]
+
+    def import_record(self, item: Dict[str, Any], now: float):
+        """导入 export_records() 的一条记录: 按设备覆盖当天的数据（重复导入同一份结果不变）"""
+        day = parse_record(item)
+        if self.today(now) - day >= self.settings.retention_days:
+            return
+        stats = self._days.get(day)
+        if stats is None:
+            stats = self._days[day] = _Day()
+        for device_id, apps in item.get("apps", {}).items():
+            # 导出时进行中的区间已算到最后一次上报，之后只再累加此后的部分
+            current = self._open.get(device_id)
+            if current is not None:
+                current.start = current.last
+            old = stats.apps.get(device_id)
+            if old is not None:
+                stats.add_apps(old, -1.0)
+            stats.apps[device_id] = {app: float(seconds) for app, seconds in apps.items()}
+            stats.add_apps(stats.apps[device_id])
+        for device_id, hours in item.get("hours", {}).items():
+            old = stats.hours.get(device_id)
+            if old is not None:
+                stats.add_hours(old, -1.0)
+            stats.hours[device_id] = [float(seconds) for seconds in hours]
+            stats.add_hours(stats.hours[device_id])
+
+
+def parse_record(item: Dict[str, Any]) -> int:
+    """校验一条 analytics 记录，返回日期序号；不合法时抛出 ValueError"""
+    try:
+        day = datetime.date.fromisoformat(item["day"]).toordinal()
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("invalid analytics day")
+    apps, hours = item.get("apps", {}), item.get("hours", {})
+    if not isinstance(apps, dict) or not isinstance(hours, dict):
+        raise ValueError("invalid analytics record")
+    for per_app in apps.values():
+        if not isinstance(per_app, dict) or not all(
+            isinstance(k, str) and isinstance(v, (int, float)) and not isinstance(v, bool) for k, v in per_app.items()
+        ):
+            raise ValueError("invalid analytics apps")
+    for row in hours.values():
+        if not isinstance(row, list) or len(row) != 24 or not all(
+            isinstance(v, (int, float)) and not isinstance(v, bool) for v in row
+        ):
+            raise ValueError("invalid analytics hours")
+    return day
+
+
+def _timezone(name: Optional[str]):
+    if not name:
+        return None  # 服务器本地时区
+    from zoneinfo import ZoneInfo
+
+    return ZoneInfo(name)
@@ -0,0 +1,285 @@
+"""
+状态备份: 流式导出 / 导入
+
+格式为 NDJSON（每行一个 JSON 对象），可整体 gzip 压缩；第一行必须是 header:
+    {"type": "header", "format": "sleepy-state", "version": 1, "created": ..., "devices": N}
+    {"type": "status", "status_id": ..., "last_updated": ..., "private": ..., "switch_count": ..., "version": ...}
+    {"type": "device", "id": ..., "name": ..., ...}      # DeviceRecord.as_dict()
+    ...
+    {"type": "analytics", "day": ..., ...}               # 应用使用时长（analytics.py），每天一行
+    ...
+    {"type": "history", "device": ..., "time": ..., ...} # 设备历史（history.py，启用时），每条一行
+    ...
+    {"type": "rollup", "resolution": "minute", ...}      # 降采样后的历史汇总（retention.py），每行一个时间桶
+    ...
+    {"type": "end", "devices": N}
+
+- 导出只读一个不可变快照，逐条编码，内存占用与设备数无关
+- 导入逐行解析，设备按 IMPORT_BATCH 条一批经写入者应用，任何时刻只持有一批
+- 不认识的记录类型直接跳过，以后可以追加新的类型（如历史数据）而不改版本号；
+  只有不兼容的改动才提升 VERSION
+"""
+
+import json
+import math
+import os
+import tempfile
+import time
+import zlib
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List
+
+from encoding import dumps
+from state import Snapshot
+
+FORMAT = "sleepy-state"
+VERSION = 1
+
+# 导出时每个分块包含的行数 / 导入时每批提交给写入者的设备数（历史记录同样）
+EXPORT_CHUNK = 512
+IMPORT_BATCH = 512
+
+# 单行的最大长度，超出视为格式错误（防止没有换行的输入占满内存）
+MAX_LINE = 1 << 20
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+class BackupFormatError(ValueError):
+    """备份内容不是可识别的格式，或某一行不合法"""
+
+
+def _line(obj: Dict[str, Any]) -> bytes:
+    return dumps(obj) + b"\n"
+
+
+def export_lines(snap: Snapshot, extra: Iterable[Dict[str, Any]] = ()) -> Iterator[bytes]:
+    """按 EXPORT_CHUNK 行一块生成快照的 NDJSON
+
+    extra: 设备之后追加的其他记录（Data.extra_records()，须在事件循环上与 snap 同时取得）
+    """
+    devices = snap.devices
+    yield _line({
+        "type": "header",
+        "format": FORMAT,
+        "version": VERSION,
+        "created": time.time(),
+        "devices": len(devices),
+    }) + _line({
+        "type": "status",
+        "status_id": snap.status_id,
+        "last_updated": snap.last_updated,
+        "private": snap.private,
+        "switch_count": snap.switch_count,
+        "version": snap.version,
+    })
+    chunk: List[bytes] = []
+    for record in devices:
+        chunk.append(_line({"type": "device", **record.as_dict()}))
+        if len(chunk) >= EXPORT_CHUNK:
+            yield b"".join(chunk)
+            chunk = []
+    for item in extra:
+        chunk.append(_line(item))
+        if len(chunk) >= EXPORT_CHUNK:
+            yield b"".join(chunk)
+            chunk = []
+    chunk.append(_line({"type": "end", "devices": len(devices)}))
+    yield b"".join(chunk)
+
+
+def gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip 头
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def save(snap: Snapshot, path: str, extra: Iterable[Dict[str, Any]] = ()):
+    """把快照写入 gzip 压缩的状态文件（先写临时文件再原子替换，中途失败不会损坏旧文件）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # 每次调用一个独立的临时文件: 同时进行的两次保存不会写进同一个文件
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in gzip_chunks(export_lines(snap, extra)):
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+async def _read_file(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1 << 16)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def load(data, path: str, status_count: int) -> Dict[str, Any]:
+    """从 save() 写出的状态文件恢复（替换现有设备）"""
+    return await import_stream(data, _read_file(path), status_count, replace=True)
+
+
+async def _split_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """把任意切分的字节流还原成行；开头是 gzip 魔数时边读边解压"""
+    decompressor = None
+    first = True
+    buf = b""
+    async for chunk in chunks:
+        if first and chunk:
+            first = False
+            if chunk.startswith(GZIP_MAGIC):
+                decompressor = zlib.decompressobj(31)
+        if decompressor is not None:
+            # 限制单次解压的输出，避免压缩炸弹一次性展开
+            chunk = decompressor.decompress(chunk, MAX_LINE)
+            while True:
+                buf += chunk
+                *lines, buf = buf.split(b"\n")
+                for line in lines:
+                    yield line
+                if len(buf) > MAX_LINE:
+                    raise BackupFormatError(f"Line longer than {MAX_LINE} bytes")
+                if not decompressor.unconsumed_tail:
+                    break
+                chunk = decompressor.decompress(decompressor.unconsumed_tail, MAX_LINE)
+            continue
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line
+        if len(buf) > MAX_LINE:
+            raise BackupFormatError(f"Line longer than {MAX_LINE} bytes")
+    if decompressor is not None:
+        buf += decompressor.flush()
+    for line in buf.split(b"\n"):
+        yield line
+
+
+def _status_number(item: Dict[str, Any], key: str, default, integer: bool, number: int):
+    """status 记录中的数值字段: 缺省 / null 时为 default；须为有限的数（不接受 bool），整数字段须为非负整数"""
+    value = item.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise BackupFormatError(f"line {number}: invalid {key} {value!r}")
+    if integer:
+        if not isinstance(value, int) or value < 0:
+            raise BackupFormatError(f"line {number}: invalid {key} {value!r}")
+        return value
+    return float(value)
+
+
+async def import_stream(data, chunks: AsyncIterator[bytes], status_count: int, replace: bool = True) -> Dict[str, Any]:
+    """从字节流导入状态，返回导入的统计
+
+    - replace: 读到 header 后先清空现有设备；否则按 id 合并（覆盖同 id 的设备）
+    - status_count: 状态列表的长度，用于校验 status_id
+    出错时抛出 BackupFormatError；此前已提交的批次保留（流式导入无法整体回滚）
+    """
+    header = None
+    ended = False
+    devices = 0
+    status = False
+    analytics = 0
+    history = 0
+    batch = []
+    history_batch = []
+    number = 0
+    async for raw in _split_lines(chunks):
+        number += 1
+        if not raw.strip():
+            continue
+        if ended:
+            raise BackupFormatError(f"line {number}: data after end record")
+        try:
+            item = json.loads(raw)
+            kind = item["type"]
+        except (ValueError, TypeError, KeyError):
+            raise BackupFormatError(f"line {number}: not a JSON record")
+
+        if header is None:
+            if kind != "header" or item.get("format") != FORMAT:
+                raise BackupFormatError("Not a sleepy state export (missing header)")
+            version = item.get("version")
+            if not isinstance(version, int) or version > VERSION:
+                raise BackupFormatError(f"Unsupported export version: {version}")
+            header = item
+            if replace:
+                await data.clear_devices()
+        elif kind == "device":
+            try:
+                batch.append(data.parse_record(item))
+            except ValueError as e:
+                raise BackupFormatError(f"line {number}: {e}")
+            if len(batch) >= IMPORT_BATCH:
+                devices += await data.import_devices(batch)
+                batch = []
+        elif kind == "status":
+            status_id = item.get("status_id")
+            if isinstance(status_id, bool) or not isinstance(status_id, int) or not 0 <= status_id < status_count:
+                raise BackupFormatError(f"line {number}: invalid status_id {status_id!r}")
+            await data.import_state(
+                status_id,
+                bool(item.get("private")),
+                _status_number(item, "switch_count", 0, True, number),
+                _status_number(item, "last_updated", None, False, number) or time.time(),
+                _status_number(item, "version", 0, True, number),
+            )
+            status = True
+        elif kind == "analytics":
+            try:
+                await data.import_analytics(item)
+            except ValueError as e:
+                raise BackupFormatError(f"line {number}: {e}")
+            analytics += 1
+        elif kind in ("history", "rollup"):
+            history_batch.append(item)
+            if len(history_batch) >= IMPORT_BATCH:
+                history += await _import_history(data, history_batch, number)
+                history_batch = []
+        elif kind == "end":
+            ended = True
+            if batch:
+                devices += await data.import_devices(batch)
+                batch = []
+            if history_batch:
+                history += await _import_history(data, history_batch, number)
+                history_batch = []
+            if item.get("devices") != devices:
+                raise BackupFormatError(f"Device count mismatch: end record says {item.get('devices')}, read {devices}")
+
+    if batch:
+        devices += await data.import_devices(batch)
+    if history_batch:
+        history += await _import_history(data, history_batch, number)
+    if header is None:
+        raise BackupFormatError("Empty input")
+    if not ended:
+        raise BackupFormatError(f"Truncated export: no end record after {devices} devices")
+    return {
+        "version": header["version"],
+        "devices": devices,
+        "status": status,
+        "analytics_days": analytics,
+        "history": history,
+    }
+
+
+async def _import_history(data, items: List[Dict[str, Any]], number: int) -> int:
+    try:
+        return await data.import_history(items)
+    except ValueError as e:
+        raise BackupFormatError(f"near line {number}: {e}")
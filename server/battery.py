@@ -0,0 +1,166 @@
+"""
+电量遥测
+
+上报里只有当前电量（整数百分比）和是否在充电，这里按设备做流式估计，每次上报 O(1):
+- 速率: 电量每变化一次，用「变化量 / 距上次变化的时间」作为一个样本，
+  按时间加权的 EWMA 平滑（半衰期 battery.half_life 秒，间隔越长的样本权重越大）；
+  电量长时间没有变化时，速率不可能高于 1% / 已经过的时间，预测时取两者的较小值
+- 充放电切换（battery_status 改变，未知时按变化方向推断）时重新开始估计
+- 预测: 放电时 电量 / 速率 = time_to_empty，充电时 (100 - 电量) / 速率 = time_to_full（秒，相对于 last_seen）
+- 序列: 每台设备最近 battery.series_points 个电量变化点，定长环形缓冲（array）
+
+阈值事件（battery_low，只在放电时）:
+- 电量从上向下越过 battery.thresholds 中的某个百分比（一次上报越过多个时只报最低的那个）
+- 预计剩余时间首次低于 battery.warn_minutes 分钟；开始充电后重新计算
+"""
+
+import math
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+CHARGING = 1
+DISCHARGING = -1
+UNKNOWN = 0
+
+_DIRECTIONS = {"True": CHARGING, "False": DISCHARGING}
+_STATES = {CHARGING: "charging", DISCHARGING: "discharging", UNKNOWN: None}
+
+
+class DeviceBattery:
+    """单台设备的电量估计（仅由写入者修改）"""
+
+    __slots__ = (
+        "percent", "direction", "changed_at", "rate", "samples", "warned",
+        "times", "values", "head", "estimate",
+    )
+
+    def __init__(self):
+        self.percent: Optional[int] = None
+        self.direction = UNKNOWN
+        # 上一次电量变化的时间；本轮充放电开始后还没见过变化时为 None
+        self.changed_at: Optional[float] = None
+        self.rate: Optional[float] = None  # %/秒，绝对值
+        self.samples = 0
+        self.warned = False
+        self.times = array("d")
+        self.values = array("b")
+        self.head = 0
+        self.estimate: Optional[Dict[str, Any]] = None
+
+    def _record(self, ts: float, percent: int, capacity: int):
+        if len(self.times) < capacity:
+            self.times.append(ts)
+            self.values.append(percent)
+        else:
+            self.times[self.head] = ts
+            self.values[self.head] = percent
+            self.head = (self.head + 1) % capacity
+
+    def series(self) -> List[Tuple[float, int]]:
+        """按时间从旧到新"""
+        order = list(range(self.head, len(self.times))) + list(range(self.head))
+        return [(self.times[i], self.values[i]) for i in order]
+
+    def observe(self, now: float, percent: int, status: Optional[str], settings) -> Optional[Tuple[str, int]]:
+        """更新估计，返回触发的阈值 (原因, 阈值)；没有触发时为 None"""
+        prev = self.percent
+        direction = _DIRECTIONS.get(status, UNKNOWN)
+        if direction == UNKNOWN and prev is not None:
+            direction = (CHARGING if percent > prev else DISCHARGING) if percent != prev else self.direction
+        if prev is None or direction != self.direction:
+            # 新一轮充放电: 之前的速率不再适用
+            self.direction = direction
+            self.changed_at = None if prev is None else now
+            self.rate = None
+            self.samples = 0
+            self.warned = False
+            self._record(now, percent, settings.series_points)
+        elif percent != prev:
+            delta = (percent - prev) * direction
+            elapsed = now - self.changed_at if self.changed_at is not None else 0.0
+            if delta > 0 and elapsed > 0:
+                sample = delta / elapsed
+                if self.rate is None:
+                    self.rate = sample
+                else:
+                    weight = 1.0 - math.exp(-elapsed * math.log(2) / settings.half_life)
+                    self.rate += weight * (sample - self.rate)
+                self.samples += 1
+            self.changed_at = now
+            self._record(now, percent, settings.series_points)
+        self.percent = percent
+        self.estimate = self._estimate(now, settings)
+
+        if self.direction != DISCHARGING or prev is None:
+            return None
+        crossed = [t for t in settings.thresholds if percent <= t < prev]
+        if crossed:
+            return "percent", min(crossed)
+        left = self.estimate["time_to_empty"] if self.estimate else None
+        if settings.warn_minutes > 0 and left is not None and left <= settings.warn_minutes * 60 and not self.warned:
+            self.warned = True
+            return "time_to_empty", int(settings.warn_minutes)
+        return None
+
+    def _estimate(self, now: float, settings) -> Optional[Dict[str, Any]]:
+        if self.direction == UNKNOWN:
+            return None
+        rate = self.rate
+        if rate is not None and self.samples >= settings.min_samples:
+            if self.changed_at is not None and now > self.changed_at:
+                rate = min(rate, 1.0 / (now - self.changed_at))
+        else:
+            rate = None
+        out: Dict[str, Any] = {
+            "state": _STATES[self.direction],
+            "rate": None if rate is None else round(rate * 3600 * self.direction, 3),  # %/小时，放电为负
+            "time_to_empty": None,
+            "time_to_full": None,
+        }
+        if rate:
+            if self.direction == DISCHARGING:
+                out["time_to_empty"] = round(self.percent / rate, 1)
+            elif self.percent < 100:
+                out["time_to_full"] = round((100 - self.percent) / rate, 1)
+        return out
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "percent": self.percent,
+            **(self.estimate or {"state": None, "rate": None, "time_to_empty": None, "time_to_full": None}),
+            "samples": self.samples,
+            "series": self.series(),
+        }
+
+
+class BatteryTracker:
+    """按设备 id 保存 DeviceBattery（仅由写入者修改）"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._devices: Dict[str, DeviceBattery] = {}
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def observe(self, device_id: str, now: float, percent: Optional[int], status: Optional[str]):
+        """-> (估计, 触发的阈值)；没有电量数据（或不在 0-100 之间）时为 (None, None)"""
+        if percent is None or not 0 <= percent <= 100:
+            return None, None
+        entry = self._devices.get(device_id)
+        if entry is None:
+            entry = self._devices[device_id] = DeviceBattery()
+        crossed = entry.observe(now, percent, status, self.settings)
+        return entry.estimate, crossed
+
+    def get(self, device_id: str) -> Optional[DeviceBattery]:
+        return self._devices.get(device_id)
+
+    def discard(self, device_id: str):
+        self._devices.pop(device_id, None)
+
+    def clear(self):
+        self._devices.clear()
+
+    def per_device(self) -> Dict[str, Dict[str, Any]]:
+        return {device_id: entry.as_dict() for device_id, entry in self._devices.items()}
@@ -0,0 +1,309 @@
+"""
+服务端窗口标题分类
+
+客户端原先各自写死 SKIPPED_NAMES / NOT_USING_NAMES 并逐个精确比较，改规则要重新部署每台设备；
+现在统一在 config.yaml 的 classifier.rules 中配置（改完重启服务端即可），上报进入写入队列之前分类:
+
+- 匹配方式: exact（整串相等）/ prefix（开头）/ keyword（包含）/ regex（re.search）
+- 默认区分大小写；ignore_case 为 true 时 exact / prefix / keyword 按 str.casefold() 比较，regex 加 re.IGNORECASE
+- 匹配字段: title（窗口标题，上报没有标题或标题为空时为应用名）/ app（应用名）
+- 动作（由写入者应用，见 apply()）:
+  - skip: 不采用这次上报的应用，设备保留之前的 active_app；电量、在线时间等照常更新
+  - not_using: 视为未在使用（is_active 为 Using / Unknown 时改为 Inactive）
+  - relabel: 应用名改为 label
+- 多条规则都匹配时取配置中靠前的那条
+
+编译: 每个字段的 exact / prefix / keyword 规则合并为一个 Aho-Corasick 自动机（忽略大小写的规则另一个，扫描 casefold 后的文本），
+扫描一遍文本得到命中的最小规则序号，与规则条数无关；regex 规则合并为一个分支正则，一次 search 排除不命中的文本，
+命中时再用按规则顺序排列的分支正则找出最小序号。开头的全局标志（如 (?i)）改写为作用于该规则的 (?i:...)；
+仍然无法合并时（如不同规则使用了同名的命名组）退回逐条匹配。
+结果按 (应用名, 标题) 缓存，同一窗口反复上报时只是一次 dict 查找。
+"""
+
+import re
+import sys
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from metrics import counter
+
+SKIP = "skip"
+NOT_USING = "not_using"
+RELABEL = "relabel"
+
+# 缓存的 (应用名, 标题) 条数上限，满时清空
+CACHE_SIZE = 1 << 16
+
+# 没有命中时的规则序号
+NO_MATCH = sys.maxsize
+
+CLASSIFIER_MATCHES = counter("sleepy_classifier_matches", "Device reports matched by a classifier rule", ("action",))
+
+
+class Rule:
+    __slots__ = ("index", "match", "pattern", "field", "action", "label", "ignore_case")
+
+    def __init__(
+        self,
+        index: int,
+        match: str,
+        pattern: str,
+        field: str,
+        action: str,
+        label: Optional[str],
+        ignore_case: bool = False,
+    ):
+        self.index = index
+        self.match = match
+        self.pattern = pattern
+        self.field = field
+        self.action = action
+        self.label = sys.intern(label) if label is not None else None
+        self.ignore_case = ignore_case
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "match": self.match,
+            "pattern": self.pattern,
+            "field": self.field,
+            "action": self.action,
+            "label": self.label,
+            "ignore_case": self.ignore_case,
+        }
+
+
+class _Automaton:
+    """exact / prefix / keyword 规则合并成的 Aho-Corasick 自动机
+
+    每个节点记录: 整串等于该节点时命中的 exact 规则、从文本开头匹配到该节点时命中的 prefix 规则、
+    在任意位置结束于该节点（含失败链上的后缀）时命中的 keyword 规则，均为最小序号。
+    """
+
+    __slots__ = ("goto", "fail", "exact", "prefix", "keyword")
+
+    def __init__(self):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.exact: List[int] = [NO_MATCH]
+        self.prefix: List[int] = [NO_MATCH]
+        self.keyword: List[int] = [NO_MATCH]
+
+    def add(self, pattern: str, match: str, index: int):
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = self.goto[node][ch] = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.exact.append(NO_MATCH)
+                self.prefix.append(NO_MATCH)
+                self.keyword.append(NO_MATCH)
+            node = nxt
+        table = getattr(self, match)
+        table[node] = min(table[node], index)
+
+    def build(self):
+        """按层（BFS）计算失败链，并把后缀节点的 keyword 命中并入当前节点"""
+        goto, fail, keyword = self.goto, self.fail, self.keyword
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                queue.append(child)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0) if node else 0
+                fail[child] = target
+                if keyword[target] < keyword[child]:
+                    keyword[child] = keyword[target]
+
+    def scan(self, text: str) -> int:
+        """-> 命中的最小规则序号，没有时为 NO_MATCH"""
+        goto, fail, keyword, prefix = self.goto, self.fail, self.keyword, self.prefix
+        best = min(keyword[0], prefix[0])
+        state = 0
+        anchored = True  # 到目前为止都沿着从根开始的路径，即当前节点就是文本的开头部分
+        for ch in text:
+            nxt = goto[state].get(ch)
+            if nxt is None:
+                anchored = False
+                while state:
+                    state = fail[state]
+                    nxt = goto[state].get(ch)
+                    if nxt is not None:
+                        break
+                if nxt is None:
+                    continue
+            state = nxt
+            if keyword[state] < best:
+                best = keyword[state]
+            if anchored and prefix[state] < best:
+                best = prefix[state]
+        if anchored and self.exact[state] < best:
+            best = self.exact[state]
+        return best
+
+
+def _has_backreference(pattern: str) -> bool:
+    i = 0
+    while i < len(pattern) - 1:
+        if pattern[i] == "\\":
+            if pattern[i + 1] in "123456789":
+                return True
+            i += 2
+        else:
+            i += 1
+    return False
+
+
+_GLOBAL_FLAGS = re.compile(r"\(\?([aimsux]+)\)")
+
+
+def _scoped(pattern: str, ignore_case: bool) -> str:
+    """把开头的全局标志（(?i)、(?s) 等）改写为只作用于该规则的 (?i:...)，以便合并进分支正则"""
+    flags = "i" if ignore_case else ""
+    while True:
+        m = _GLOBAL_FLAGS.match(pattern)
+        if m is None:
+            break
+        flags += m.group(1)
+        pattern = pattern[m.end():]
+    return f"(?{flags}:{pattern})" if flags else f"(?:{pattern})"
+
+
+class _FieldMatcher:
+    """同一字段上的全部规则"""
+
+    __slots__ = ("automaton", "folded", "regex", "ordered", "separate", "regex_first", "regex_index")
+
+    def __init__(self, rules: Sequence[Rule]):
+        self.automaton: Optional[_Automaton] = None
+        self.folded: Optional[_Automaton] = None  # 忽略大小写的规则，扫描 casefold 后的文本
+        self.regex = self.ordered = None
+        # 无法合并时逐条匹配的 [(规则序号, 正则)]，按序号排列
+        self.separate: Optional[List[Tuple[int, Any]]] = None
+        self.regex_first = NO_MATCH
+        self.regex_index: Dict[str, int] = {}
+        branches = []
+        for rule in rules:
+            if rule.match == "regex":
+                try:
+                    compiled = re.compile(rule.pattern, re.IGNORECASE if rule.ignore_case else 0)
+                except re.error as e:
+                    raise ValueError(f"classifier.rules[{rule.index}]: invalid regex {rule.pattern!r}: {e}")
+                if _has_backreference(rule.pattern):
+                    raise ValueError(f"classifier.rules[{rule.index}]: numbered backreferences are not supported")
+                branches.append((rule.index, _scoped(rule.pattern, rule.ignore_case), compiled))
+                self.regex_index[f"r{rule.index}"] = rule.index
+                self.regex_first = min(self.regex_first, rule.index)
+            elif rule.ignore_case:
+                if self.folded is None:
+                    self.folded = _Automaton()
+                self.folded.add(rule.pattern.casefold(), rule.match, rule.index)
+            else:
+                if self.automaton is None:
+                    self.automaton = _Automaton()
+                self.automaton.add(rule.pattern, rule.match, rule.index)
+        for automaton in (self.automaton, self.folded):
+            if automaton is not None:
+                automaton.build()
+        if branches:
+            try:
+                # 不带捕获组的分支正则: 一次 search 排除不命中的文本（大多数标题不命中任何正则）；
+                # 带捕获组时 re 无法提取公共的开头 / 字符集做快速跳过，慢一个数量级
+                self.regex = re.compile("|".join(scoped for _, scoped, _ in branches))
+                # 每个分支自己向后查找: re.match 按分支顺序尝试，先命中的就是序号最小的规则；只在上面命中时使用
+                if len(branches) > 1:
+                    self.ordered = re.compile("|".join(f"(?P<r{index}>(?s:.*?){scoped})" for index, scoped, _ in branches))
+            except re.error:
+                self.regex = self.ordered = None
+                self.separate = [(index, compiled) for index, _, compiled in branches]
+
+    def match(self, text: str, best: int) -> int:
+        if self.automaton is not None:
+            best = min(best, self.automaton.scan(text))
+        if self.folded is not None:
+            best = min(best, self.folded.scan(text.casefold()))
+        if self.regex_first >= best:
+            return best
+        if self.regex is not None:
+            if self.regex.search(text) is not None:
+                hit = self.regex_first
+                if self.ordered is not None:
+                    hit = self.regex_index[self.ordered.match(text).lastgroup]
+                best = min(best, hit)
+        elif self.separate is not None:
+            for index, compiled in self.separate:
+                if index >= best:
+                    break
+                if compiled.search(text) is not None:
+                    return index
+        return best
+
+
+class Classifier:
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        for rule in self.rules:
+            if rule.action == RELABEL and not rule.label:
+                raise ValueError(f"classifier.rules[{rule.index}]: relabel requires a label")
+        self._title = self._app = None
+        title = [r for r in self.rules if r.field == "title"]
+        app = [r for r in self.rules if r.field == "app"]
+        if title:
+            self._title = _FieldMatcher(title)
+        if app:
+            self._app = _FieldMatcher(app)
+        self._cache: Dict[Tuple[Optional[str], Optional[str]], Optional[Rule]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def classify(self, app: Optional[str], title: Optional[str]) -> Optional[Rule]:
+        """-> 命中的规则（配置中最靠前的），没有命中时为 None"""
+        key = (app, title)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        best = NO_MATCH
+        if self._title is not None:
+            text = title or app
+            if text is not None:
+                best = self._title.match(text, best)
+        if self._app is not None and app is not None:
+            best = self._app.match(app, best)
+        rule = self.rules[best] if best != NO_MATCH else None
+        if len(self._cache) >= CACHE_SIZE:
+            self._cache.clear()
+        self._cache[key] = rule
+        return rule
+
+
+@lru_cache(maxsize=32)
+def _compile(rules: Tuple[tuple, ...]) -> Classifier:
+    return Classifier([Rule(index, *rule) for index, rule in enumerate(rules)])
+
+
+def compile_rules(rules) -> Optional[Classifier]:
+    """config.classifier.rules -> Classifier；没有规则时为 None。规则相同的租户共用同一个（缓存）"""
+    if not rules:
+        return None
+    return _compile(tuple((r.match, r.pattern, r.field, r.action, r.label, r.ignore_case) for r in rules))
+
+
+def apply(rule: Rule, entry, previous) -> None:
+    """在写入者中把规则应用到新记录上；previous 为该设备之前的记录（没有时为 None）"""
+    if rule.action == SKIP:
+        if previous is None:
+            entry.app_name = entry.app_title = entry.app_pid = None
+        else:
+            entry.app_name, entry.app_title, entry.app_pid = previous.app_name, previous.app_title, previous.app_pid
+    elif rule.action == NOT_USING:
+        entry.mark_not_using()
+    else:
+        entry.app_name = rule.label
@@ -0,0 +1,326 @@
+"""
+历史数据的列式导出（只依赖标准库；安装了 pyarrow 时可输出 Parquet）
+
+两张表（列名与类型见 TABLES）:
+- history: 原始历史（history.py），每条转换 / 采样一行
+- rollups: 降采样后的分钟 / 小时汇总（retention.py）
+
+输出格式，全部按块流式生成，内存占用只与块大小有关:
+- csv: 每 CSV_CHUNK 行一块，None 为空字段
+- parquet: 每 ROW_GROUP 行一个 row group（需要 pyarrow）
+- scol: 简单的按列分块二进制格式，可直接 mmap 读取（见 ColumnarFile）:
+
+    b"SLYCOL01"
+    row group 0: 每列一个或多个缓冲区，各自按 8 字节对齐
+        定长列: 小端序的原始数组（array 类型码 d / f / h / b / B），缺失值为 -1
+        字符串列: valid（每行 1 字节，0 为 None）+ offsets（uint32，行数 + 1 个）+ data（UTF-8）
+    row group 1 ...
+    footer: JSON {"format", "version", "table", "columns", "rows", "row_groups": [{"rows", "buffers"}]}
+        buffers[列下标] = {"data": [偏移, 长度], "valid": [...], "offsets": [...]}
+    footer 长度（uint64 小端序） + b"SLYCOL01"
+
+columnar: 安装了 pyarrow 时为 parquet，否则为 scol
+"""
+
+import csv
+import importlib.util
+import io
+import json
+import mmap
+import struct
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"SLYCOL01"
+FORMAT = "sleepy-columnar"
+VERSION = 1
+
+# 每个 row group 的行数 / CSV 每块的行数
+ROW_GROUP = 1 << 14
+CSV_CHUNK = 1024
+
+STRING = "s"
+# 定长列中 None 的占位
+MISSING = -1
+
+# 表名 -> ((列名, 类型), ...)；类型为 array 类型码，s 为字符串
+TABLES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "history": (
+        ("time", "d"),
+        ("device", STRING),
+        ("app", STRING),
+        ("title", STRING),
+        ("using", "b"),
+        ("battery", "b"),
+        ("sample", "B"),
+    ),
+    "rollups": (
+        ("resolution", STRING),
+        ("device", STRING),
+        ("time", "d"),
+        ("app", STRING),
+        ("using", "f"),
+        ("battery_min", "b"),
+        ("battery_max", "b"),
+        ("seconds", "f"),
+    ),
+}
+
+FORMATS = ("csv", "scol", "parquet", "columnar")
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "scol": "application/octet-stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def resolve_format(name: str) -> str:
+    """columnar -> parquet / scol；需要 pyarrow 但没有安装时抛出 ValueError"""
+    if name not in FORMATS:
+        raise ValueError(f"Unknown format: {name!r}; available: {', '.join(FORMATS)}")
+    if name == "columnar":
+        return "parquet" if parquet_available() else "scol"
+    if name == "parquet" and not parquet_available():
+        raise ValueError("Parquet export requires pyarrow (pip install pyarrow); use format=scol or columnar")
+    return name
+
+
+def record_row(table: str, item: Dict[str, Any]) -> Optional[tuple]:
+    """导出 / 状态文件中的一条记录 -> 该表的一行；不属于该表时返回 None"""
+    kind = item.get("type")
+    if table == "history" and kind == "history":
+        return (
+            item["time"], item["device"], item.get("app"), item.get("title"), item.get("using"),
+            item.get("battery"), bool(item.get("sample")),
+        )
+    if table == "rollups" and kind == "rollup":
+        return (
+            item["resolution"], item["device"], item["time"], item.get("app"), item.get("using"),
+            item.get("battery_min"), item.get("battery_max"), item.get("seconds"),
+        )
+    return None
+
+
+def chunks(table: str, rows: Iterable[tuple], fmt: str) -> Iterator[bytes]:
+    """按格式（已经过 resolve_format）生成输出"""
+    columns = TABLES[table]
+    if fmt == "csv":
+        return csv_chunks(columns, rows)
+    if fmt == "parquet":
+        return parquet_chunks(columns, rows)
+    return scol_chunks(table, columns, rows)
+
+
+def _groups(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    group: List[tuple] = []
+    for row in rows:
+        group.append(row)
+        if len(group) >= size:
+            yield group
+            group = []
+    if group:
+        yield group
+
+
+# ---- csv ----
+
+
+def csv_chunks(columns: Sequence[Tuple[str, str]], rows: Iterable[tuple]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow([name for name, _ in columns])
+    for group in _groups(rows, CSV_CHUNK):
+        writer.writerows(group)  # None 写为空字段
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+# ---- scol ----
+
+
+def _pad(n: int) -> bytes:
+    return b"\0" * (-n % 8)
+
+
+def _numeric(values: Sequence[Any], code: str) -> bytes:
+    if code in "dfe":
+        out = array(code, [MISSING if v is None else v for v in values])
+    else:
+        out = array(code, [MISSING if v is None else int(v) for v in values])
+    if sys.byteorder == "big":
+        out.byteswap()
+    return out.tobytes()
+
+
+def _strings(values: Sequence[Optional[str]]) -> Tuple[bytes, bytes, bytes]:
+    valid = bytearray(len(values))
+    offsets = array("I", [0])
+    data = bytearray()
+    for i, value in enumerate(values):
+        if value is not None:
+            valid[i] = 1
+            data += value.encode("utf-8")
+        offsets.append(len(data))
+    if sys.byteorder == "big":
+        offsets.byteswap()
+    return bytes(valid), offsets.tobytes(), bytes(data)
+
+
+def scol_chunks(table: str, columns: Sequence[Tuple[str, str]], rows: Iterable[tuple]) -> Iterator[bytes]:
+    yield MAGIC
+    position = len(MAGIC)
+    groups = []
+    total = 0
+    for group in _groups(rows, ROW_GROUP):
+        parts: List[bytes] = []
+        buffers = []
+        for k, (_, code) in enumerate(columns):
+            values = [row[k] for row in group]
+            if code == STRING:
+                named = zip(("valid", "offsets", "data"), _strings(values))
+            else:
+                named = (("data", _numeric(values, code)),)
+            entry = {}
+            for name, blob in named:
+                entry[name] = [position, len(blob)]
+                parts.append(blob + _pad(len(blob)))
+                position += len(blob) + len(_pad(len(blob)))
+            buffers.append(entry)
+        groups.append({"rows": len(group), "buffers": buffers})
+        total += len(group)
+        yield b"".join(parts)
+    footer = json.dumps({
+        "format": FORMAT,
+        "version": VERSION,
+        "table": table,
+        "columns": [{"name": name, "type": code} for name, code in columns],
+        "rows": total,
+        "row_groups": groups,
+    }, separators=(",", ":")).encode("utf-8")
+    yield footer + struct.pack("<Q", len(footer)) + MAGIC
+
+
+class ColumnarFile:
+    """只读 mmap 打开 scol 文件；定长列按 row group 返回 memoryview（不复制）"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path}: empty file")
+        tail = len(MAGIC) + 8
+        if len(self._map) < len(MAGIC) + tail or self._map[:8] != MAGIC or self._map[-8:] != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a {FORMAT} file")
+        (size,) = struct.unpack("<Q", self._map[-tail:-8])
+        self.meta = json.loads(self._map[-tail - size:-tail])
+        self.columns: List[Tuple[str, str]] = [(c["name"], c["type"]) for c in self.meta["columns"]]
+        self.rows: int = self.meta["rows"]
+        self._index = {name: k for k, (name, _) in enumerate(self.columns)}
+
+    def __enter__(self) -> "ColumnarFile":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _view(self, span: Sequence[int]) -> memoryview:
+        offset, length = span
+        return memoryview(self._map)[offset:offset + length]
+
+    def _read(self, k: int, group: Dict[str, Any]) -> Any:
+        code = self.columns[k][1]
+        buffers = group["buffers"][k]
+        if code != STRING:
+            return self._view(buffers["data"]).cast(code)
+        valid = self._view(buffers["valid"])
+        offsets = self._view(buffers["offsets"]).cast("I")
+        data = self._view(buffers["data"])
+        return [
+            str(data[offsets[i]:offsets[i + 1]], "utf-8") if valid[i] else None
+            for i in range(group["rows"])
+        ]
+
+    def column(self, name: str) -> Iterator[Any]:
+        """逐个 row group 产出该列: 定长列为 memoryview（cast 为对应类型码），字符串列为 list"""
+        k = self._index[name]
+        for group in self.meta["row_groups"]:
+            yield self._read(k, group)
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """按行读取（缺失的定长值为 -1）"""
+        for group in self.meta["row_groups"]:
+            yield from zip(*(self._read(k, group) for k in range(len(self.columns))))
+
+
+# ---- parquet ----
+
+
+class _Sink:
+    """pyarrow 写入用的文件对象: 收集写入的字节，由调用方分块取走"""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def take(self) -> bytes:
+        out = b"".join(self._parts)
+        self._parts = []
+        return out
+
+
+def parquet_chunks(columns: Sequence[Tuple[str, str]], rows: Iterable[tuple]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {STRING: pa.string(), "d": pa.float64(), "f": pa.float32(), "h": pa.int16(), "b": pa.int8(), "B": pa.bool_()}
+    fields = []
+    for name, code in columns:
+        # using 在原始历史中是可空布尔
+        fields.append(pa.field(name, pa.bool_() if (name, code) == ("using", "b") else types[code]))
+    schema = pa.schema(fields)
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema)
+    for group in _groups(rows, ROW_GROUP):
+        arrays = [pa.array([row[k] for row in group], type=field.type) for k, field in enumerate(fields)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
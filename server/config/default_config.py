@@ -13,6 +13,19 @@ main:
   # ssl_key: "/path/to/key.pem"
   # ssl_cert: "/path/to/cert.pem"
   cors_origins: "*"
+  # 状态文件: 关闭时保存状态 / 设备，启动时恢复（留空则不保存）
+  state_file: "state.ndjson.gz"
+  # 关闭时等待写入完成、保存状态的最长时间（秒）
+  shutdown_timeout: 10
+  # 生产启动（debug: false 时 python main.py）: uvloop / httptools 安装后自动使用
+  # 大于 1 时每个 worker 是独立的实例；配置了 state_file / tenants / replication / webhooks 时会拒绝启动
+  workers: 1
+  # 在反向代理后面时可改用 Unix 域套接字（设置后忽略 host / port）
+  # uds: "/run/sleepy/sleepy.sock"
+  # 应大于反向代理的上游 keep-alive 超时（如 nginx upstream keepalive_timeout 60s）
+  keepalive_timeout: 75
+  backlog: 2048
+  access_log: false
 
 page:
   title: "Sleepy"
@@ -36,4 +49,106 @@ status:
       color: "#2196F3"
       icon: "🌙"
       description: "深夜勿扰"
+
+privacy:
+  # 启动时是否开启隐私模式（匿名访问者看不到任何设备）
+  private: false
+  # 对匿名访问者隐藏的字段，"*" 作为设备 id 时对所有设备生效；
+  # 字段写 "*" 表示整个设备对匿名访问者不可见
+  redact:
+    "*":
+      - active_app.title
+
+custom:
+  # 设备上报的自定义字段（custom）限制: 键的数量 / 键长度 / 字符串值长度 / 编码后的总字节数
+  max_keys: 16
+  max_key_length: 64
+  max_value_length: 256
+  max_bytes: 2048
+  # 建立索引的键，查询时可用 /api/status/query?custom.<键>=<值> 过滤
+  indexed: []
+
+tenants:
+  # 多租户: 一个进程托管多个独立的状态页（各自的状态列表、secret 和设备）
+  enabled: false
+  # path: 通过 /t/<租户>/api/... 访问；host: 通过 <租户><host_suffix> 域名访问
+  mode: path
+  path_prefix: /t
+  host_suffix: ""
+  # 每个租户一个 <租户>.yaml，内容覆盖在本配置之上，必须设置自己的 main.secret
+  directory: tenants
+  # 空闲多少秒后卸载租户（配置了 main.state_file 时完整状态写入 <directory>/<租户>.state.ndjson.gz，否则只保留状态，设备在下次上报时重建）
+  idle_timeout: 600
+  max_loaded: 1000
+
+replication:
+  # none / leader / follower；follower 从 leader 同步设备与状态，只提供读取（写操作返回 409）
+  role: none
+  # follower 连接的 leader: http://127.0.0.1:8080 或 unix:/run/sleepy/sleepy.sock，main.secret 须与 leader 一致
+  # leader: "http://127.0.0.1:8080"
+  # leader 保留的日志条目数，落后更多的 follower 会重新全量同步
+  log_entries: 10000
+  heartbeat: 1.0
+  retry: 1.0
+
+webhooks:
+  # 状态变化时 POST 到这些地址（签名、合并、重试见 server/webhooks.py）
+  targets: []
+  # - name: bot
+  #   url: "https://example.com/hooks/sleepy"
+  #   secret: "change-me"  # HMAC-SHA256 签名密钥（X-Sleepy-Signature）
+  #   events: [status_updated, private_mode_changed]
+  #   coalesce: 0.5  # 合并窗口（秒）
+  timeout: 5
+  # 失败后按 retry_base * 2^n 秒（不超过 retry_max）重试，最多 max_attempts 次
+  retry_base: 1
+  retry_max: 300
+  max_attempts: 10
+  queue_size: 10000
+  # 待重试的推送写入此文件，重启后继续（为空则只保存在内存中）
+  queue_file: "webhooks.queue.jsonl"
+
+analytics:
+  # 按设备上报统计每个应用的使用时长与每小时的活跃度（/api/analytics/*）
+  # 同一应用两次上报间隔超过 max_gap 秒视为中断
+  max_gap: 300
+  retention_days: 90
+  # 每天每台设备最多记录的应用数，其余计入 "(other)"
+  max_apps: 200
+  # 划分日期与小时的时区，为空则使用服务器本地时区
+  # timezone: "Asia/Shanghai"
+  # 允许未认证访问
+  public: false
+
+battery:
+  # 按设备估计充放电速率，在设备信息的 battery_estimate 中给出预计耗尽 / 充满的时间
+  # 放电时电量降到这些百分比、或预计剩余时间低于 warn_minutes 分钟时产生 battery_low 事件（SSE / webhooks）
+  thresholds: [20, 10, 5]
+  warn_minutes: 30
+
+classifier:
+  # 服务端窗口标题规则，取代客户端的 SKIPPED_NAMES / NOT_USING_NAMES（改规则只需重启服务端）
+  # match: exact（相等）/ prefix（开头）/ keyword（包含）/ regex；field: title（默认）/ app；默认区分大小写，ignore_case: true 时忽略
+  # action: skip（保留之前的应用）/ not_using（视为未在使用）/ relabel（应用名改为 label）；多条命中时取靠前的
+  rules:
+    - { pattern: "任务切换", action: skip }
+    - { pattern: "任务视图", action: skip }
+    - { pattern: "通知中心", action: skip }
+    - { pattern: "「开始」菜单", action: skip }
+    - { pattern: "", action: skip }
+    - { pattern: "plasmashell", action: skip }
+    - { pattern: "我们喜欢这张图片，因此我们将它与你共享。", action: not_using }
+    - { pattern: "[FAILED]", action: not_using }
+    # - { match: keyword, pattern: " - YouTube", action: relabel, label: "YouTube" }
+    # - { match: regex, pattern: "^(?i:zoom) meeting", action: relabel, label: "Zoom" }
+
+history:
+  # 记录每台设备的应用 / 窗口标题变化，并提供全文搜索（/api/search，需要鉴权）
+  enabled: false
+  # 原始数据保留 retention_days 天，之后降采样为分钟汇总（保留 minute_days 天），再合并为小时汇总（保留 hour_days 天）
+  retention_days: 30
+  minute_days: 14
+  hour_days: 365
+  # 总条数上限，超出时丢弃最旧的数据
+  max_entries: 5000000
 """
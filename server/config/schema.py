@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Union, Optional
+from typing import Dict, List, Literal, Union, Optional
 
 class StatusItem(BaseModel):
     id: int
@@ -17,6 +17,30 @@ class MainConfig(BaseModel):
     ssl_key: Optional[str] = None
     ssl_cert: Optional[str] = None
     cors_origins: Union[str, List[str]] = "*"
+    # 写入队列容量，满时上报请求会等待（背压）
+    mutation_queue_size: int = 4096
+    # 状态文件: 关闭时写入，启动时恢复（为空则不保存）
+    state_file: Optional[str] = None
+    # 关闭阶段（卸载租户、处理完写入队列、保存状态）的最长时间（秒）
+    shutdown_timeout: float = 10
+    # 关闭过程中建议客户端多久后重连（秒），用于 503 的 Retry-After 和 SSE 的 retry
+    drain_retry_after: float = 3
+    # ---- 生产启动器（python main.py 且 debug 为 false，见 launcher.py） ----
+    workers: int = 1
+    # auto: 安装了 uvloop / httptools 时使用，否则为 asyncio / h11
+    loop: Literal["auto", "asyncio", "uvloop"] = "auto"
+    http: Literal["auto", "h11", "httptools"] = "auto"
+    # 监听 Unix 域套接字（设置后忽略 host / port），如 /run/sleepy.sock
+    uds: Optional[str] = None
+    backlog: int = 2048
+    # 空闲 keep-alive 连接保持的秒数；在反向代理后面时应大于代理的上游空闲超时
+    keepalive_timeout: int = 5
+    # 同时处理的连接数上限（超出返回 503，注意 SSE 连接也占用名额）/ 每个 worker 处理多少请求后重启
+    limit_concurrency: Optional[int] = None
+    limit_max_requests: Optional[int] = None
+    access_log: bool = False
+    # 信任这些地址发来的 X-Forwarded-For / X-Forwarded-Proto（反向代理的地址）
+    forwarded_allow_ips: str = "127.0.0.1"
 
 class PageConfig(BaseModel):
     title: str = "Sleepy"
@@ -26,7 +50,149 @@ class StatusConfig(BaseModel):
     default: int = 0
     status_list: List[StatusItem]
 
+class PrivacyConfig(BaseModel):
+    # 启动时是否处于隐私模式（运行中可通过 /api/device/private 切换）
+    private: bool = False
+    # 对匿名访问者脱敏的字段: {设备 id 或 "*": ["active_app.title", ...]}
+    redact: Dict[str, List[str]] = Field(default_factory=dict)
+
+class CustomConfig(BaseModel):
+    # 设备上报的自定义字段（DeviceStatus.custom）的限制
+    max_keys: int = 16
+    max_key_length: int = 64
+    max_value_length: int = 256
+    # 整个 custom 编码为 JSON 后的最大字节数
+    max_bytes: int = 2048
+    # 建立索引、可用 ?custom.<键>=<值> 过滤的键
+    indexed: List[str] = Field(default_factory=list)
+
+class TenantsConfig(BaseModel):
+    # 多租户: 一个进程托管多个独立的状态页
+    enabled: bool = False
+    # path: /t/<租户>/api/...；host: <租户><host_suffix>，如 alice.status.example.com
+    mode: Literal["path", "host"] = "path"
+    path_prefix: str = "/t"
+    host_suffix: str = ""
+    # 每个租户一个 <租户>.yaml，内容覆盖在主配置之上，必须设置自己的 main.secret
+    directory: str = "tenants"
+    # 空闲（无请求、无订阅者）超过这么多秒后卸载
+    idle_timeout: float = 600
+    # 同时加载的租户上限，超出时先卸载最久未使用的空闲租户
+    max_loaded: int = 1000
+
+class ReplicationConfig(BaseModel):
+    # leader: 向 follower 提供 /api/replication/stream；follower: 从 leader 同步，只读
+    role: Literal["none", "leader", "follower"] = "none"
+    # follower 连接的 leader 地址: http://127.0.0.1:8080 或 unix:/run/sleepy/sleepy.sock（使用 main.secret 认证）
+    leader: Optional[str] = None
+    # leader 保留的日志条目数 / 字节数，落后更多的 follower 重新全量同步
+    log_entries: int = 10000
+    log_bytes: int = 64 * 1024 * 1024
+    # 空闲时的心跳间隔（秒）
+    heartbeat: float = 1.0
+    # follower 断线后的重连间隔（秒）
+    retry: float = 1.0
+
+class WebhookTarget(BaseModel):
+    name: str
+    # http(s)://...，收到 POST application/json
+    url: str
+    # HMAC-SHA256 签名密钥（X-Sleepy-Signature），为空则不签名
+    secret: Optional[str] = None
+    # 推送哪些事件: status_updated / private_mode_changed / device_removed / device_cleared / battery_low
+    events: List[str] = Field(default_factory=lambda: ["status_updated", "private_mode_changed"])
+    # 合并窗口（秒）: 窗口内的事件合并为一次推送
+    coalesce: float = 0.5
+    # 单次推送的事件数上限
+    max_batch: int = 100
+
+class WebhooksConfig(BaseModel):
+    targets: List[WebhookTarget] = Field(default_factory=list)
+    # 单次请求超时（秒）
+    timeout: float = 5
+    # 每个目标保留的空闲 keep-alive 连接数
+    pool_size: int = 4
+    # 失败重试: 间隔从 retry_base 秒开始指数增长，不超过 retry_max 秒，最多 max_attempts 次
+    retry_base: float = 1
+    retry_max: float = 300
+    max_attempts: int = 10
+    # 待重试队列上限，满时丢弃最旧的
+    queue_size: int = 10000
+    # 待重试队列的持久化文件（重启后继续重试），为空则只保存在内存中
+    queue_file: Optional[str] = None
+
+class AnalyticsConfig(BaseModel):
+    # 同一应用两次上报间隔超过这么多秒，视为中断，区间只算到最后一次上报
+    max_gap: float = 300
+    # 保留的天数
+    retention_days: int = 90
+    # 每天每台设备最多记录的应用数，其余计入 "(other)"
+    max_apps: int = 200
+    # 按哪个时区划分日期和小时（IANA 名称，如 Asia/Shanghai），为空则使用服务器本地时区
+    timezone: Optional[str] = None
+    # 允许未认证访问 /api/analytics/*
+    public: bool = False
+
+class BatteryConfig(BaseModel):
+    # 充放电速率平滑的半衰期（秒）: 越大越稳定，越小越快跟上负载变化
+    half_life: float = 900
+    # 至少有这么多个速率样本（电量变化）才给出预测
+    min_samples: int = 2
+    # 每台设备保留的电量变化点数（/api/device/battery）
+    series_points: int = 288
+    # 放电时电量降到这些百分比时产生 battery_low 事件
+    thresholds: List[int] = Field(default_factory=lambda: [20, 10, 5])
+    # 放电时预计剩余时间首次低于这么多分钟时产生 battery_low 事件，0 为不检查
+    warn_minutes: float = 30
+
+class ClassifierRule(BaseModel):
+    # exact: 整串相等 / prefix: 以 pattern 开头 / keyword: 包含 pattern / regex: re.search
+    match: Literal["exact", "prefix", "keyword", "regex"] = "exact"
+    pattern: str
+    # title: 窗口标题（没有标题或标题为空时为应用名）/ app: 应用名
+    field: Literal["title", "app"] = "title"
+    # skip: 保留设备之前的应用 / not_using: 视为未在使用 / relabel: 应用名改为 label
+    action: Literal["skip", "not_using", "relabel"]
+    label: Optional[str] = None
+    # 默认区分大小写；为 true 时 exact / prefix / keyword 按 casefold 比较，regex 加 re.IGNORECASE
+    ignore_case: bool = False
+
+class ClassifierConfig(BaseModel):
+    # 按顺序匹配，多条规则都命中时取靠前的那条（见 classifier.py）
+    rules: List[ClassifierRule] = Field(default_factory=list)
+
+class HistoryConfig(BaseModel):
+    # 记录设备的应用 / 窗口标题变化并建立全文索引（/api/search）
+    enabled: bool = False
+    # 原始数据保留的天数（之后降采样为分钟汇总），以及总条数上限（超出时直接丢弃最旧的段）
+    retention_days: int = 30
+    max_entries: int = 5_000_000
+    # 状态不变时，电量变化或距上一条超过这么多秒也记录一条采样（不进入全文索引），应小于 max_gap
+    sample_interval: float = 120
+    # 两条记录间隔超过这么多秒，视为设备离线，其间不计入汇总
+    max_gap: float = 300
+    # 分钟汇总保留的天数（之后合并为小时汇总），小时汇总保留的天数
+    minute_days: int = 14
+    hour_days: int = 365
+    # 每步降采样 / 合并最多处理的条数，步与步之间让出写入者
+    retention_chunk: int = 512
+    # 活动段满这么多条后封存；同一层的封存段达到 merge_factor 个时合并，单段不超过 max_segment_entries 条
+    segment_entries: int = 4096
+    merge_factor: int = 4
+    max_segment_entries: int = 1 << 18
+    # 后台合并 / 降采样的间隔（秒）
+    maintenance_interval: float = 30
+
 class AppConfig(BaseModel):
     main: MainConfig
     page: PageConfig
-    status: StatusConfig
\ No newline at end of file
+    status: StatusConfig
+    privacy: PrivacyConfig = Field(default_factory=PrivacyConfig)
+    custom: CustomConfig = Field(default_factory=CustomConfig)
+    tenants: TenantsConfig = Field(default_factory=TenantsConfig)
+    replication: ReplicationConfig = Field(default_factory=ReplicationConfig)
+    webhooks: WebhooksConfig = Field(default_factory=WebhooksConfig)
+    analytics: AnalyticsConfig = Field(default_factory=AnalyticsConfig)
+    battery: BatteryConfig = Field(default_factory=BatteryConfig)
+    classifier: ClassifierConfig = Field(default_factory=ClassifierConfig)
+    history: HistoryConfig = Field(default_factory=HistoryConfig)
\ No newline at end of file
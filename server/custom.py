@@ -0,0 +1,71 @@
+"""
+设备自定义字段（DeviceStatus.custom）
+
+- 上报时按 config.custom 的限制校验: 键的数量 / 长度 / 字符，值只能是标量，整体编码后的大小
+- 存储为按键排序的 ((键, 值), ...) 元组，键和字符串值用 sys.intern 驻留
+- config.custom.indexed 中声明的键由 DeviceStore 维护 值 -> 槽位 的索引，
+  查询时可用 ?custom.<键>=<值> 过滤（值按 index_value() 转成的字符串比较）
+"""
+
+import json
+import re
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+CustomFields = Tuple[Tuple[str, Any], ...]
+
+KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+QUERY_PREFIX = "custom."
+
+MISSING = object()
+
+
+class CustomFieldError(ValueError):
+    """自定义字段超出限制或格式不正确"""
+
+
+def normalize(custom: Optional[Dict[str, Any]], limits) -> Optional[CustomFields]:
+    """校验并转换为存储格式；limits 为 CustomConfig"""
+    if not custom:
+        return None
+    if len(custom) > limits.max_keys:
+        raise CustomFieldError(f"Too many custom fields: {len(custom)} > {limits.max_keys}")
+    items = []
+    for key, value in custom.items():
+        if len(key) > limits.max_key_length or not KEY_PATTERN.match(key):
+            raise CustomFieldError(f"Invalid custom field key: {key[:limits.max_key_length]!r}")
+        if isinstance(value, str):
+            if len(value) > limits.max_value_length:
+                raise CustomFieldError(f"Custom field {key!r} is longer than {limits.max_value_length} characters")
+            value = sys.intern(value)
+        elif value is not None and not isinstance(value, (bool, int, float)):
+            raise CustomFieldError(f"Custom field {key!r} must be a string, number, boolean or null")
+        items.append((sys.intern(key), value))
+    size = len(json.dumps(custom, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    if size > limits.max_bytes:
+        raise CustomFieldError(f"Custom fields take {size} bytes, limit is {limits.max_bytes}")
+    items.sort()
+    return tuple(items)
+
+
+def lookup(custom: Optional[CustomFields], key: str, default=None):
+    for k, v in custom or ():
+        if k == key:
+            return v
+    return default
+
+
+def index_value(value: Any) -> str:
+    """查询参数与存储值的比较形式: 字符串原样，其余取 JSON 表示（true / 1.5 / null）"""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def matches(custom: Optional[CustomFields], wanted: Dict[str, str]) -> bool:
+    """custom 中每个 wanted 的键都存在且 index_value() 相等"""
+    for key, text in wanted.items():
+        value = lookup(custom, key, MISSING)
+        if value is MISSING or index_value(value) != text:
+            return False
+    return True
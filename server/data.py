@@ -1,18 +1,292 @@
+import math
 import time
 import asyncio
-from typing import Callable, List, Dict, Any, Set
+import itertools
+import logging
+from typing import Callable, Iterable, List, Dict, Any, Set, Optional, Tuple
 
+from analytics import AppAnalytics, parse_record as parse_analytics
+from battery import BatteryTracker
+from classifier import CLASSIFIER_MATCHES, apply as apply_rule, compile_rules
 from models.api import DeviceInfo
 from models.device_status import DeviceStatus
+from custom import matches as custom_matches, normalize as normalize_custom
+from encoding import EncodedDevice, LazyEncodedDevice, encode_device
+from history import HISTORY_ENTRIES, HISTORY_ROLLUPS, HISTORY_SEGMENTS, HistoryStore, merge_segments, parse_entry as parse_history
+from latency import LatencyTracker
+from metrics import BROADCAST_FANOUT, REPORT_VALIDATION, gauge, histogram
+from privacy import Redactor
+from records import DeviceRecord
+from replication import ReadOnlyReplica, ReplicationLog, make_entry
+from retention import parse_row as parse_rollup
+from state import Snapshot
+from store import DeviceStore, SORT_KEYS
+
+# 单写者每轮最多合并提交的变更数
+MAX_BATCH = 256
+
+# 只读副本上仍然允许的变更: 复制本身与历史索引的后台维护
+REPLICA_KINDS = frozenset({"replicate", "history_retention", "history_swap"})
+
+# 长轮询超时按这个粒度（秒）合并，同一格内到期的等待者共享一个定时器
+POLL_GRANULARITY = 0.25
+
+MUTATION_QUEUE_DEPTH = gauge("sleepy_mutation_queue_depth", "Mutations waiting for the writer task")
+LONG_POLL_WAITERS = gauge("sleepy_longpoll_waiters", "Requests parked waiting for a state change")
+MUTATION_BATCH = histogram(
+    "sleepy_mutation_batch_size",
+    "Mutations committed per writer batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+
+
+class Mutation:
+    __slots__ = ("kind", "args", "future")
+
+    def __init__(self, kind: str, args: tuple, future: Optional[asyncio.Future]):
+        self.kind = kind
+        self.args = args
+        self.future = future
 
 
 class Data:
-    def __init__(self, config):
-        self.status_id = getattr(config.status, "default", 0)
-        self.device_list: List[DeviceInfo] = []
-        self.last_updated = time.time()
-        self.metrics_resp: Dict[str, Any] = {"switch_count": 0}
+    """全局状态
+
+    所有写操作都经过 submit() 进入有界队列，由唯一的写入任务（start() 启动）依次应用，
+    每批提交后发布一个不可变的 Snapshot；读取者只读 self.current。
+    写入任务未启动时（如脚本直接使用），submit() 在调用方协程内同步应用。
+    """
+
+    def __init__(self, config, report_metrics: bool = True):
         self._listeners: Set[Callable] = set()
+        self._custom_limits = config.custom
+        # 多租户时只有主实例更新进程级的队列深度指标
+        self._report_metrics = report_metrics
+        self.redactor = Redactor(config.privacy.redact)
+        # 按需编码脱敏版时的转换函数；存一个绑定方法供所有记录共用，不必每条记录各建一个
+        self._to_public = self._public_entry
+        # 窗口标题规则在提交之前匹配（无状态，可被同样规则的租户共用），由写入者应用
+        self.classifier = compile_rules(config.classifier.rules)
+
+        # ---- 以下仅由写入者修改 ----
+        self.devices = DeviceStore(encode=self._encode_device, custom_indexes=config.custom.indexed)
+        self.latency = LatencyTracker()
+        self.analytics = AppAnalytics(config.analytics)
+        self.battery = BatteryTracker(config.battery)
+        self.history: Optional[HistoryStore] = HistoryStore(config.history) if config.history.enabled else None
+        self._maintenance_interval = config.history.maintenance_interval
+        self._maintenance: Optional[asyncio.Task] = None
+        self._status_id = getattr(config.status, "default", 0)
+        self._last_updated = time.time()
+        self._private: bool = config.privacy.private
+        self._switch_count = 0
+        self._version = 0
+        self._dirty = False
+
+        # ---- 已发布快照与按版本缓存的视图 ----
+        self.current: Snapshot = self._make_snapshot()
+
+        # 长轮询: 截止时间格 -> 共享 future；状态变化时一次性全部唤醒
+        self._pollers: Dict[int, asyncio.Future] = {}
+
+        self._queue_size = config.main.mutation_queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+        # ---- 主从复制（replication.py） ----
+        # leader: 每次发布追加一个日志条目
+        self.replication_log: Optional[ReplicationLog] = None
+        # follower: 只接受 replicate 变更，其余写操作抛出 ReadOnlyReplica
+        self.read_only = False
+        self.follower = None
+
+        if self.history is not None and report_metrics:
+            HISTORY_ENTRIES.set_function(lambda: len(self.history))
+            HISTORY_SEGMENTS.set_function(lambda: self.history.segments)
+            HISTORY_ROLLUPS.set_function(lambda: len(self.history.rollups))
+
+    # ---- 读取（全部来自已发布快照） ----
+
+    @property
+    def status_id(self) -> int:
+        return self.current.status_id
+
+    @property
+    def last_updated(self) -> float:
+        return self.current.last_updated
+
+    @property
+    def private(self) -> bool:
+        return self.current.private
+
+    @property
+    def version(self) -> int:
+        return self.current.version
+
+    @property
+    def metrics_resp(self) -> Dict[str, Any]:
+        return {"switch_count": self.current.switch_count}
+
+    @property
+    def device_list(self) -> List[DeviceInfo]:
+        """全部设备（按首次上报顺序）"""
+        return [record.to_api() for record in self.current.devices]
+
+    def devices_view(self, authenticated: bool, snap: Optional[Snapshot] = None) -> List[DeviceInfo]:
+        """设备列表视图：已鉴权返回完整数据，否则返回脱敏后的公开数据（缓存在快照上）"""
+        snap = snap or self.current
+        views = snap.cache.get("views")
+        if views is None:
+            full = [record.to_api() for record in snap.devices]
+            views = snap.cache["views"] = (full, self.redactor.public_view(full, snap.private))
+        return views[0] if authenticated else views[1]
+
+    def _encode_device(self, record: DeviceRecord):
+        """写入时预编码完整 JSON；脱敏版无需处理时与完整版共用，需要处理时在匿名读取时才编码（隐藏的设备为 None）。
+        这里是转换成 API 模型的边界"""
+        full = encode_device(record.to_api())
+        if self.redactor.hides_device(record.id):
+            return full, None
+        if not self.redactor.redacts(record.id):
+            return full, full
+        return full, LazyEncodedDevice(record, self._to_public)
+
+    def _public_entry(self, record: DeviceRecord) -> DeviceInfo:
+        return self.redactor.redact(record.to_api())
+
+    def select_devices(
+        self,
+        snap: Snapshot,
+        authenticated: bool,
+        ids: Optional[List[str]] = None,
+        using: Optional[bool] = None,
+        custom: Optional[Dict[str, str]] = None,
+        sort: Optional[str] = None,
+        cursor: int = 0,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[EncodedDevice], Optional[int]]:
+        """按条件选出设备的预编码片段，返回 (片段列表, 下一页游标)
+
+        - ids: 按 id 映射直接查找
+        - using / custom: 未排序且 snap 为当前快照时，从写入者维护的索引中选最小的一个作为候选，
+          其余条件逐条过滤；custom 的键必须已建立索引（见 filterable_custom_key）
+        - sort: SORT_KEYS 中的排序方式；snap 为当前快照时直接读取维护好的有序索引，
+          否则在快照上排序一次并缓存
+        - cursor / limit: 未排序时游标是槽位（首次上报顺序，不会重新编号，删除 / 清空设备后仍然有效），
+          排序时是在该顺序中的位置
+        """
+        if snap.private and not authenticated:
+            return [], None
+        which = 0 if authenticated else 1
+        view = snap.devices
+        current = snap is self.current
+        check_using = using is not None
+        checks = dict(custom or {})
+
+        # candidates: (游标, 槽位)
+        if ids is not None:
+            slots = [s for s in map(view.slot_of, dict.fromkeys(ids)) if s is not None]
+            if sort is None:
+                slots.sort()
+                candidates = ((s, s) for s in slots if s >= cursor)
+            else:
+                key = SORT_KEYS[sort]
+                slots.sort(key=lambda s: key(view.record(s), s))
+                candidates = enumerate(slots[cursor:], cursor)
+        elif sort is not None:
+            if current:
+                # 与快照同步读取写入者的索引（中间没有 await），两者一致
+                candidates = self.devices.slots_sorted(sort, cursor)
+            else:
+                candidates = enumerate(self._sorted_slots(snap, sort)[cursor:], cursor)
+        elif checks and current:
+            # 命中设备最少的自定义字段索引作为候选
+            key = min(checks, key=lambda k: self.devices.custom_count(k, checks[k]))
+            candidates = ((s, s) for s in self.devices.slots_by_custom(key, checks.pop(key), cursor))
+        elif check_using and current:
+            candidates = ((s, s) for s in self.devices.slots_by_using(using, cursor))
+            check_using = False
+        else:
+            candidates = ((s, s) for s, _ in view.encoded_from(cursor))
+
+        out = []
+        for pos, slot in candidates:
+            frag = view.encoded(slot)[which]
+            if frag is None:
+                continue  # 对匿名访问者隐藏的设备
+            if check_using or checks:
+                record = view.record(slot)
+                if check_using and record.using is not using:
+                    continue
+                if checks and not custom_matches(record.custom, checks):
+                    continue
+            if limit is not None and len(out) >= limit:
+                return out, pos
+            out.append(frag)
+        return out, None
+
+    def filterable_custom_key(self, key: str, authenticated: bool) -> bool:
+        """key 是否可用于 ?custom.<key>= 过滤: 必须已建立索引，且匿名访问时未被脱敏"""
+        if not self.devices.is_custom_indexed(key):
+            return False
+        return authenticated or not self.redactor.hides_field(f"custom.{key}")
+
+    @staticmethod
+    def _sorted_slots(snap: Snapshot, sort: str) -> List[int]:
+        """读取旧快照时的回退路径: 排序一次，缓存在快照上"""
+        cache_key = ("order", sort)
+        order = snap.cache.get(cache_key)
+        if order is None:
+            key = SORT_KEYS[sort]
+            view = snap.devices
+            keyed = sorted(key(view.record(s), s) for s, _ in view.encoded_from(0))
+            order = snap.cache[cache_key] = [k[-1] for k in keyed]
+        return order
+
+    # ---- 长轮询 ----
+
+    async def wait_for_change(self, since: int, timeout: float) -> Optional[Snapshot]:
+        """等待版本号离开 since；超时返回 None
+
+        同一时间格（POLL_GRANULARITY）内到期的等待者共享一个 future 和一个定时器，
+        无论有多少等待者，一次提交只需唤醒 timeout / POLL_GRANULARITY 个 future。
+        """
+        snap = self.current
+        if snap.version != since:
+            return snap
+        loop = asyncio.get_running_loop()
+        slot = math.ceil((loop.time() + timeout) / POLL_GRANULARITY)
+        fut = self._pollers.get(slot)
+        if fut is None:
+            fut = self._pollers[slot] = loop.create_future()
+            loop.call_at(slot * POLL_GRANULARITY, self._expire_pollers, slot)
+        LONG_POLL_WAITERS.inc()
+        try:
+            # shield: 单个客户端断开不能取消共享的 future
+            return await asyncio.shield(fut)
+        finally:
+            LONG_POLL_WAITERS.dec()
+
+    def _expire_pollers(self, slot: int):
+        fut = self._pollers.pop(slot, None)
+        if fut is not None and not fut.done():
+            fut.set_result(None)
+
+    def release_waiters(self):
+        """让所有长轮询等待者立即按超时返回（关闭时使用）"""
+        pollers, self._pollers = self._pollers, {}
+        for fut in pollers.values():
+            if not fut.done():
+                fut.set_result(None)
+
+    def _wake_pollers(self):
+        pollers, self._pollers = self._pollers, {}
+        snap = self.current
+        for fut in pollers.values():
+            if not fut.done():
+                fut.set_result(snap)
+
+    # ---- 订阅 ----
 
     def add_listener(self, callback: Callable):
         self._listeners.add(callback)
@@ -20,36 +294,396 @@ class Data:
     def remove_listener(self, callback: Callable):
         self._listeners.discard(callback)
 
-    async def broadcast_status_update(self):
-        """通知所有监听者状态已更新"""
-        status_snapshot = {
-            "status_id": self.status_id,
-            "last_updated": self.last_updated,
-            "device_count": len(self.device_list),
+    def snapshot(self, event: str = "status_updated", **extra) -> Dict[str, Any]:
+        snap = self.current
+        payload = {
+            "event": event,
+            "version": snap.version,
+            "status_id": snap.status_id,
+            "last_updated": snap.last_updated,
+            # 与匿名访问者看到的设备列表一致: 不计被脱敏规则整台隐藏的设备
+            "device_count": self.redactor.public_count(snap.devices),
+            "private": snap.private,
         }
-        for listener in self._listeners:
+        payload.update(extra)
+        if snap.private:
+            # 隐私模式下不向匿名的 SSE 订阅者暴露设备 id 与电量
+            payload.pop("devices", None)
+            payload.pop("battery", None)
+        return payload
+
+    async def broadcast(self, event: str, **extra):
+        """通知所有监听者发生了事件"""
+        ids = extra.get("devices")
+        if ids is not None:
+            # 事件对匿名的 SSE 订阅者公开: 去掉被脱敏规则整台隐藏的设备，只涉及这些设备时不发送
+            ids = self.redactor.public_ids(ids)
+            if not ids:
+                return
+            extra["devices"] = ids
+        payload = self.snapshot(event, **extra)
+        start = time.perf_counter()
+        for listener in list(self._listeners):
             try:
-                await listener(status_snapshot)
+                await listener(payload)
             except Exception:
                 pass  # 忽略断开的连接
+        BROADCAST_FANOUT.observe(time.perf_counter() - start)
+
+    async def broadcast_status_update(self):
+        """通知所有监听者状态已更新"""
+        await self.broadcast("status_updated")
+
+    # ---- 写入接口 ----
 
-    def set_status(self, new_id: int, config) -> bool:
+    async def set_status(self, new_id: int, config) -> bool:
         if 0 <= new_id < len(config.status.status_list):
-            self.status_id = new_id
-            self.last_updated = time.time()
-            self.metrics_resp["switch_count"] += 1
-            asyncio.create_task(self.broadcast_status_update())
+            await self.submit("status", new_id)
             return True
         return False
 
-    def update_device(self, report: DeviceStatus):
-        entry = DeviceInfo(
-            id=report.device_id,
-            name=report.device_id,  # 或从 custom 获取
-            last_seen=time.time(),
-            battery_percent=report.battery_percent,
-            battery_status=report.battery_status,
-            active_app=report.active_app.dict() if report.active_app else None,
+    async def set_private(self, private: bool):
+        await self.submit("private", private)
+
+    async def update_device(self, report: DeviceStatus, now: Optional[float] = None):
+        """custom 字段超出限制时抛出 CustomFieldError（在进入写入队列之前）"""
+        custom = normalize_custom(report.custom, self._custom_limits)
+        rule = None
+        app = report.active_app
+        if self.classifier is not None and app is not None:
+            rule = self.classifier.classify(app.name, app.title)
+            if rule is not None:
+                CLASSIFIER_MATCHES.labels(rule.action).inc()
+        await self.submit("report", report, now if now is not None else time.time(), custom, rule)
+
+    async def remove_device(self, device_id: str) -> Optional[DeviceRecord]:
+        return await self.submit("remove", device_id)
+
+    async def remove_devices_with_prefix(self, prefix: str) -> List[DeviceRecord]:
+        return await self.submit("remove_prefix", prefix)
+
+    async def clear_devices(self) -> List[DeviceRecord]:
+        return await self.submit("clear")
+
+    def parse_record(self, item: Dict[str, Any]) -> DeviceRecord:
+        """校验并转换一条导入的设备（DeviceRecord.as_dict() 格式），不合法时抛出 ValueError"""
+        return DeviceRecord.from_dict(item, normalize_custom(item.get("custom"), self._custom_limits))
+
+    async def import_devices(self, records: List[DeviceRecord]) -> int:
+        """导入一批设备（整批在同一次提交中生效），返回条数"""
+        return await self.submit("import", records)
+
+    async def import_state(self, status_id: int, private: bool, switch_count: int, last_updated: float, version: int = 0):
+        """version: 导出时的版本号；之后发布的版本号都比它大，客户端手里的旧版本号不会与新状态混淆"""
+        await self.submit("import_state", status_id, private, switch_count, last_updated, version)
+
+    async def import_analytics(self, item: Dict[str, Any]):
+        """导入一天的应用使用时长（analytics.py 的导出格式），不合法时抛出 ValueError"""
+        parse_analytics(item)
+        await self.submit("import_analytics", item, time.time())
+
+    async def import_history(self, items: List[Dict[str, Any]]) -> int:
+        """导入一批历史记录与汇总（history.py / retention.py 的导出格式），返回保留下来的原始条数；未启用历史时忽略"""
+        entries, rows = [], []
+        for item in items:
+            if item.get("type") == "rollup":
+                rows.append(parse_rollup(item))
+            else:
+                entries.append(parse_history(item))
+        if self.history is None:
+            return 0
+        return await self.submit("import_history", entries, rows, time.time())
+
+    def extra_records(self) -> Iterable[Dict[str, Any]]:
+        """导出 / 状态文件中设备之后的记录；须在事件循环上调用（与写入者之间没有 await），之后可在任意线程迭代"""
+        records = self.analytics.export_records()
+        if self.history is None:
+            return records
+        return itertools.chain(records, self.history.export_records())
+
+    async def maintain_history(self):
+        """分批降采样过期的历史，并把需要合并的段在线程中合并后交给写入者替换"""
+        if self.history is None:
+            return
+        # 每步最多 retention_chunk 条，步与步之间让出写入者，上报不会被长时间阻塞
+        chunk = self.history.settings.retention_chunk
+        while await self.submit("history_retention", time.time(), chunk):
+            await asyncio.sleep(0)
+        while True:
+            group = self.history.plan_merge()
+            if group is None:
+                return
+            merged = await asyncio.to_thread(merge_segments, group)
+            if not await self.submit("history_swap", group, merged):
+                return  # 合并期间这些段已被丢弃，下一轮重新规划
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self._maintenance_interval)
+            try:
+                await self.maintain_history()
+            except Exception:
+                logging.exception("History maintenance failed")
+
+    def enable_replication_log(self, max_entries: int, max_bytes: int) -> ReplicationLog:
+        """恢复状态之后调用，之后的每次发布都追加到复制日志（更早的版本不在日志中）"""
+        self.devices.track_changes()
+        self.devices.take_changes()
+        self.replication_log = ReplicationLog(self._version, max_entries, max_bytes)
+        return self.replication_log
+
+    async def replicate(self, item: Dict[str, Any], records: List[DeviceRecord]):
+        """follower: 应用一个来自 leader 的日志条目（records 为已校验的 upsert）"""
+        await self.submit("replicate", item, records)
+
+    async def submit(self, kind: str, *args):
+        """提交一个变更，等待其被提交并发布后返回结果"""
+        if self.read_only and kind not in REPLICA_KINDS:
+            raise ReadOnlyReplica("this instance is a read-only replica")
+        if self._writer is None:
+            events: List[tuple] = []
+            result = self._apply(Mutation(kind, args, None), events)
+            self._publish(events)
+            return result
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(Mutation(kind, args, future))
+        return await future
+
+    # ---- 单写者 ----
+
+    def restore(self, status_id: int, private: bool, switch_count: int):
+        """在 start() 之前恢复状态（如租户被卸载后重新加载）"""
+        self._status_id = status_id
+        self._private = private
+        self._switch_count = switch_count
+        self.current = self._make_snapshot()
+
+    async def start(self):
+        if self._writer is None:
+            self._queue = asyncio.Queue(maxsize=self._queue_size)
+            if self._report_metrics:
+                MUTATION_QUEUE_DEPTH.set_function(self._queue.qsize)
+            self._writer = asyncio.create_task(self._write_loop())
+        if self.history is not None and self._maintenance is None:
+            self._maintenance = asyncio.create_task(self._maintenance_loop())
+
+    async def stop(self):
+        """处理完队列中剩余的变更后停止写入任务"""
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            self._maintenance = None
+        if self._writer is None:
+            return
+        await self._queue.put(None)
+        writer, self._writer = self._writer, None
+        await writer
+
+    async def _write_loop(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            events: List[tuple] = []
+            done = []
+            stopping = False
+            for mutation in batch:
+                if mutation is None:
+                    stopping = True
+                    continue
+                try:
+                    done.append((mutation, self._apply(mutation, events), None))
+                except Exception as e:
+                    done.append((mutation, None, e))
+
+            self._publish(events)
+            MUTATION_BATCH.observe(len(batch))
+            # 发布之后才唤醒提交者，保证读己之写
+            for mutation, result, error in done:
+                if mutation.future.done():
+                    continue
+                if error is not None:
+                    mutation.future.set_exception(error)
+                else:
+                    mutation.future.set_result(result)
+            if stopping:
+                return
+
+    def _publish(self, events: List[tuple]):
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._version += 1
+        self.current = self._make_snapshot()
+        if self._pollers:
+            self._wake_pollers()
+        applied_at = time.time()
+        if self.replication_log is not None:
+            cleared, ids = self.devices.take_changes()
+            self.replication_log.append(self._version, make_entry(self.current, cleared, ids, events, applied_at))
+        for event, extra in events:
+            asyncio.create_task(self.broadcast(event, applied_at=applied_at, **extra))
+
+    def _make_snapshot(self) -> Snapshot:
+        return Snapshot(
+            version=self._version,
+            status_id=self._status_id,
+            last_updated=self._last_updated,
+            private=self._private,
+            switch_count=self._switch_count,
+            devices=self.devices.freeze(),
         )
 
-        self.device_list.append(entry)
+    def _apply(self, mutation: Mutation, events: List[tuple]):
+        return getattr(self, "_apply_" + mutation.kind)(events, *mutation.args)
+
+    def _apply_status(self, events, new_id: int):
+        self._dirty = True
+        self._status_id = new_id
+        self._last_updated = time.time()
+        self._switch_count += 1
+        events.append(("status_updated", {}))
+        return True
+
+    def _apply_private(self, events, private: bool):
+        if private != self._private:
+            self._dirty = True
+            self._private = private
+            events.append(("private_mode_changed", {}))
+        return private
+
+    def _apply_report(self, events, report: DeviceStatus, now: float, custom=None, rule=None):
+        with REPORT_VALIDATION.time():
+            entry = DeviceRecord.from_report(report, now, custom)
+        if rule is not None:
+            apply_rule(rule, entry, self.devices.get(entry.id))
+        # 估计须在 upsert 之前填入，随记录一起预编码
+        estimate, crossed = self.battery.observe(entry.id, now, entry.battery_percent, entry.battery_status)
+        entry.battery_estimate = estimate
+        self.devices.upsert(entry)
+        # now 是服务端收到上报的时间
+        self.latency.observe(report.device_id, report.timestamp, now, time.time())
+        self.analytics.observe(entry)
+        if self.history is not None:
+            self.history.observe(entry)
+        # 设备上报频率太高，不推送 SSE 事件，只生成新快照；电量越过阈值（很少发生）除外
+        if crossed is not None and not self.redactor.hides(entry.id, "battery_percent"):
+            reason, threshold = crossed
+            events.append(("battery_low", {
+                "devices": [entry.id],
+                "battery": {"percent": entry.battery_percent, "reason": reason, "threshold": threshold, **estimate},
+            }))
+        self._dirty = True
+        return entry
+
+    def _apply_import(self, events, records: List[DeviceRecord]):
+        for entry in records:
+            self.devices.upsert(entry)
+        self._dirty = True
+        return len(records)
+
+    def _apply_import_state(self, events, status_id: int, private: bool, switch_count: int, last_updated: float, version: int):
+        self._dirty = True
+        self._version = max(self._version, version)
+        if private != self._private:
+            self._private = private
+            events.append(("private_mode_changed", {}))
+        self._status_id = status_id
+        self._switch_count = switch_count
+        self._last_updated = last_updated
+        events.append(("status_updated", {}))
+        return True
+
+    def _apply_import_analytics(self, events, item: Dict[str, Any], now: float):
+        self.analytics.import_record(item, now)
+        return True
+
+    def _apply_import_history(self, events, entries: List[tuple], rows: List[tuple], now: float):
+        for row in rows:
+            self.history.import_rollup(row)
+        return self.history.import_entries(entries, now)
+
+    def _apply_history_retention(self, events, now: float, budget: int):
+        return self.history.retention_step(now, budget)
+
+    def _apply_history_swap(self, events, old, merged):
+        return self.history.swap(old, merged)
+
+    def _apply_remove(self, events, device_id: str):
+        removed = self.devices.remove(device_id)
+        self.latency.discard(device_id)
+        self.battery.discard(device_id)
+        self.analytics.discard(device_id, time.time())
+        if self.history is not None:
+            self.history.forget(device_id)
+        if removed is not None:
+            self._dirty = True
+            self._last_updated = time.time()
+            events.append(("device_removed", {"devices": [device_id]}))
+        return removed
+
+    def _apply_remove_prefix(self, events, prefix: str):
+        removed = self.devices.remove_prefix(prefix)
+        now = time.time()
+        for entry in removed:
+            self.latency.discard(entry.id)
+            self.battery.discard(entry.id)
+            self.analytics.discard(entry.id, now)
+            if self.history is not None:
+                self.history.forget(entry.id)
+        if removed:
+            self._dirty = True
+            self._last_updated = time.time()
+            events.append(("device_removed", {"devices": [d.id for d in removed]}))
+        return removed
+
+    def _apply_clear(self, events):
+        removed = self.devices.clear()
+        self.latency.clear()
+        self.battery.clear()
+        self.analytics.discard_all(time.time())
+        if self.history is not None:
+            self.history.forget()
+        if removed:
+            self._dirty = True
+            self._last_updated = time.time()
+            visible = sum(1 for d in removed if not self.redactor.hides_device(d.id))
+            events.append(("device_cleared", {"count": visible}))
+        return removed
+
+    def _apply_replicate(self, events, item: Dict[str, Any], records: List[DeviceRecord]):
+        if item.get("clear"):
+            self.devices.clear()
+            self.latency.clear()
+            self.battery.clear()
+        for entry in records:
+            # 阈值事件随 leader 的日志条目一起复制过来，这里只更新估计
+            entry.battery_estimate = self.battery.observe(entry.id, entry.last_seen, entry.battery_percent, entry.battery_status)[0]
+            self.devices.upsert(entry)
+            self.analytics.observe(entry)
+            if self.history is not None:
+                self.history.observe(entry)
+        for device_id in item.get("remove", ()):
+            self.devices.remove(device_id)
+            self.latency.discard(device_id)
+            self.battery.discard(device_id)
+            self.analytics.discard(device_id, time.time())
+        # 全量同步结束: 丢弃快照中已不存在的设备的区间
+        if any(event == "snapshot" for event, _ in item.get("events", ())):
+            self.analytics.retain(self.devices)
+        status = item.get("status")
+        if status:
+            self._status_id = status["status_id"]
+            self._last_updated = status["last_updated"]
+            self._private = status["private"]
+            self._switch_count = status["switch_count"]
+        # 快照中间的条目不带版本号，只改存储不发布，收到最后一条时一并发布
+        if "version" in item:
+            self._version = item["version"] - 1
+            self._dirty = True
+            events.extend((event, extra) for event, extra in item.get("events", ()))
+        return True
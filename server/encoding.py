@@ -0,0 +1,97 @@
+"""
+设备记录的预编码 JSON 片段
+
+写入者在设备更新时把记录编码成 JSON 字节串，查询时直接拼接；脱敏版与完整版相同时共用一份，
+不同时在匿名访问者第一次读取时才编码（LazyEncodedDevice）；?fields= 投影使用按字段的 '"字段":值' 片段，不再逐请求序列化模型。
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from models.api import DeviceInfo
+
+# 可通过 ?fields= 选择的字段（与 DeviceInfo 一致）
+DEVICE_FIELDS: Tuple[str, ...] = tuple(DeviceInfo.model_fields)
+
+# 与 Starlette JSONResponse 的编码参数一致；复用同一个 encoder 避免每次构造
+# （整条记录由 pydantic 直接序列化，这里只用于字段片段和响应头尾）
+_encode = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode
+
+
+def dumps(value) -> bytes:
+    return _encode(value).encode("utf-8")
+
+
+_KEYS = {field: dumps(field) + b":" for field in DEVICE_FIELDS}
+
+
+class EncodedDevice:
+    """一条设备记录的预编码 JSON
+
+    whole 在写入时编码好，未投影的查询直接使用；
+    按字段的片段只在第一次被 ?fields= 用到时生成，之后随记录复用。
+    """
+
+    __slots__ = ("whole", "_fields")
+
+    def __init__(self, device: DeviceInfo):
+        self.whole = device.model_dump_json().encode("utf-8")
+        self._fields: Optional[Dict[str, bytes]] = None
+
+    @property
+    def fields(self) -> Dict[str, bytes]:
+        if self._fields is None:
+            data = json.loads(self.whole)
+            self._fields = {field: _KEYS[field] + dumps(data[field]) for field in DEVICE_FIELDS}
+        return self._fields
+
+
+class LazyEncodedDevice(EncodedDevice):
+    """第一次被读取时才编码的设备记录（用于脱敏版）
+
+    匿名访问者读取之前只保存记录和转换函数，不占用第二份 JSON；编码一次后随记录复用。
+    记录发布后不再修改，所以在读取者中编码与在写入时编码结果相同。
+    """
+
+    __slots__ = ("_record", "_build", "_whole")
+
+    def __init__(self, record, build: Callable[[Any], DeviceInfo]):
+        self._record = record
+        self._build = build
+        self._whole: Optional[bytes] = None
+        self._fields = None
+
+    @property
+    def whole(self) -> bytes:
+        if self._whole is None:
+            self._whole = self._build(self._record).model_dump_json().encode("utf-8")
+            self._record = self._build = None
+        return self._whole
+
+
+def encode_device(device: Optional[DeviceInfo]) -> Optional[EncodedDevice]:
+    if device is None:
+        return None
+    return EncodedDevice(device)
+
+
+def assemble_list(items: Sequence[EncodedDevice], fields: Optional[Sequence[str]] = None) -> bytes:
+    if not items:
+        return b"[]"
+    if fields is None:
+        return b"[" + b",".join([dev.whole for dev in items]) + b"]"
+    if len(fields) == 1:
+        (field,) = fields
+        return b"[{" + b"},{".join([dev.fields[field] for dev in items]) + b"}]"
+    return b"[{" + b"},{".join([b",".join([dev.fields[f] for f in fields]) for dev in items]) + b"}]"
+
+
+def parse_fields(raw: Optional[str]) -> Optional[List[str]]:
+    """解析 ?fields=id,name,using；未知字段抛出 ValueError"""
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in DEVICE_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}; available: {', '.join(DEVICE_FIELDS)}")
+    return fields
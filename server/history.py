@@ -0,0 +1,631 @@
+"""
+设备历史与全文检索
+
+只记录变化: 设备的 (应用名, 窗口标题, 是否在使用) 与上一次不同时追加一条转换
+    (时间, 设备, 应用名, 标题, using, 电量)
+电量变化、或距上一条已超过 sample_interval 秒时追加一条采样（不进入全文索引），
+供 retention.py 降采样时判断设备在线与电量范围；其余重复的心跳上报不占空间。
+
+存储按段组织:
+- 活动段: 写入者追加，满 segment_entries 条后封存
+- 封存段: 不可变，列式保存，条目按时间排序；倒排表为 term -> 有序的段内下标（array）
+- 合并: 同一层（条目数同一数量级）的封存段达到 merge_factor 个时合并为一个，
+  在线程中构建新段，再经写入者原子替换（见 Data.maintain_history），不阻塞上报；
+  单段不超过 max_segment_entries 条
+- 保留: 整段早于 retention_days 的原始数据由 retention.py 分批降采样为分钟 / 小时汇总后丢弃；
+  总条目数超过 max_entries 时直接丢弃最旧的段
+
+分词（tokenize）: NFKC + casefold 后，
+- 拉丁字母 / 数字等连续的词作为一个 term
+- 中日韩文字按相邻两字切成 bigram（单独一个字时为单字），"腾讯会议" -> 腾讯 讯会 会议
+
+查询语法（search）: 空格分隔的条件全部满足（AND）
+- zoom: 包含该词
+- zoo*: 包含以 zoo 开头的词
+- "weekly sync": 短语，按原文顺序连续出现
+- 中文直接写，如 会议室（按短语匹配，不会匹配到分开出现的 "会议" 和 "议室"）；
+  单个汉字匹配含有这个字的任意 bigram，如 议 能找到 "腾讯会议"，会 / 会* 能找到 "开会"
+
+导出 / 状态文件中每条一行（见 backup.py），采样带 "sample": true:
+    {"type": "history", "device": ..., "time": ..., "app": ..., "title": ..., "using": ..., "battery": ...}
+"""
+
+import bisect
+import datetime
+import heapq
+import math
+import re
+import unicodedata
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from metrics import counter, gauge
+from records import DeviceRecord
+from retention import Rollups
+
+HISTORY_ENTRIES = gauge("sleepy_history_entries", "Transitions kept in device history")
+HISTORY_SEGMENTS = gauge("sleepy_history_segments", "History index segments (sealed + active)")
+HISTORY_ROLLUPS = gauge("sleepy_history_rollup_rows", "Minute / hour rollup rows kept after downsampling")
+HISTORY_MERGES = counter("sleepy_history_merges", "History segment merges")
+HISTORY_EXPIRED = counter("sleepy_history_expired", "Raw history entries removed by retention (downsampled or dropped)")
+
+# 前缀查询最多展开的 term 数，超出时报错提示缩小范围
+MAX_PREFIX_TERMS = 1024
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_RUN = re.compile(f"([{_CJK}]+)|([^\\W{_CJK}]+)")
+_QUERY = re.compile(r'"([^"]*)"|(\S+)')
+_CJK_CHAR = re.compile(f"[{_CJK}]")
+
+
+class SearchError(ValueError):
+    """查询语法错误"""
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _run_terms(run: str, cjk: bool) -> Iterator[str]:
+    if not cjk:
+        yield run
+    elif len(run) == 1:
+        yield run
+    else:
+        for i in range(len(run) - 1):
+            yield run[i:i + 2]
+
+
+def tokenize(text: str) -> Iterator[str]:
+    """已 normalize 的文本 -> term（可能重复）"""
+    for match in _RUN.finditer(text):
+        cjk, word = match.groups()
+        yield from _run_terms(cjk or word, cjk is not None)
+
+
+class Query:
+    """解析后的查询: 必须包含的 term、前缀、单个汉字、以及需要在原文中逐字核对的片段"""
+
+    __slots__ = ("terms", "prefixes", "chars", "phrases")
+
+    def __init__(self, text: str):
+        self.terms: List[str] = []
+        self.prefixes: List[str] = []
+        # 单个汉字不是完整的 term（索引里是 bigram），查询时展开为含有它的所有 term
+        self.chars: List[str] = []
+        self.phrases: List[str] = []
+        for match in _QUERY.finditer(normalize(text)):
+            phrase, word = match.groups()
+            if phrase is not None:
+                runs = list(_RUN.finditer(phrase))
+                for m in runs:
+                    self._add_run(m.group(0), m.group(1) is not None)
+                if len(runs) > 1 or any(m.group(1) and len(m.group(0)) > 2 for m in runs):
+                    self.phrases.append(" ".join(m.group(0) for m in runs))
+                continue
+            prefix = word.endswith("*")
+            runs = list(_RUN.finditer(word.rstrip("*")))
+            for i, m in enumerate(runs):
+                cjk = m.group(1) is not None
+                # 中文按 bigram 索引，多个字时前缀没有意义；单个字本来就会匹配以它开头的 bigram
+                if prefix and i == len(runs) - 1 and not cjk:
+                    self.prefixes.append(m.group(0))
+                    continue
+                self._add_run(m.group(0), cjk)
+                if cjk and len(m.group(0)) > 2:
+                    self.phrases.append(m.group(0))
+        if not self.terms and not self.prefixes and not self.chars:
+            raise SearchError("Empty query")
+        self.terms = list(dict.fromkeys(self.terms))
+        self.chars = list(dict.fromkeys(self.chars))
+
+    def _add_run(self, run: str, cjk: bool):
+        if cjk and len(run) == 1:
+            self.chars.append(run)
+        else:
+            self.terms.extend(_run_terms(run, cjk))
+
+
+def _text(app: Optional[str], title: Optional[str]) -> str:
+    return normalize(f"{app or ''} {title or ''}")
+
+
+def _squash(text: str) -> str:
+    """短语核对用: 只保留词，词之间一个空格"""
+    return " ".join(m.group(0) for m in _RUN.finditer(text))
+
+
+class Segment:
+    """一段历史；seal() 之后不再修改"""
+
+    __slots__ = (
+        "times", "devices", "apps", "titles", "usings", "batteries", "kinds", "postings", "terms", "suffixes", "ordered",
+        "sealed",
+    )
+
+    def __init__(self):
+        self.times = array("d")
+        self.devices: List[str] = []
+        self.apps: List[Optional[str]] = []
+        self.titles: List[Optional[str]] = []
+        self.usings: List[Optional[bool]] = []
+        self.batteries: List[Optional[int]] = []
+        # 1: 转换（已索引），0: 采样
+        self.kinds = bytearray()
+        self.postings: Dict[str, Any] = {}
+        # 封存后按字典序排列的 term，供前缀查询二分
+        self.terms: List[str] = []
+        # 封存后按字典序排列的中文 bigram 倒序（"开会" -> "会开"），供查找以某个字结尾的 bigram
+        self.suffixes: List[str] = []
+        self.ordered = True
+        self.sealed = False
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def first(self) -> float:
+        return self.times[0] if self.ordered else min(self.times)
+
+    @property
+    def last(self) -> float:
+        return self.times[-1] if self.ordered else max(self.times)
+
+    def add(
+        self, ts: float, device: str, app: Optional[str], title: Optional[str], using: Optional[bool],
+        battery: Optional[int] = None, indexed: bool = True,
+    ):
+        pos = len(self.times)
+        if pos and ts < self.times[-1]:
+            self.ordered = False
+        self.times.append(ts)
+        self.devices.append(device)
+        self.apps.append(app)
+        self.titles.append(title)
+        self.usings.append(using)
+        self.batteries.append(battery)
+        self.kinds.append(indexed)
+        if not indexed:
+            return
+        postings = self.postings
+        for term in set(tokenize(_text(app, title))):
+            plist = postings.get(term)
+            if plist is None:
+                postings[term] = [pos]
+            else:
+                plist.append(pos)
+
+    def seal(self) -> "Segment":
+        if not self.ordered:
+            order = sorted(range(len(self.times)), key=self.times.__getitem__)
+            rebuilt = Segment()
+            for i in order:
+                rebuilt.add(*self.row(i))
+            return rebuilt.seal()
+        self.postings = {term: array("I", plist) for term, plist in self.postings.items()}
+        self._index_terms()
+        return self
+
+    def _index_terms(self):
+        self.terms = sorted(self.postings)
+        self.suffixes = sorted(t[::-1] for t in self.terms if len(t) == 2 and _CJK_CHAR.match(t))
+        self.sealed = True
+
+    def row(self, i: int) -> tuple:
+        return (
+            self.times[i], self.devices[i], self.apps[i], self.titles[i], self.usings[i], self.batteries[i],
+            bool(self.kinds[i]),
+        )
+
+    def entry(self, i: int) -> Dict[str, Any]:
+        out = {
+            "device": self.devices[i],
+            "time": self.times[i],
+            "app": self.apps[i],
+            "title": self.titles[i],
+            "using": self.usings[i],
+            "battery": self.batteries[i],
+        }
+        if not self.kinds[i]:
+            out["sample"] = True
+        return out
+
+    # ---- 查询 ----
+
+    def _prefix_postings(self, prefix: str) -> List[int]:
+        if self.sealed:
+            lo = bisect.bisect_left(self.terms, prefix)
+            hi = bisect.bisect_left(self.terms, prefix + "\U0010ffff", lo)
+            matched = self.terms[lo:hi]
+        else:
+            matched = [t for t in self.postings if t.startswith(prefix)]
+        if len(matched) > MAX_PREFIX_TERMS:
+            raise SearchError(f"Prefix {prefix!r}* matches too many terms; make it longer")
+        return self._union(matched)
+
+    def _char_postings(self, char: str) -> List[int]:
+        """含有这个汉字的条目: 单字 term，以及它在前或在后的 bigram"""
+        if self.sealed:
+            lo = bisect.bisect_left(self.terms, char)
+            hi = bisect.bisect_left(self.terms, char + "\U0010ffff", lo)
+            matched = self.terms[lo:hi]
+            lo = bisect.bisect_left(self.suffixes, char)
+            hi = bisect.bisect_left(self.suffixes, char + "\U0010ffff", lo)
+            matched += [t[::-1] for t in self.suffixes[lo:hi]]
+        else:
+            # 中文 term 与其他 term 不会混在一起，含有这个字的就是中文 term
+            matched = [t for t in self.postings if char in t]
+        return self._union(matched)
+
+    def _union(self, matched: List[str]) -> List[int]:
+        if len(matched) == 1:
+            return self.postings[matched[0]]
+        return sorted(set().union(*(self.postings[t] for t in matched)))
+
+    def search(
+        self, query: Query, start: float, end: float, device: Optional[str], limit: int,
+    ) -> List[Tuple[float, int]]:
+        """段内满足条件的条目，按时间从新到旧，最多 limit 条 -> [(时间, 下标)]"""
+        lists = []
+        for term in query.terms:
+            plist = self.postings.get(term)
+            if plist is None:
+                return []
+            lists.append(plist)
+        for prefix in query.prefixes:
+            plist = self._prefix_postings(prefix)
+            if not plist:
+                return []
+            lists.append(plist)
+        for char in query.chars:
+            plist = self._char_postings(char)
+            if not plist:
+                return []
+            lists.append(plist)
+        lists.sort(key=len)
+        driver, others = lists[0], lists[1:]
+        times = self.times
+        # 条目按时间排序时，先按时间范围截取驱动列表
+        hi = len(driver)
+        if self.ordered:
+            lo_pos = bisect.bisect_left(times, start)
+            hi_pos = bisect.bisect_right(times, end)
+            lo = bisect.bisect_left(driver, lo_pos)
+            hi = bisect.bisect_left(driver, hi_pos, lo)
+        else:
+            lo = 0
+        out = []
+        for k in range(hi - 1, lo - 1, -1):
+            i = driver[k]
+            ts = times[i]
+            if not start <= ts <= end:
+                continue
+            if device is not None and self.devices[i] != device:
+                continue
+            if not all(_contains(plist, i) for plist in others):
+                continue
+            if query.phrases:
+                text = _squash(_text(self.apps[i], self.titles[i]))
+                if not all(p in text for p in query.phrases):
+                    continue
+            out.append((ts, i))
+            if self.ordered and len(out) >= limit:
+                break
+        if not self.ordered:
+            out.sort(reverse=True)
+            del out[limit:]
+        return out
+
+
+def _contains(plist, i: int) -> bool:
+    k = bisect.bisect_left(plist, i)
+    return k < len(plist) and plist[k] == i
+
+
+def merge_segments(segments: List[Segment]) -> Segment:
+    """合并若干封存段（可在线程中运行，只读取输入）"""
+    ordered = sorted(segments, key=lambda s: s.first)
+    disjoint = all(a.last <= b.first for a, b in zip(ordered, ordered[1:]))
+    merged = Segment()
+    if not disjoint:
+        # 时间有重叠（如导入了旧数据）: 按时间归并后重建倒排表
+        rows = heapq.merge(*((s.row(i) for i in range(len(s))) for s in ordered), key=lambda r: r[0])
+        for row in rows:
+            merged.add(*row)
+        return merged.seal()
+    # 时间不重叠: 直接拼接各列，倒排表加上偏移
+    postings: Dict[str, array] = {}
+    offset = 0
+    for s in ordered:
+        merged.times.extend(s.times)
+        merged.devices.extend(s.devices)
+        merged.apps.extend(s.apps)
+        merged.titles.extend(s.titles)
+        merged.usings.extend(s.usings)
+        merged.batteries.extend(s.batteries)
+        merged.kinds.extend(s.kinds)
+        for term, plist in s.postings.items():
+            target = postings.get(term)
+            if target is None:
+                target = postings[term] = array("I")
+            if offset:
+                target.extend(i + offset for i in plist)
+            else:
+                target.extend(plist)
+        offset += len(s)
+    merged.postings = postings
+    merged._index_terms()
+    return merged
+
+
+class HistoryStore:
+    """只由写入者修改（merge_segments 除外，它只读封存段）；查询在事件循环上同步完成"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.sealed: List[Segment] = []  # 按封存顺序
+        self.active = Segment()
+        self.rollups = Rollups(settings)
+        # 设备 -> 最近一次记录的 ((应用名, 标题, using), 电量, 时间)
+        self._last: Dict[str, tuple] = {}
+        self._count = 0
+        # 正在降采样的封存段与进度；早于 _raw_cutoff 的段不再参与合并
+        self._draining: Optional[Segment] = None
+        self._drain_pos = 0
+        self._raw_cutoff = -math.inf
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def segments(self) -> int:
+        return len(self.sealed) + 1
+
+    # ---- 写入（写入者调用） ----
+
+    def observe(self, record: DeviceRecord):
+        state = (record.app_name, record.app_title, record.using)
+        battery, ts = record.battery_percent, record.last_seen
+        last = self._last.get(record.id)
+        if last is None or last[0] != state:
+            indexed = True
+        elif last[1] != battery or ts - last[2] >= self.settings.sample_interval:
+            indexed = False
+        else:
+            return
+        self._last[record.id] = (state, battery, ts)
+        self.add(ts, record.id, *state, battery, indexed)
+
+    def forget(self, device_id: Optional[str] = None):
+        """设备被删除（None 为清空所有设备）: 之后再上报时重新记录一条，已有的历史保留"""
+        if device_id is None:
+            self._last.clear()
+        else:
+            self._last.pop(device_id, None)
+
+    def add(
+        self, ts: float, device: str, app: Optional[str], title: Optional[str], using: Optional[bool],
+        battery: Optional[int] = None, indexed: bool = True,
+    ):
+        self.active.add(ts, device, app, title, using, battery, indexed)
+        self._count += 1
+        if len(self.active) >= self.settings.segment_entries:
+            self.sealed.append(self.active.seal())
+            self.active = Segment()
+            self._enforce_cap()
+
+    def import_entries(self, entries: List[tuple], now: float) -> int:
+        """导入 parse_entry 的结果；早于保留期的原始数据直接降采样"""
+        cutoff = now - self.settings.retention_days * 86400
+        added = 0
+        old = []
+        for entry in entries:
+            if entry[0] >= cutoff:
+                self.add(*entry)
+                added += 1
+            else:
+                old.append(entry)
+        if old:
+            old.sort(key=lambda e: e[0])
+            for ts, device, app, _, using, battery, _ in old:
+                self.rollups.feed(ts, device, app, using, battery)
+            self.rollups.settle(old[-1][0])
+        return added
+
+    def import_rollup(self, row: tuple):
+        self.rollups.import_row(row)
+
+    def retention_step(self, now: float, budget: int) -> bool:
+        """执行一步保留策略，最多处理约 budget 条；-> 是否还有剩余（写入者调用，见 Data.maintain_history）
+
+        先把最旧的一个早于 retention_days 的封存段逐批喂给 Rollups，整段处理完后丢弃；
+        没有过期的原始数据后再做分钟 -> 小时合并与小时汇总过期
+        """
+        cutoff = now - self.settings.retention_days * 86400
+        self._raw_cutoff = cutoff
+        segment = self._draining
+        if segment is None:
+            old = [s for s in self.sealed if s.last < cutoff]
+            if old:
+                segment = self._draining = min(old, key=lambda s: s.first)
+                self._drain_pos = 0
+        if segment is None:
+            return self.rollups.compact(now, budget)
+        start, stop = self._drain_pos, min(len(segment), self._drain_pos + budget)
+        feed = self.rollups.feed
+        for ts, device, app, using, battery in zip(
+            segment.times[start:stop], segment.devices[start:stop], segment.apps[start:stop],
+            segment.usings[start:stop], segment.batteries[start:stop],
+        ):
+            feed(ts, device, app, using, battery)
+        self._drain_pos = stop
+        if stop == len(segment):
+            self.rollups.settle(segment.last)
+            self.sealed = [s for s in self.sealed if s is not segment]
+            self._count -= len(segment)
+            HISTORY_EXPIRED.inc(len(segment))
+            self._draining = None
+        return True
+
+    def _enforce_cap(self):
+        while self._count > self.settings.max_entries and self.sealed:
+            oldest = min(range(len(self.sealed)), key=lambda k: self.sealed[k].last)
+            if self.sealed[oldest] is self._draining:
+                self._draining = None
+            self._count -= len(self.sealed[oldest])
+            HISTORY_EXPIRED.inc(len(self.sealed[oldest]))
+            del self.sealed[oldest]
+
+    def _tier(self, segment: Segment) -> int:
+        """0 层为刚封存的段，每合并一次大约上升一层"""
+        tier, n = 0, len(segment) // self.settings.segment_entries
+        while n >= self.settings.merge_factor:
+            n //= self.settings.merge_factor
+            tier += 1
+        return tier
+
+    def plan_merge(self) -> Optional[List[Segment]]:
+        """选出一组需要合并的封存段（同一层、达到 merge_factor 个）；没有时返回 None"""
+        factor = self.settings.merge_factor
+        tiers: Dict[int, List[Segment]] = {}
+        for segment in self.sealed:
+            if len(segment) * factor > self.settings.max_segment_entries:
+                continue  # 再合并会超过单段上限
+            if segment is self._draining or segment.last < self._raw_cutoff:
+                continue  # 即将被降采样
+            group = tiers.setdefault(self._tier(segment), [])
+            group.append(segment)
+            if len(group) >= factor:
+                return group
+        return None
+
+    def swap(self, old: List[Segment], merged: Segment) -> bool:
+        """用合并后的段替换 old；其间 old 被保留期丢弃或开始降采样时放弃"""
+        ids = {id(s) for s in old}
+        present = [s for s in self.sealed if id(s) in ids]
+        if len(present) != len(old) or id(self._draining) in ids:
+            return False
+        pos = next(k for k, s in enumerate(self.sealed) if id(s) in ids)
+        self.sealed = [s for s in self.sealed if id(s) not in ids]
+        self.sealed.insert(pos, merged)
+        HISTORY_MERGES.inc()
+        return True
+
+    # ---- 查询 ----
+
+    def search(
+        self, query: Query, start: float = 0.0, end: float = math.inf, device: Optional[str] = None, limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """按时间从新到旧返回最多 limit 条；先查最新的段，前 limit 条已确定时不再看更早的段"""
+        segments = [self.active] + sorted(self.sealed, key=lambda s: s.last, reverse=True)
+        hits: List[Tuple[float, int, Segment]] = []
+        for segment in segments:
+            if not len(segment) or segment.first > end or segment.last < start:
+                continue
+            if len(hits) >= limit and segment.last < hits[limit - 1][0]:
+                break
+            hits.extend((ts, i, segment) for ts, i in segment.search(query, start, end, device, limit))
+            hits.sort(key=lambda h: h[0], reverse=True)
+            del hits[limit:]
+        return [segment.entry(i) for _, i, segment in hits]
+
+    # ---- 导出 / 导入 ----
+
+    def export_records(self) -> Iterator[Dict[str, Any]]:
+        """在事件循环上调用时取得当前各段（封存段不可变，活动段复制一份）与汇总，之后可在任意线程迭代"""
+        segments = sorted(self.sealed, key=lambda s: s.first)
+        segments.append(_copy_columns(self.active))
+        rollups = self.rollups.export_records()
+
+        def rows():
+            for segment in segments:
+                for i in range(len(segment)):
+                    yield {"type": "history", **segment.entry(i)}
+            yield from rollups
+
+        return rows()
+
+    def scan(self, start: float = 0.0, end: float = math.inf, device: Optional[str] = None) -> Iterator[tuple]:
+        """列式导出（columnar.py）用，取段的方式同 export_records
+
+        -> (时间, 设备, 应用名, 标题, using, 电量, 是否采样)，按段依次产出
+        """
+        segments = [s for s in sorted(self.sealed, key=lambda s: s.first) if s.first <= end and s.last >= start]
+        active = _copy_columns(self.active)
+
+        def rows():
+            for segment in segments + [active]:
+                times = segment.times
+                if segment is active:
+                    lo, hi = 0, len(times)  # 活动段可能无序
+                else:
+                    lo, hi = bisect.bisect_left(times, start), bisect.bisect_right(times, end)
+                devices, kinds = segment.devices, segment.kinds
+                for i in range(lo, hi):
+                    if device is not None and devices[i] != device:
+                        continue
+                    ts = times[i]
+                    if start <= ts <= end:
+                        yield (
+                            ts, devices[i], segment.apps[i], segment.titles[i], segment.usings[i],
+                            segment.batteries[i], not kinds[i],
+                        )
+
+        return rows()
+
+
+class _Columns:
+    __slots__ = ("times", "devices", "apps", "titles", "usings", "batteries", "kinds")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    entry = Segment.entry
+
+
+def _copy_columns(segment: Segment) -> _Columns:
+    out = _Columns()
+    out.times = array("d", segment.times)
+    out.devices = list(segment.devices)
+    out.apps = list(segment.apps)
+    out.titles = list(segment.titles)
+    out.usings = list(segment.usings)
+    out.batteries = list(segment.batteries)
+    out.kinds = bytearray(segment.kinds)
+    return out
+
+
+def parse_entry(item: Dict[str, Any]) -> tuple:
+    """校验一条 history 记录 -> (时间, 设备, 应用名, 标题, using, 电量, 是否索引)；不合法时抛出 ValueError"""
+    ts, device = item.get("time"), item.get("device")
+    if not isinstance(ts, (int, float)) or isinstance(ts, bool) or not math.isfinite(ts):
+        raise ValueError("invalid history time")
+    if not isinstance(device, str) or not device:
+        raise ValueError("invalid history device")
+    app, title, using = item.get("app"), item.get("title"), item.get("using")
+    if not all(v is None or isinstance(v, str) for v in (app, title)):
+        raise ValueError("invalid history app / title")
+    if using is not None and not isinstance(using, bool):
+        raise ValueError("invalid history using")
+    battery, sample = item.get("battery"), item.get("sample", False)
+    if battery is not None and (not isinstance(battery, int) or isinstance(battery, bool) or not 0 <= battery <= 100):
+        raise ValueError("invalid history battery")
+    if not isinstance(sample, bool):
+        raise ValueError("invalid history sample")
+    return float(ts), device, app, title, using, battery, not sample
+
+
+def parse_time(value: Optional[str], default: float) -> float:
+    """Unix 时间戳或 ISO 8601（不带时区时按服务器本地时间）"""
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise SearchError(f"Invalid time: {value!r}")
+    return parsed.timestamp()
+
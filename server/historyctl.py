@@ -0,0 +1,162 @@
+"""
+历史数据导出命令行工具（只依赖标准库；安装了 pyarrow 时可输出 Parquet）
+
+    # 离线: 从状态文件 / /api/state/export 的导出（可为 gzip）转换，不需要服务端运行
+    python historyctl.py convert -i data/state.ndjson.gz -t history -f scol -o history.scol
+    python historyctl.py convert -i backup.ndjson.gz -t rollups -f csv -o rollups.csv --from 2025-01-01
+
+    # 在线: 下载 /api/history/export
+    python historyctl.py download -u http://127.0.0.1:8080 -s <secret> -t history -f columnar -o history.scol
+
+    # 查看 scol 文件（mmap 读取）
+    python historyctl.py inspect history.scol --head 5
+
+格式与列见 columnar.py。转换和下载都按块流式读写，内存占用与文件大小无关。
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Iterator, Optional
+
+import columnar
+
+CHUNK = 1 << 16
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """Unix 时间戳或 ISO 8601（不带时区时按本地时间）"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+def _lines(source: str) -> Iterator[bytes]:
+    raw = sys.stdin.buffer if source == "-" else open(source, "rb")
+    with raw:
+        head = raw.peek(2)[:2]
+        stream = gzip.GzipFile(fileobj=raw) if head == b"\x1f\x8b" else raw
+        yield from stream
+
+
+def _rows(source: str, table: str, start: Optional[float], end: Optional[float], device: Optional[str]):
+    for line in _lines(source):
+        if not line.strip():
+            continue
+        row = columnar.record_row(table, json.loads(line))
+        if row is None:
+            continue
+        ts = row[0] if table == "history" else row[2]
+        dev = row[1]
+        if (start is not None and ts < start) or (end is not None and ts > end) or (device is not None and dev != device):
+            continue
+        yield row
+
+
+def _write(chunks: Iterator[bytes], output: str):
+    if output == "-":
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+        return
+    tmp = f"{output}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, output)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    print(f"exported to {output} ({os.path.getsize(output)} bytes)", file=sys.stderr)
+
+
+def convert(args) -> int:
+    fmt = columnar.resolve_format(args.format)
+    rows = _rows(args.input, args.table, parse_time(args.start), parse_time(args.end), args.device)
+    _write(columnar.chunks(args.table, rows, fmt), args.output)
+    return 0
+
+
+def download(args) -> int:
+    params = {"table": args.table, "format": args.format}
+    for key, value in (("from", args.start), ("to", args.end), ("device", args.device)):
+        if value:
+            params[key] = value
+    req = urllib.request.Request(f"{args.url.rstrip('/')}/api/history/export?{urllib.parse.urlencode(params)}")
+    req.add_header("X-Secret", args.secret)
+    with urllib.request.urlopen(req) as resp:
+        _write(iter(lambda: resp.read(CHUNK), b""), args.output)
+    return 0
+
+
+def inspect(args) -> int:
+    with columnar.ColumnarFile(args.file) as f:
+        meta = f.meta
+        print(json.dumps({
+            "table": meta["table"],
+            "rows": f.rows,
+            "row_groups": len(meta["row_groups"]),
+            "columns": meta["columns"],
+        }, ensure_ascii=False))
+        if args.head:
+            for n, row in enumerate(f.iter_rows()):
+                if n >= args.head:
+                    break
+                print(json.dumps(row, ensure_ascii=False))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sleepy history export")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def selection(p):
+        p.add_argument("-t", "--table", choices=sorted(columnar.TABLES), default="history")
+        p.add_argument("-f", "--format", choices=columnar.FORMATS, default="csv")
+        p.add_argument("-o", "--output", required=True, help="输出文件，- 为标准输出")
+        p.add_argument("--from", dest="start", help="起始时间（Unix 时间戳或 ISO 8601）")
+        p.add_argument("--to", dest="end", help="结束时间")
+        p.add_argument("--device", help="只导出这台设备")
+
+    conv = sub.add_parser("convert", help="离线转换状态文件 / 导出文件（支持 gzip）")
+    conv.add_argument("-i", "--input", required=True, help="输入文件，- 为标准输入")
+    selection(conv)
+
+    down = sub.add_parser("download", help="从服务端下载 /api/history/export")
+    down.add_argument("-u", "--url", default="http://127.0.0.1:8080", help="服务端地址（可带租户前缀）")
+    down.add_argument("-s", "--secret", default=os.environ.get("SLEEPY_SECRET"), help="默认取 SLEEPY_SECRET")
+    selection(down)
+
+    insp = sub.add_parser("inspect", help="查看 scol 文件的列与行数")
+    insp.add_argument("file")
+    insp.add_argument("--head", type=int, default=0, help="同时打印前 N 行")
+
+    args = parser.parse_args(argv)
+    if args.command == "download" and not args.secret:
+        parser.error("secret is required (--secret or SLEEPY_SECRET)")
+    try:
+        return {"convert": convert, "download": download, "inspect": inspect}[args.command](args)
+    except urllib.error.HTTPError as e:
+        print(f"HTTP {e.code}: {e.read().decode('utf-8', 'replace')}", file=sys.stderr)
+        return 1
+    except urllib.error.URLError as e:
+        print(f"request failed: {e.reason}", file=sys.stderr)
+        return 1
+    except (ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+极简 HTTP/1.1 客户端（只依赖标准库），供 webhook 推送与复制 follower 使用
+
+- open_connection(): http://、https:// 或 unix:/path 地址
+- ConnectionPool: 按 (scheme, host, port) 保留空闲的 keep-alive 连接；
+  复用的连接已被对端关闭时（在收到任何响应之前出错）自动换一条新连接重试一次
+"""
+
+import asyncio
+from collections import defaultdict, deque
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+# 单个响应体的上限，防止对端返回超大内容
+MAX_BODY = 1 << 20
+
+
+class _Origin:
+    __slots__ = ("scheme", "host", "port", "unix", "netloc")
+
+    def __init__(self, url: str):
+        if url.startswith("unix:"):
+            self.scheme, self.host, self.port = "unix", "localhost", 0
+            self.unix = url[len("unix:"):]
+            self.netloc = "localhost"
+            return
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.unix = None
+        self.netloc = parts.netloc
+
+    @property
+    def key(self) -> Tuple[str, str, int]:
+        return (self.scheme, self.unix or self.host, self.port)
+
+
+def split_target(url: str) -> Tuple[str, str]:
+    """-> (源, 请求路径)；unix:/path 地址没有路径部分"""
+    if url.startswith("unix:"):
+        return url, ""
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    return f"{parts.scheme}://{parts.netloc}", path
+
+
+async def open_connection(url: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter, str]:
+    """-> (reader, writer, Host 头)"""
+    origin = _Origin(url)
+    if origin.unix is not None:
+        reader, writer = await asyncio.open_unix_connection(origin.unix)
+    else:
+        reader, writer = await asyncio.open_connection(
+            origin.host, origin.port, ssl=True if origin.scheme == "https" else None
+        )
+    return reader, writer, origin.netloc
+
+
+async def read_head(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str]]:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed before response")
+    # "HTTP/1.1 200 OK"；格式不对时抛出 ValueError，与其他响应解析错误一致
+    parts = status_line.split(None, 2)
+    if len(parts) < 2 or not parts[0].startswith(b"HTTP/") or len(parts[1]) != 3 or not parts[1].isdigit():
+        raise ValueError(f"malformed status line: {status_line[:100]!r}")
+    status = int(parts[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return status, headers
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+
+async def read_chunks(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    """chunked 响应体"""
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            await reader.readline()
+            return
+        chunk = await reader.readexactly(size)
+        await reader.readline()
+        yield chunk
+
+
+async def read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> Tuple[bytes, bool]:
+    """-> (响应体, 连接能否复用)"""
+    keep_alive = headers.get("connection", "").lower() != "close"
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        parts, size = [], 0
+        async for chunk in read_chunks(reader):
+            size += len(chunk)
+            if size > MAX_BODY:
+                raise ValueError("response body too large")
+            parts.append(chunk)
+        return b"".join(parts), keep_alive
+    if "content-length" in headers:
+        length = int(headers["content-length"])
+        if length > MAX_BODY:
+            raise ValueError("response body too large")
+        return await reader.readexactly(length), keep_alive
+    # 既没有长度也不是 chunked: 读到连接关闭
+    return await reader.read(MAX_BODY), False
+
+
+def _request_head(method: str, path: str, host: str, headers: Dict[str, str], length: int) -> bytes:
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {length}"]
+    lines.extend(f"{k}: {v}" for k, v in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+class ConnectionPool:
+    def __init__(self, max_idle: int = 4):
+        self.max_idle = max_idle
+        self._idle: Dict[tuple, Deque[Tuple[asyncio.StreamReader, asyncio.StreamWriter, str]]] = defaultdict(deque)
+
+    def _take(self, key: tuple):
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer, host = idle.pop()
+            # 空闲期间被对端关闭的连接
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, host
+            writer.close()
+        return None
+
+    def _give(self, key: tuple, conn):
+        idle = self._idle[key]
+        if len(idle) < self.max_idle:
+            idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def request(
+        self, url: str, method: str = "POST", body: bytes = b"", headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        """发送一个请求；超时由调用方用 asyncio.wait_for 控制（超时的连接不会放回池中）"""
+        base, path = split_target(url)
+        key = _Origin(base).key
+        for attempt in range(2):
+            conn = self._take(key) if attempt == 0 else None
+            reused = conn is not None
+            if conn is None:
+                conn = await open_connection(base)
+            reader, writer, host = conn
+            try:
+                writer.write(_request_head(method, path or "/", host, headers or {}, len(body)) + body)
+                await writer.drain()
+                status, resp_headers = await read_head(reader)
+            except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                writer.close()
+                if reused:
+                    continue  # 复用的连接已失效，换新连接重试
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            try:
+                data, keep_alive = await read_body(reader, resp_headers)
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._give(key, conn)
+            else:
+                writer.close()
+            return status, resp_headers, data
+        raise ConnectionError("unreachable")
+
+    def idle_count(self) -> int:
+        return sum(len(v) for v in self._idle.values())
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer, _ in idle:
+                writer.close()
+        self._idle.clear()
@@ -0,0 +1,150 @@
+"""
+上报的端到端延迟
+
+客户端在 DeviceStatus.timestamp 里带上发送时间，但客户端时钟和服务端并不同步:
+    到达时间 - 客户端时间 = 时钟偏差 + 网络延迟
+网络延迟总是非负，所以按设备跟踪这个差值的下包络（最小值滤波）作为时钟偏差的估计，
+并允许它按 MAX_DRIFT 缓慢上升以跟上时钟漂移；偏差突然变大（客户端时钟被往回调）
+连续 RESET_AFTER 次后直接重置。修正后得到的是「比该设备最好情况多出的传输时间」。
+
+分段:
+- transit: 客户端发送 -> 服务端收到（已扣除时钟偏差）
+- queue:   服务端收到 -> 写入者应用
+- 端到端:  transit + queue
+- 应用 -> SSE 投递在 routes/status.py 中按事件统计（设备上报本身不推送 SSE）
+"""
+
+from typing import Dict, Optional
+
+from metrics import histogram
+
+# 时钟偏差估计允许的上升速度（秒 / 秒），约为普通晶振漂移的上限
+MAX_DRIFT = 1e-4
+# 比估计值大这么多（秒）的样本连续出现 RESET_AFTER 次，视为客户端时钟被调整
+RESET_THRESHOLD = 5.0
+RESET_AFTER = 3
+# 每台设备延迟的平滑系数
+EWMA_ALPHA = 0.2
+
+REPORT_TRANSIT = histogram(
+    "sleepy_report_transit_seconds",
+    "Client send to server receive, corrected for the device's estimated clock offset",
+)
+REPORT_QUEUE = histogram(
+    "sleepy_report_queue_seconds",
+    "Server receive to the writer applying the report",
+)
+REPORT_END_TO_END = histogram(
+    "sleepy_report_end_to_end_seconds",
+    "Client send to the writer applying the report (offset corrected)",
+)
+APPLY_TO_SSE = histogram(
+    "sleepy_apply_to_sse_seconds",
+    "Writer applying a change to the SSE frame being yielded",
+)
+
+
+class DeviceLatency:
+    """单台设备的时钟偏差估计与平滑后的延迟"""
+
+    __slots__ = ("offset", "last_received", "suspect", "transit", "queue", "end_to_end", "max_end_to_end", "samples")
+
+    def __init__(self):
+        self.offset: Optional[float] = None
+        self.last_received = 0.0
+        self.suspect = 0
+        self.transit = 0.0
+        self.queue = 0.0
+        self.end_to_end = 0.0
+        self.max_end_to_end = 0.0
+        self.samples = 0
+
+    def _update_offset(self, observed: float, received: float):
+        if self.offset is None:
+            self.offset = observed
+        else:
+            # 下包络：允许按漂移速度上升，遇到更小的样本立即下降
+            ceiling = self.offset + MAX_DRIFT * max(0.0, received - self.last_received)
+            if observed - ceiling > RESET_THRESHOLD:
+                self.suspect += 1
+                if self.suspect >= RESET_AFTER:
+                    self.offset = observed
+                    self.suspect = 0
+            else:
+                self.suspect = 0
+                self.offset = min(ceiling, observed)
+        self.last_received = received
+
+    def observe(self, sent: float, received: float, applied: float):
+        self._update_offset(received - sent, received)
+        transit = max(0.0, received - sent - self.offset)
+        queue = max(0.0, applied - received)
+        end_to_end = transit + queue
+        if self.samples:
+            self.transit += EWMA_ALPHA * (transit - self.transit)
+            self.queue += EWMA_ALPHA * (queue - self.queue)
+            self.end_to_end += EWMA_ALPHA * (end_to_end - self.end_to_end)
+        else:
+            self.transit, self.queue, self.end_to_end = transit, queue, end_to_end
+        self.max_end_to_end = max(self.max_end_to_end, end_to_end)
+        self.samples += 1
+        REPORT_TRANSIT.observe(transit)
+        REPORT_QUEUE.observe(queue)
+        REPORT_END_TO_END.observe(end_to_end)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "clock_offset": self.offset,
+            "transit": self.transit,
+            "queue": self.queue,
+            "end_to_end": self.end_to_end,
+            "max_end_to_end": self.max_end_to_end,
+            "samples": self.samples,
+        }
+
+
+class LatencyTracker:
+    """按设备 id 保存 DeviceLatency（仅由写入者修改）"""
+
+    def __init__(self):
+        self._devices: Dict[str, DeviceLatency] = {}
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def observe(self, device_id: str, sent: float, received: float, applied: float):
+        if sent <= 0:
+            return  # 客户端没有提供时间戳
+        entry = self._devices.get(device_id)
+        if entry is None:
+            entry = self._devices[device_id] = DeviceLatency()
+        entry.observe(sent, received, applied)
+
+    def get(self, device_id: str) -> Optional[DeviceLatency]:
+        return self._devices.get(device_id)
+
+    def discard(self, device_id: str):
+        self._devices.pop(device_id, None)
+
+    def clear(self):
+        self._devices.clear()
+
+    def per_device(self) -> Dict[str, Dict[str, float]]:
+        return {device_id: entry.as_dict() for device_id, entry in self._devices.items()}
+
+
+def aggregate() -> Dict[str, Dict[str, Optional[float]]]:
+    """进程内所有设备的延迟分布（按直方图分桶上界估算）"""
+    out = {}
+    for name, hist in (
+        ("transit", REPORT_TRANSIT),
+        ("queue", REPORT_QUEUE),
+        ("end_to_end", REPORT_END_TO_END),
+        ("apply_to_sse", APPLY_TO_SSE),
+    ):
+        summary: Dict[str, Optional[float]] = {"count": hist.count, "mean": hist.sum / hist.count if hist.count else None}
+        for q in (0.5, 0.9, 0.99):
+            value = hist.quantile(q)
+            summary[f"p{int(q * 100)}"] = value if value != float("inf") else None
+        out[name] = summary
+    return out
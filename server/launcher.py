@@ -0,0 +1,131 @@
+"""
+生产环境启动器
+
+python main.py 在 main.debug 为 false 时由这里启动 uvicorn（debug 为 true 时仍是带文件监视的 reload 模式）:
+- 事件循环 / HTTP 解析器: auto 时优先使用 uvloop / httptools（pip install uvloop httptools），
+  没有安装则回退到 asyncio / h11；显式指定但未安装时直接报错
+- 可监听 Unix 域套接字（main.uds），供同机的反向代理连接，省去 TCP 回环开销
+- keep-alive、backlog、并发 / 请求数上限、访问日志均由 MainConfig 配置
+
+注意: 设备与状态保存在进程内存中，多个 worker 之间不共享，main.workers 大于 1 时
+每个 worker 是一个独立的实例（通常只应在前面有按客户端固定分流的代理时使用）。
+配置了状态文件、多租户、主从复制或 Webhook 时，多个 worker 会写同一个文件 / 重复推送 / 各自同步，拒绝启动。
+"""
+
+import importlib.util
+import logging
+import os
+import socket
+import stat
+import sys
+from typing import Any, Dict, List
+
+import uvicorn
+
+from config.schema import AppConfig
+
+# 配置值 -> 需要安装的模块
+_LOOPS = {"uvloop": "uvloop", "asyncio": None}
+_HTTP = {"httptools": "httptools", "h11": "h11"}
+
+
+def _available(module) -> bool:
+    return module is None or importlib.util.find_spec(module) is not None
+
+
+def pick_loop(choice: str) -> str:
+    if choice == "auto":
+        # uvloop 不支持 Windows
+        return "uvloop" if sys.platform != "win32" and _available("uvloop") else "asyncio"
+    if not _available(_LOOPS[choice]):
+        raise RuntimeError(f"main.loop is {choice!r} but {_LOOPS[choice]} is not installed")
+    return choice
+
+
+def pick_http(choice: str) -> str:
+    if choice == "auto":
+        return "httptools" if _available("httptools") else "h11"
+    if not _available(_HTTP[choice]):
+        raise RuntimeError(f"main.http is {choice!r} but {_HTTP[choice]} is not installed")
+    return choice
+
+
+def clear_stale_socket(path: str):
+    """上次没有正常退出时留下的套接字文件会让 bind 失败；确认没有进程在监听后删除"""
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            raise RuntimeError(f"main.uds {path} exists and is not a socket")
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise RuntimeError(f"main.uds {path} is already in use")
+
+
+def uvicorn_options(config: AppConfig) -> Dict[str, Any]:
+    """由配置生成 uvicorn.run() 的参数（不含 app）"""
+    main = config.main
+    options: Dict[str, Any] = {
+        "loop": pick_loop(main.loop),
+        "http": pick_http(main.http),
+        "workers": main.workers,
+        "backlog": main.backlog,
+        "timeout_keep_alive": main.keepalive_timeout,
+        "timeout_graceful_shutdown": main.shutdown_timeout,
+        "limit_concurrency": main.limit_concurrency,
+        "limit_max_requests": main.limit_max_requests,
+        "access_log": main.access_log,
+        "proxy_headers": True,
+        "forwarded_allow_ips": main.forwarded_allow_ips,
+        # 只有 websocket 才需要，不加载
+        "ws": "none",
+        "lifespan": "on",
+    }
+    if main.uds:
+        options["uds"] = main.uds
+    else:
+        options["host"] = main.host
+        options["port"] = main.port
+    if main.https:
+        options["ssl_keyfile"] = main.ssl_key
+        options["ssl_certfile"] = main.ssl_cert
+    return options
+
+
+def single_worker_features(config: AppConfig) -> List[str]:
+    """-> 已配置的、只能在单个 worker 中运行的功能"""
+    features = []
+    if config.main.state_file:
+        features.append("main.state_file")
+    if config.tenants.enabled:
+        features.append("tenants")
+    if config.replication.role != "none":
+        features.append("replication")
+    if config.webhooks.targets:
+        features.append("webhooks")
+    return features
+
+
+def run(config: AppConfig, app: str = "main:app"):
+    options = uvicorn_options(config)
+    if options["workers"] > 1:
+        features = single_worker_features(config)
+        if features:
+            raise RuntimeError(
+                f"main.workers = {options['workers']} cannot be used with {', '.join(features)}: "
+                "every worker would run them independently; set main.workers to 1"
+            )
+    if "uds" in options:
+        clear_stale_socket(options["uds"])
+    if options["workers"] > 1:
+        logging.warning(
+            f"main.workers = {options['workers']}: each worker keeps its own devices and status in memory"
+        )
+    where = options.get("uds") or f"{options['host']}:{options['port']}"
+    print(f"Starting on {where}: loop={options['loop']} http={options['http']} workers={options['workers']}")
+    uvicorn.run(app, **options)
@@ -0,0 +1,162 @@
+"""
+优雅关闭与热启动
+
+关闭流程（收到 SIGTERM / SIGINT 时立即开始，早于 uvicorn 等待连接结束）:
+1. begin_drain(): DrainMiddleware 对之后到达的请求返回 503 + Retry-After；
+   SSE 流发完已排队的事件后发送 retry 提示并结束，长轮询立即返回 304，
+   这样 uvicorn 停止监听后不会被长连接一直拖住
+2. uvicorn 等待进行中的请求（包括上报）完成
+3. lifespan 关闭阶段，整体不超过 main.shutdown_timeout 秒:
+   卸载租户 -> 处理完写入队列 -> 停止 webhook 推送（未发出的事件进入重试队列）-> 把快照写入 main.state_file
+   超时仍会保存当时已发布的快照
+
+启动时（lifespan 进入阶段，开始接受请求之前）从 main.state_file 恢复状态。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from typing import Callable, List, Optional
+
+import backup
+
+DRAIN_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class Lifecycle:
+    def __init__(self):
+        self.draining = False
+        self.drain_started: Optional[float] = None
+        # 客户端稍后重连的建议间隔（秒），用于 Retry-After 和 SSE retry
+        self.retry_after = 3.0
+        self._on_drain: List[Callable[[], None]] = []
+
+    def on_drain(self, callback: Callable[[], None]):
+        """注册进入 draining 时调用的回调（在事件循环线程上同步调用）"""
+        self._on_drain.append(callback)
+
+    def begin_drain(self):
+        if self.draining:
+            return
+        self.draining = True
+        self.drain_started = time.monotonic()
+        logging.info("Draining: rejecting new requests, closing event streams")
+        for callback in self._on_drain:
+            try:
+                callback()
+            except Exception:
+                logging.exception("Drain callback failed")
+
+    def reset(self):
+        self.draining = False
+        self.drain_started = None
+
+    def install_signal_handlers(self):
+        """在 uvicorn 的信号处理之前插入 begin_drain（uvicorn 退出时会恢复原来的处理函数）"""
+        loop = asyncio.get_running_loop()
+        for sig in DRAIN_SIGNALS:
+            try:
+                previous = signal.getsignal(sig)
+            except ValueError:
+                return  # 不在主线程
+
+            if not callable(previous) or getattr(previous, "drains", False):
+                continue  # 没有人处理这个信号时保持原样；已经插入过的不重复插入
+
+            def handler(signum, frame, previous=previous):
+                loop.call_soon_threadsafe(self.begin_drain)
+                previous(signum, frame)
+
+            handler.drains = True
+            try:
+                signal.signal(sig, handler)
+            except ValueError:
+                return
+
+
+lifecycle = Lifecycle()
+
+
+class DrainMiddleware:
+    """关闭过程中拒绝新请求，让客户端 / 反向代理转去重试"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not lifecycle.draining:
+            return await self.app(scope, receive, send)
+        body = json.dumps({"detail": "Server is shutting down"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, round(lifecycle.retry_after))).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# ---- 状态文件 ----
+
+async def warm_start(data, config) -> bool:
+    """从 main.state_file 恢复状态；文件损坏时改名为 .bad 保留，以空状态启动（follower 从 leader 同步，不恢复）"""
+    path = config.main.state_file
+    if config.replication.role == "follower" or not path or not os.path.isfile(path):
+        return False
+    started = time.perf_counter()
+    try:
+        result = await backup.load(data, path, len(config.status.status_list))
+    except (OSError, backup.BackupFormatError) as e:
+        logging.error(f"Cannot restore state from {path}: {e}")
+        try:
+            os.replace(path, path + ".bad")
+        except OSError:
+            pass
+        await data.clear_devices()
+        return False
+    logging.info(f"Restored {result['devices']} devices from {path} in {time.perf_counter() - started:.2f}s")
+    return True
+
+
+async def graceful_shutdown(data, registry, config, webhooks=None):
+    """lifespan 关闭阶段: 在 shutdown_timeout 内停止租户和写入任务、webhook 推送，并保存状态"""
+    lifecycle.begin_drain()
+    path = config.main.state_file if config.replication.role != "follower" else None
+    saving: Optional[asyncio.Future] = None
+
+    async def finish():
+        nonlocal saving
+        if data.follower is not None:
+            await data.follower.stop()
+        await registry.stop()
+        await data.stop()
+        if webhooks is not None:
+            # 让最后一批发布产生的事件先进入 webhook 缓冲区
+            await asyncio.sleep(0)
+            await webhooks.stop()
+        if path:
+            # 超时只会取消这里的等待，线程中的保存仍在继续，见下方
+            saving = asyncio.ensure_future(asyncio.to_thread(backup.save, data.current, path, data.extra_records()))
+            await asyncio.shield(saving)
+
+    try:
+        await asyncio.wait_for(finish(), timeout=config.main.shutdown_timeout)
+    except asyncio.TimeoutError:
+        if saving is not None:
+            # 保存已经开始（状态很大时）: 等它写完，不再开第二个写入者
+            logging.error(f"Shutdown exceeded {config.main.shutdown_timeout}s while saving state; waiting for the save to finish")
+            await saving
+        else:
+            logging.error(f"Shutdown exceeded {config.main.shutdown_timeout}s; saving the last published snapshot")
+            if path:
+                backup.save(data.current, path, data.extra_records())
+    else:
+        if path:
+            logging.info(f"Saved {len(data.current.devices)} devices to {path}")
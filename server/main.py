@@ -1,5 +1,6 @@
 import sys
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import uvicorn
@@ -7,11 +8,18 @@ from contextlib import asynccontextmanager
 from config.loader import load_config
 from config import get_config
 from data import Data
+import metrics
+from lifecycle import DrainMiddleware, graceful_shutdown, lifecycle, warm_start
+from profiling import ProfilingMiddleware
+from replication import ReadOnlyReplica, start_replication
+from webhooks import start_webhooks
+from tenants import TenantMiddleware, TenantRegistry
 import logging
 
 # 日志初始化（略，同原逻辑）
 config = get_config()
 data_store = Data(config)
+tenant_registry = TenantRegistry(config)
 
 try:
     config = load_config()
@@ -26,14 +34,44 @@ except Exception as e:
 # 生命周期管理
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 启动
+    # 启动: 单写者任务，恢复上次保存的状态（在接受请求之前）
+    lifecycle.reset()
+    lifecycle.retry_after = config.main.drain_retry_after
+    await data_store.start()
+    await warm_start(data_store, config)
+    # 主从复制: leader 开始记录复制日志 / follower 开始同步（见 replication.py）
+    await start_replication(data_store, config)
+    # 状态变化推送到 webhooks.targets（见 webhooks.py）
+    webhooks = await start_webhooks(data_store, config)
+    await tenant_registry.start()
+    lifecycle.install_signal_handlers()
     yield
-    # 关闭
+    # 关闭: 拒绝新请求、结束 SSE 流、处理完写入队列并保存状态（见 lifecycle.py）
     logging.info("Shutting down...")
+    await graceful_shutdown(data_store, tenant_registry, config, webhooks)
 
 
 app = FastAPI(lifespan=lifespan)
 
+
+@app.exception_handler(ReadOnlyReplica)
+async def read_only_replica(request: Request, exc: ReadOnlyReplica):
+    # follower 上的写操作: 客户端应改为写入 leader
+    return JSONResponse(status_code=409, content={"detail": "This instance is a read-only replica; write to the leader"})
+
+
+# 多租户路由（最内层，租户请求同样计入按路由的指标）
+app.add_middleware(TenantMiddleware)
+
+# 关闭过程中对新请求返回 503（在加载租户之前）
+app.add_middleware(DrainMiddleware)
+
+# 运行时可开关的请求剖析（关闭时几乎无开销）
+app.add_middleware(ProfilingMiddleware)
+
+# 指标采集（最外层之一，覆盖整个请求处理过程）
+app.add_middleware(metrics.MetricsMiddleware)
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -50,20 +88,61 @@ app.add_middleware(
 # app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
-from routes.status import router as status_router
+from routes.status import router as status_router, subscriber_queues, close_event_streams
 from routes.device import router as device_router
+from routes.metrics import router as metrics_router
+from routes.debug import router as debug_router
+from routes.state import router as state_router
+from routes.replication import router as replication_router
+from routes.analytics import router as analytics_router
+from routes.search import router as search_router
+from routes.history import router as history_router
 
 app.include_router(status_router)
 app.include_router(device_router)
+app.include_router(metrics_router)
+app.include_router(debug_router)
+app.include_router(state_router)
+app.include_router(replication_router)
+app.include_router(analytics_router)
+app.include_router(search_router)
+app.include_router(history_router)
+
+# 进入关闭流程时: 结束 SSE 流，长轮询立即返回
+lifecycle.on_drain(close_event_streams)
+lifecycle.on_drain(lambda: data_store.release_waiters())
+lifecycle.on_drain(lambda: tenant_registry.release_waiters())
+
+
+def end_replication_streams():
+    # 结束 follower 的复制流（stream_log 在 draining 时返回）
+    if data_store.replication_log is not None:
+        data_store.replication_log.wake()
+
+
+lifecycle.on_drain(end_replication_streams)
+
+# 抓取时计算的指标
+metrics.STATUS_SWITCHES.set_function(lambda: data_store.metrics_resp["switch_count"])
+metrics.DEVICE_COUNT.set_function(lambda: len(data_store.devices))
+metrics.SUBSCRIBER_COUNT.set_function(lambda: len(data_store._listeners))
+metrics.SSE_QUEUE_DEPTH.set_function(lambda: sum(q.qsize() for q in subscriber_queues))
+metrics.SSE_QUEUE_MAX.set_function(lambda: max((q.qsize() for q in subscriber_queues), default=0))
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "main:app",
-        reload=True,
-        host=config.main.host,
-        port=config.main.port,
-        # reload=config.main.debug,
-        ssl_keyfile=config.main.ssl_key if config.main.https else None,
-        ssl_certfile=config.main.ssl_cert if config.main.https else None,
-    )
+    if config.main.debug:
+        # 开发: 文件变动时自动重载
+        uvicorn.run(
+            "main:app",
+            reload=True,
+            host=config.main.host,
+            port=config.main.port,
+            ssl_keyfile=config.main.ssl_key if config.main.https else None,
+            ssl_certfile=config.main.ssl_cert if config.main.https else None,
+            timeout_graceful_shutdown=config.main.shutdown_timeout,
+        )
+    else:
+        from launcher import run
+
+        run(config)
@@ -0,0 +1,285 @@
+"""
+运行指标（Prometheus 文本格式）
+
+不依赖任何第三方客户端库，热路径上只做整数自增和一次 bisect。
+需要在抓取时才计算的值（设备数、订阅者数、队列深度）使用回调型 Gauge，
+请求处理过程中没有任何开销。
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 延迟类指标的默认分桶（秒）
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for k, v in zip(names, values):
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{k}="{v}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """单调递增计数器"""
+
+    __slots__ = ("value",)
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f"{name}_total{labels} {_format_value(self.value)}"]
+
+
+class Gauge:
+    """可增可减的瞬时值；设置 func 后在抓取时计算"""
+
+    __slots__ = ("value", "func")
+    kind = "gauge"
+
+    def __init__(self, func: Optional[Callable[[], float]] = None):
+        self.value = 0
+        self.func = func
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set_function(self, func: Callable[[], float]):
+        self.func = func
+
+    def get(self) -> float:
+        if self.func is not None:
+            try:
+                return self.func()
+            except Exception:
+                return 0
+        return self.value
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f"{name}{labels} {_format_value(self.get())}"]
+
+
+class Histogram:
+    """固定分桶直方图；observe() 只做一次 bisect 和两次加法"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # 最后一格对应 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+    def quantile(self, q: float) -> float:
+        """按分桶上界估算分位数（用于 JSON 接口展示）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        inner = labels[1:-1] + "," if labels else ""
+        lines = []
+        acc = 0
+        for bound, c in zip(self.buckets + (float("inf"),), self.counts):
+            acc += c
+            lines.append(f'{name}_bucket{{{inner}le="{_format_value(bound)}"}} {acc}')
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist: Histogram):
+        self.hist = hist
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(time.perf_counter() - self.start)
+
+
+class Family:
+    """一组同名、按标签区分的指标"""
+
+    def __init__(self, name: str, help: str, factory: Callable, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.factory = factory
+        self.labelnames = tuple(labelnames)
+        self.kind = factory().kind
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = factory()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self.factory()
+        return child
+
+    def child(self):
+        """无标签指标的唯一实例"""
+        return self._children[()]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(child.samples(self.name, _format_labels(self.labelnames, values)))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._families: Dict[str, Family] = {}
+
+    def register(self, family: Family) -> Family:
+        self._families[family.name] = family
+        return family
+
+    def get(self, name: str) -> Optional[Family]:
+        return self._families.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in list(self._families.values()):
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()):
+    fam = REGISTRY.register(Family(name, help, Counter, labelnames))
+    return fam if labelnames else fam.child()
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()):
+    fam = REGISTRY.register(Family(name, help, Gauge, labelnames))
+    return fam if labelnames else fam.child()
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+    fam = REGISTRY.register(Family(name, help, lambda: Histogram(buckets), labelnames))
+    return fam if labelnames else fam.child()
+
+
+# ---- 预定义指标 ----
+
+REQUEST_LATENCY = histogram(
+    "sleepy_http_request_duration_seconds",
+    "HTTP request latency by route",
+    ("method", "route"),
+)
+REQUEST_ERRORS = counter(
+    "sleepy_http_request_errors",
+    "Requests that raised or returned a 5xx status",
+    ("route",),
+)
+REPORT_VALIDATION = histogram(
+    "sleepy_report_validation_seconds",
+    "Time spent building and validating a device entry on report",
+)
+BROADCAST_FANOUT = histogram(
+    "sleepy_broadcast_fanout_seconds",
+    "Time spent delivering one update to every subscriber",
+)
+SSE_DELIVERY = histogram(
+    "sleepy_sse_delivery_seconds",
+    "Delay between broadcast and the SSE frame being yielded",
+)
+STATUS_SWITCHES = gauge("sleepy_status_switches", "Number of status switches since start")
+DEVICE_COUNT = gauge("sleepy_devices", "Number of known devices")
+SUBSCRIBER_COUNT = gauge("sleepy_subscribers", "Number of registered update listeners")
+SSE_QUEUE_DEPTH = gauge("sleepy_sse_queue_depth", "Pending SSE frames summed over all subscribers")
+SSE_QUEUE_MAX = gauge("sleepy_sse_queue_depth_max", "Largest pending SSE queue of a single subscriber")
+
+
+class MetricsMiddleware:
+    """纯 ASGI 中间件：记录每个路由的请求耗时
+
+    路由标签取匹配到的路径模板（scope["route"].path），未匹配的请求归入 "<unmatched>"，
+    以免按原始 URL 产生无限多的标签组合。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # (method, id(route)) -> Histogram；路由对象不可哈希，且生命周期与应用相同
+        self._cache: Dict[Tuple[str, int], Histogram] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        failed = False
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            key = (scope["method"], id(route))
+            hist = self._cache.get(key)
+            if hist is None:
+                path = getattr(route, "path", None) or "<unmatched>"
+                hist = self._cache[key] = REQUEST_LATENCY.labels(scope["method"], path)
+            hist.observe(elapsed)
+            if failed or status >= 500:
+                REQUEST_ERRORS.labels(getattr(route, "path", None) or "<unmatched>").inc()
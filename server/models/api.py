@@ -16,6 +16,10 @@ class DeviceInfo(BaseModel):
     battery_percent: Optional[int] = None
     battery_status: Optional[str] = None
     active_app: Optional[Dict[str, Any]] = None
+    is_active: Optional[str] = None
+    using: Optional[bool] = None  # 由 is_active 推导，未知时为 None
+    custom: Optional[Dict[str, Any]] = None  # 上报的自定义字段
+    battery_estimate: Optional[Dict[str, Any]] = None  # 服务端估计的充放电速率与剩余时间（battery.py）
 
 class QueryResponse(BaseModel):
     success: bool
@@ -23,6 +27,8 @@ class QueryResponse(BaseModel):
     status: StatusInfo
     device: List[DeviceInfo]
     last_updated: float
+    version: Optional[int] = None  # 状态版本号，用于 ?since= 长轮询
+    next_cursor: Optional[int] = None  # 分页时下一页的游标，没有更多数据时为 None
     meta: Optional[Dict[str, Any]] = None
     metrics: Optional[Dict[str, Any]] = None
 
@@ -21,6 +21,16 @@ class IsActive(str, Enum):
     unknown = "Unknown"
 
 
+# is_active -> 是否正在使用（未知为 None）
+USING_STATES = {
+    IsActive.active: True,
+    IsActive.inactive: False,
+    IsActive.locked: False,
+    IsActive.shutdown: False,
+    IsActive.unknown: None,
+}
+
+
 class AppInfo(BaseModel):
     name: str
     title: Optional[str] = None  # 窗口标题（可选）
@@ -0,0 +1,123 @@
+"""
+隐私层
+
+- 全局隐私模式: 开启后匿名访问者看到的设备列表为空
+- 按设备的字段脱敏规则（config.privacy.redact），键为设备 id，"*" 对所有设备生效；
+  字段写 "active_app.title" 这样的路径只清空嵌套字段，写 "*" 则对匿名访问者隐藏整个设备
+
+脱敏结果由 Data 按状态版本缓存，每次状态变化最多计算一次。
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from models.api import DeviceInfo
+
+HIDE_DEVICE = "*"
+
+# DeviceInfo 中允许被置空的顶层字段
+REDACTABLE_FIELDS = frozenset({"battery_percent", "battery_status", "battery_estimate", "active_app", "custom"})
+
+
+class Redactor:
+    def __init__(self, rules: Optional[Dict[str, List[str]]] = None):
+        self._global = self._compile((rules or {}).get(HIDE_DEVICE, []))
+        self._per_device = {
+            device_id: self._merge(self._global, self._compile(fields))
+            for device_id, fields in (rules or {}).items()
+            if device_id != HIDE_DEVICE
+        }
+        # 整台设备对匿名访问者隐藏的 id（全局隐藏时不用）
+        self._hidden = frozenset(device_id for device_id, rule in self._per_device.items() if rule[0])
+
+    @staticmethod
+    def _compile(fields: List[str]) -> Tuple[bool, frozenset, Dict[str, frozenset]]:
+        """-> (隐藏设备, 顶层字段, {顶层字段: 嵌套字段})"""
+        hide = False
+        top = set()
+        nested: Dict[str, set] = {}
+        for field in fields:
+            if field == HIDE_DEVICE:
+                hide = True
+            elif "." in field:
+                parent, child = field.split(".", 1)
+                nested.setdefault(parent, set()).add(child)
+            else:
+                top.add(field)
+        if "battery_percent" in top:
+            top.add("battery_estimate")  # 由电量推算，一并隐藏
+        return hide, frozenset(top), {k: frozenset(v) for k, v in nested.items()}
+
+    @staticmethod
+    def _merge(a, b):
+        nested = dict(a[2])
+        for k, v in b[2].items():
+            nested[k] = nested.get(k, frozenset()) | v
+        return a[0] or b[0], a[1] | b[1], nested
+
+    def hides(self, device_id: str, field: str) -> bool:
+        """该设备的顶层字段对匿名访问者是否隐藏"""
+        hide, top, _ = self._per_device.get(device_id, self._global)
+        return hide or field in top
+
+    def hides_device(self, device_id: str) -> bool:
+        """整台设备是否对匿名访问者隐藏"""
+        return self._per_device.get(device_id, self._global)[0]
+
+    def redacts(self, device_id: str) -> bool:
+        """该设备是否有字段需要脱敏（整台隐藏不算，见 hides_device）"""
+        _, top, nested = self._per_device.get(device_id, self._global)
+        return bool(top or nested)
+
+    def public_ids(self, ids: List[str]) -> List[str]:
+        """去掉对匿名访问者隐藏的设备 id（用于 SSE / webhook 事件）"""
+        if self._global[0]:
+            return []
+        if not self._hidden:
+            return ids
+        return [device_id for device_id in ids if device_id not in self._hidden]
+
+    def public_count(self, devices) -> int:
+        """匿名访问者能看到的设备数（不考虑隐私模式）；devices 须支持 len() 与 in"""
+        if self._global[0]:
+            return 0
+        return len(devices) - sum(1 for device_id in self._hidden if device_id in devices)
+
+    def hides_field(self, path: str) -> bool:
+        """是否有规则对某些设备隐藏该字段（如 "custom.location"），用于禁止匿名按该字段过滤"""
+        parent, _, child = path.partition(".")
+        for hide, top, nested in (self._global, *self._per_device.values()):
+            if hide or parent in top or child in nested.get(parent, ()):
+                return True
+        return False
+
+    @property
+    def empty(self) -> bool:
+        return not self._per_device and self._global == (False, frozenset(), {})
+
+    def redact(self, device: DeviceInfo) -> Optional[DeviceInfo]:
+        """返回脱敏后的副本；无需处理时原样返回，设备应被隐藏时返回 None"""
+        hide, top, nested = self._per_device.get(device.id, self._global)
+        if hide:
+            return None
+        if not top and not nested:
+            return device
+        update = {field: None for field in top if field in REDACTABLE_FIELDS}
+        for parent, children in nested.items():
+            if parent in update:
+                continue
+            value = getattr(device, parent, None)
+            if isinstance(value, dict):
+                update[parent] = {k: (None if k in children else v) for k, v in value.items()}
+        return device.model_copy(update=update)
+
+    def public_view(self, devices: List[DeviceInfo], private: bool) -> List[DeviceInfo]:
+        if private:
+            return []
+        if self.empty:
+            return list(devices)
+        out = []
+        for dev in devices:
+            redacted = self.redact(dev)
+            if redacted is not None:
+                out.append(redacted)
+        return out
@@ -0,0 +1,231 @@
+"""
+请求级性能剖析（运行时开关）
+
+两种模式:
+- stack: 后台线程周期性采样所有线程的调用栈（sys._current_frames），
+  覆盖事件循环和线程池中运行的依赖项 / 路由，输出 collapsed-stack（可直接喂给 flamegraph.pl）
+- cprofile: 在事件循环线程上用 cProfile 做确定性剖析，输出 pstats 文本；
+  注意线程池中执行的同步函数不会被计入
+
+关闭时中间件只多一次属性判断。
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+# 只剖析这个前缀之外的请求，避免把剖析接口自身算进去
+PROFILE_PATH_PREFIX = "/api/debug/profile"
+
+# 叶子帧落在这些函数上的栈视为空闲线程，不计入样本
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+}
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    def __init__(self):
+        self.active = False
+        self.mode = "stack"
+        self.path_prefix = ""
+        self.remaining = 0
+        self.sampled = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self.interval = 0.001
+
+        self._lock = threading.Lock()
+        # 本次剖析开始后进入、尚未结束的请求数；session 区分各次剖析，
+        # 之前开始的请求（如还开着的 SSE 流）结束时不影响本次的计数
+        self._session = 0
+        self._inflight = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._stacks: Counter = Counter()
+        self._sample_count = 0
+        self._sampler: Optional[threading.Thread] = None
+
+    # ---- 控制 ----
+
+    def start(self, requests: int, mode: str = "stack", interval: float = 0.001, path_prefix: str = ""):
+        if mode not in ("stack", "cprofile"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.stop()
+        with self._lock:
+            self.mode = mode
+            self.path_prefix = path_prefix
+            self.remaining = max(1, requests)
+            self.sampled = 0
+            self.interval = max(0.0002, interval)
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._session += 1
+            self._inflight = 0
+            self._stacks = Counter()
+            self._sample_count = 0
+            self._profile = cProfile.Profile() if mode == "cprofile" else None
+            self.active = True
+        if mode == "stack":
+            self._sampler = threading.Thread(target=self._sample_loop, name="sleepy-profiler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        with self._lock:
+            if not self.active:
+                return
+            self.active = False
+            self.stopped_at = time.time()
+            if self._profile is not None and self._inflight:
+                self._profile.disable()
+        sampler, self._sampler = self._sampler, None
+        if sampler is not None and sampler is not threading.current_thread():
+            sampler.join(timeout=1)
+
+    # ---- 请求钩子 ----
+
+    def wants(self, scope) -> bool:
+        path = scope.get("path", "")
+        return not path.startswith(PROFILE_PATH_PREFIX) and path.startswith(self.path_prefix)
+
+    def enter(self) -> int:
+        """-> 本次剖析的 session，请求结束时传给 exit()"""
+        with self._lock:
+            self._inflight += 1
+            if self._inflight == 1 and self._profile is not None:
+                self._profile.enable()
+            return self._session
+
+    def exit(self, session: int):
+        with self._lock:
+            if session != self._session:
+                return  # 属于之前的剖析
+            self._inflight -= 1
+            if self._inflight == 0 and self._profile is not None and self.active:
+                self._profile.disable()
+            self.sampled += 1
+            self.remaining -= 1
+            done = self.remaining <= 0
+        if done:
+            self.stop()
+
+    def _sample_loop(self):
+        me = threading.get_ident()
+        names = {}
+        session = self._session
+        while self.active and self._session == session:
+            time.sleep(self.interval)
+            if not self._inflight:
+                continue
+            # 先在本地汇总这一轮，再在锁内并入；读取结果的线程在锁内复制（见 _stack_counts）
+            tick: Counter = Counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                parts = []
+                while frame is not None:
+                    parts.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                parts.append(names.get(ident, str(ident)))
+                parts.reverse()
+                tick[";".join(parts)] += 1
+            with self._lock:
+                if self._session != session:
+                    break  # 已经开始了新的剖析
+                self._stacks.update(tick)
+                self._sample_count += 1
+
+    # ---- 结果 ----
+
+    def summary(self) -> Dict:
+        return {
+            "active": self.active,
+            "mode": self.mode,
+            "path_prefix": self.path_prefix,
+            "sampled_requests": self.sampled,
+            "remaining_requests": max(0, self.remaining) if self.active else 0,
+            "stack_samples": self._sample_count,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+        }
+
+    def _stack_counts(self) -> Counter:
+        """采样线程仍在写入时，结果接口（线程池中运行）只读锁内复制的副本"""
+        with self._lock:
+            return Counter(self._stacks)
+
+    def collapsed(self) -> str:
+        if self.mode != "stack":
+            raise ValueError("collapsed output is only available in stack mode")
+        return "".join(f"{stack} {count}\n" for stack, count in self._stack_counts().most_common())
+
+    def pstats_text(self, sort: str = "cumulative", limit: int = 50) -> str:
+        if self.mode == "cprofile":
+            if self._profile is None:
+                return ""
+            if self.active:
+                raise ValueError("profiling is still running, stop it first")
+            out = io.StringIO()
+            try:
+                stats = pstats.Stats(self._profile, stream=out)
+            except TypeError:
+                return ""  # 还没有任何样本
+            stats.sort_stats(sort).print_stats(limit)
+            return out.getvalue()
+
+        # stack 模式: 按函数汇总自身 / 累计样本数
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        stacks = self._stack_counts()
+        for stack, count in stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for fn in set(frames):
+                total_counts[fn] += count
+        key = self_counts if sort in ("tottime", "self") else total_counts
+        total = sum(stacks.values()) or 1
+        lines = [f"{'self':>8} {'total':>8} {'total%':>7}  function"]
+        for fn, _ in key.most_common(limit):
+            lines.append(
+                f"{self_counts[fn]:>8} {total_counts[fn]:>8} {total_counts[fn] * 100 / total:>6.1f}%  {fn}"
+            )
+        return "\n".join(lines) + "\n"
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """纯 ASGI 中间件：剖析开启时把请求交给 profiler 计数 / 计时"""
+
+    def __init__(self, app, profiler: Profiler = profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        prof = self.profiler
+        if not prof.active or scope["type"] != "http" or not prof.wants(scope):
+            return await self.app(scope, receive, send)
+        session = prof.enter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            prof.exit(session)
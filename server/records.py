@@ -0,0 +1,169 @@
+"""
+设备的内部紧凑记录
+
+DeviceInfo 是 API 模型，每条带 pydantic 的 __dict__ / 字段集合，active_app 还是一个独立的 dict，
+十万级设备时开销明显。存储里改用 __slots__ 记录:
+- battery_status / is_active 存为小整数编码
+- 设备名、应用名、窗口标题用 sys.intern 驻留，大量设备运行同一个应用时只保留一份字符串
+- 自定义字段存为排好序的 (键, 值) 元组（见 custom.py）
+只在序列化边界（写入时预编码、对外返回设备列表）才通过 to_api() 转成 DeviceInfo。
+"""
+
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+from custom import CustomFields
+from models.api import DeviceInfo
+from models.device_status import BatteryStatus, DeviceStatus, IsActive, USING_STATES
+
+# 编码 -> 取值（与 API 中的字符串一致）；编码 0 固定表示 None
+BATTERY_STATES: Tuple[Optional[str], ...] = (None, *(state.value for state in BatteryStatus))
+ACTIVE_STATES: Tuple[Optional[str], ...] = (None, *(state.value for state in IsActive))
+
+_BATTERY_CODES = {state: code for code, state in enumerate(BATTERY_STATES)}
+_ACTIVE_CODES = {state: code for code, state in enumerate(ACTIVE_STATES)}
+_USING_BY_CODE = tuple(USING_STATES.get(state) for state in ACTIVE_STATES)
+_INACTIVE_CODE = _ACTIVE_CODES[IsActive.inactive]
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return None if value is None else sys.intern(value)
+
+
+class DeviceRecord:
+    __slots__ = (
+        "id",
+        "name",
+        "last_seen",
+        "battery_percent",
+        "battery_code",
+        "active_code",
+        "app_name",
+        "app_title",
+        "app_pid",
+        "custom",
+        "battery_estimate",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        last_seen: float,
+        battery_percent: Optional[int] = None,
+        battery_code: int = 0,
+        active_code: int = 0,
+        app_name: Optional[str] = None,
+        app_title: Optional[str] = None,
+        app_pid: Optional[int] = None,
+        custom: Optional[CustomFields] = None,
+    ):
+        self.id = id
+        self.name = name
+        self.last_seen = last_seen
+        self.battery_percent = battery_percent
+        self.battery_code = battery_code
+        self.active_code = active_code
+        self.app_name = app_name
+        self.app_title = app_title
+        self.app_pid = app_pid
+        self.custom = custom
+        # 写入者在上报时由 BatteryTracker 填入；不随备份导出
+        self.battery_estimate: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_report(cls, report: DeviceStatus, now: float, custom: Optional[CustomFields] = None) -> "DeviceRecord":
+        """custom 为已经过 custom.normalize() 校验的自定义字段"""
+        app = report.active_app
+        return cls(
+            id=report.device_id,
+            name=sys.intern(report.device_name),
+            last_seen=now,
+            battery_percent=report.battery_percent,
+            battery_code=_BATTERY_CODES[report.battery_status],
+            active_code=_ACTIVE_CODES[report.is_active],
+            app_name=_intern(app.name) if app else None,
+            app_title=_intern(app.title) if app else None,
+            app_pid=app.pid if app else None,
+            custom=custom,
+        )
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any], custom: Optional[CustomFields] = None) -> "DeviceRecord":
+        """从 as_dict() 的结果重建（导入备份时使用）；取值不合法时抛出 ValueError"""
+        app = d.get("active_app")
+        try:
+            battery_code = _BATTERY_CODES[d.get("battery_status")]
+            active_code = _ACTIVE_CODES[d.get("is_active")]
+        except (KeyError, TypeError):
+            raise ValueError("invalid battery_status / is_active")
+        if not isinstance(d.get("id"), str) or not isinstance(d.get("name"), str):
+            raise ValueError("id and name must be strings")
+        percent = d.get("battery_percent")
+        if percent is not None and (not isinstance(percent, int) or isinstance(percent, bool)):
+            raise ValueError("battery_percent must be an integer")
+        if app is not None and not (isinstance(app, dict) and isinstance(app.get("name"), str)):
+            raise ValueError("invalid active_app")
+        return cls(
+            id=d["id"],
+            name=sys.intern(d["name"]),
+            last_seen=float(d.get("last_seen") or 0.0),
+            battery_percent=percent,
+            battery_code=battery_code,
+            active_code=active_code,
+            app_name=_intern(app["name"]) if app else None,
+            app_title=_intern(app.get("title")) if app else None,
+            app_pid=app.get("pid") if app else None,
+            custom=custom,
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """与内部编码无关的纯数据形式（状态取 API 中的字符串）"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "last_seen": self.last_seen,
+            "battery_percent": self.battery_percent,
+            "battery_status": self.battery_status,
+            "is_active": self.is_active,
+            "active_app": self.active_app,
+            "custom": dict(self.custom) if self.custom else None,
+        }
+
+    @property
+    def battery_status(self) -> Optional[str]:
+        return BATTERY_STATES[self.battery_code]
+
+    @property
+    def is_active(self) -> Optional[str]:
+        return ACTIVE_STATES[self.active_code]
+
+    @property
+    def using(self) -> Optional[bool]:
+        return _USING_BY_CODE[self.active_code]
+
+    def mark_not_using(self):
+        """服务端分类规则判定为未在使用（classifier.py）；已经是未在使用的状态（如 Locked）保持不变"""
+        if self.using is not False:
+            self.active_code = _INACTIVE_CODE
+
+    @property
+    def active_app(self) -> Optional[Dict[str, Any]]:
+        if self.app_name is None:
+            return None
+        return {"name": self.app_name, "title": self.app_title, "pid": self.app_pid}
+
+    def to_api(self) -> DeviceInfo:
+        # 记录本身来自已校验的上报，这里跳过重复校验
+        return DeviceInfo.model_construct(
+            id=self.id,
+            name=self.name,
+            last_seen=self.last_seen,
+            battery_percent=self.battery_percent,
+            battery_status=self.battery_status,
+            active_app=self.active_app,
+            is_active=self.is_active,
+            using=self.using,
+            custom=dict(self.custom) if self.custom else None,
+            battery_estimate=self.battery_estimate,
+        )
@@ -0,0 +1,333 @@
+"""
+主从复制: leader 把每次发布的变更写入内存中的复制日志，follower 订阅后应用到自己的 Data，只读地提供查询 / SSE
+
+日志条目（NDJSON，每行一个）:
+    {"type": "log", "version": V, "time": t, "clear": false,
+     "upsert": [DeviceRecord.as_dict(), ...], "remove": ["id", ...],
+     "status": {"status_id": ..., "last_updated": ..., "private": ..., "switch_count": ...},
+     "events": [["status_updated", {}], ...]}
+- 一个条目对应 leader 的一次发布（一批变更），只带改动过的设备的最新内容
+- follower 的版本号与 leader 一致，客户端的 ?since= 在 leader / 各 follower 之间通用
+
+GET /api/replication/stream?from=<follower 已应用的版本>&epoch=<上次连接时 leader 的 epoch>:
+- 第一行 {"type": "hello", "epoch": ...}；epoch 每次 leader 启动时重新生成，
+  leader 重启过（版本号可能与 follower 手里的对不上）时不续传
+- from 之后的条目都还在日志里: 直接从日志续传
+- 否则（新 follower / 落后太多 / leader 重启过）先发送当前快照: 若干条不带 version 的条目
+  （第一条 clear），最后一条带 version 与 status；follower 收到带 version 的条目才发布，
+  读者不会看到同步了一半的设备列表
+- 空闲时每隔 heartbeat 秒发送 {"type": "heartbeat", "version": ..., "time": ...}，用于计算复制延迟
+- follower 读取太慢、需要的条目已被淘汰时发送 {"type": "resync"} 并断开，follower 重新全量同步
+
+follower 通过 http://host:port 或 unix:/path/to/sleepy.sock 连接 leader，断线后自动重连续传。
+只复制主实例，不复制租户。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from backup import EXPORT_CHUNK
+from encoding import dumps
+from httpclient import open_connection, read_chunks, read_head
+from lifecycle import lifecycle
+from metrics import counter, gauge
+from state import Snapshot
+
+REPLICATION_FOLLOWERS = gauge("sleepy_replication_followers", "Follower streams connected to this leader")
+REPLICATION_SNAPSHOTS = counter("sleepy_replication_snapshots", "Full snapshots sent to followers")
+REPLICATION_LOG_ENTRIES = gauge("sleepy_replication_log_entries", "Entries kept in the replication log")
+REPLICATION_CONNECTED = gauge("sleepy_replication_connected", "1 while this follower is streaming from the leader")
+REPLICATION_LAG_SECONDS = gauge(
+    "sleepy_replication_lag_seconds",
+    "Leader publish to follower apply time of the latest entry (0 when caught up)",
+)
+REPLICATION_LAG_VERSIONS = gauge("sleepy_replication_lag_versions", "Leader versions not yet applied by this follower")
+REPLICATION_RECONNECTS = counter("sleepy_replication_reconnects", "Follower reconnects to the leader")
+
+
+class ReadOnlyReplica(Exception):
+    """follower 上的写操作"""
+
+
+class ReplicationLog:
+    """leader 端最近的日志条目（版本号递增），超出条数或字节上限时淘汰最旧的"""
+
+    def __init__(self, version: int, max_entries: int, max_bytes: int):
+        self.epoch = os.urandom(8).hex()
+        self._entries: Deque[Tuple[int, bytes]] = deque()
+        self._bytes = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # 版本号不大于这个值的条目已不在日志中
+        self.evicted_upto = version
+        self._waiter: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def append(self, version: int, line: bytes):
+        self._entries.append((version, line))
+        self._bytes += len(line)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            old_version, old = self._entries.popleft()
+            self._bytes -= len(old)
+            self.evicted_upto = old_version
+        REPLICATION_LOG_ENTRIES.set(len(self._entries))
+        self.wake()
+
+    def wake(self):
+        """唤醒所有等待中的流（新条目 / 开始关闭）"""
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None and not waiter.done():
+            waiter.set_result(None)
+
+    def covers(self, version: int) -> bool:
+        """version 之后的条目是否都还在日志中"""
+        return version >= self.evicted_upto
+
+    def read_after(self, version: int) -> Tuple[int, List[bytes]]:
+        """-> (最后一条的版本号, version 之后的全部条目)；follower 通常只落后几条，从尾部往前找"""
+        out = []
+        last = version
+        for v, line in reversed(self._entries):
+            if v <= version:
+                break
+            last = max(last, v)
+            out.append(line)
+        out.reverse()
+        return last, out
+
+    async def wait(self, timeout: float):
+        """等待下一次 append()，超时直接返回"""
+        if self._waiter is None or self._waiter.done():
+            self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._waiter), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def _status(snap: Snapshot) -> Dict[str, Any]:
+    return {
+        "status_id": snap.status_id,
+        "last_updated": snap.last_updated,
+        "private": snap.private,
+        "switch_count": snap.switch_count,
+    }
+
+
+def make_entry(snap: Snapshot, cleared: bool, ids: List[str], events: List[tuple], applied_at: float) -> bytes:
+    """由一次发布生成日志条目；ids 为改动过的设备，当前快照中没有的视为已删除"""
+    devices = snap.devices
+    upsert, remove = [], []
+    for device_id in ids:
+        record = devices.get(device_id)
+        if record is None:
+            remove.append(device_id)
+        else:
+            upsert.append(record.as_dict())
+    return dumps({
+        "type": "log",
+        "version": snap.version,
+        "time": applied_at,
+        "clear": cleared,
+        "upsert": upsert,
+        "remove": remove,
+        "status": _status(snap),
+        "events": [[event, extra] for event, extra in events],
+    }) + b"\n"
+
+
+def snapshot_entries(snap: Snapshot) -> Iterator[bytes]:
+    """把快照拆成若干日志条目: 第一条清空，最后一条带版本号与状态"""
+    records = iter(snap.devices)
+    remaining = len(snap.devices)
+    first = True
+    while True:
+        chunk = [record.as_dict() for record in islice(records, EXPORT_CHUNK)]
+        remaining -= len(chunk)
+        entry = {"type": "log", "clear": first, "upsert": chunk}
+        first = False
+        if remaining <= 0:
+            entry.update(version=snap.version, time=time.time(), status=_status(snap), events=[["snapshot", {}]])
+            yield dumps(entry) + b"\n"
+            return
+        yield dumps(entry) + b"\n"
+
+
+async def stream_log(data, log: ReplicationLog, start: int, epoch: str, heartbeat: float) -> AsyncIterator[bytes]:
+    """leader 端: 给一个 follower 的条目流"""
+    REPLICATION_FOLLOWERS.inc()
+    try:
+        yield dumps({"type": "hello", "epoch": log.epoch}) + b"\n"
+        snap = data.current
+        if epoch != log.epoch or start < 0 or start > snap.version or not log.covers(start):
+            REPLICATION_SNAPSHOTS.inc()
+            for chunk in snapshot_entries(snap):
+                yield chunk
+            start = snap.version
+        idle = False
+        while not lifecycle.draining:
+            if not log.covers(start):
+                yield dumps({"type": "resync"}) + b"\n"
+                return
+            start, lines = log.read_after(start)
+            if lines:
+                idle = False
+                yield b"".join(lines)
+                continue
+            if idle:
+                yield dumps({"type": "heartbeat", "version": start, "time": time.time()}) + b"\n"
+            await log.wait(heartbeat)
+            idle = True
+    finally:
+        REPLICATION_FOLLOWERS.dec()
+
+
+# ---- follower ----
+
+
+class Follower:
+    def __init__(self, data, settings, secret: str):
+        self.data = data
+        self.settings = settings
+        self._secret = secret
+        self._task: Optional[asyncio.Task] = None
+        # 已有完整快照后才能按版本续传（且 leader 没有重启过）
+        self._synced = False
+        self._epoch = ""
+        self.connected = False
+        self.leader_version: Optional[int] = None
+        self._lag = 0.0
+        # 最后一次收到 leader 数据的时间
+        self._contact = time.time()
+
+    async def start(self):
+        if self._task is None:
+            REPLICATION_CONNECTED.set(0)
+            REPLICATION_LAG_SECONDS.set_function(self.lag_seconds)
+            REPLICATION_LAG_VERSIONS.set_function(self.lag_versions)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def lag_seconds(self) -> float:
+        """连接中: 最近一个条目从 leader 发布到本地应用的时间；断开时: 距离上次收到 leader 数据的时间"""
+        if not self.connected:
+            return max(self._lag, time.time() - self._contact)
+        return self._lag
+
+    def lag_versions(self) -> int:
+        if self.leader_version is None:
+            return 0
+        return max(0, self.leader_version - self.data.version)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "role": "follower",
+            "leader": self.settings.leader,
+            "connected": self.connected,
+            "synced": self._synced,
+            "version": self.data.version,
+            "leader_version": self.leader_version,
+            "lag_versions": self.lag_versions(),
+            "lag_seconds": self.lag_seconds(),
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self._follow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Replication from {self.settings.leader} interrupted: {e}")
+            finally:
+                self.connected = False
+                REPLICATION_CONNECTED.set(0)
+            REPLICATION_RECONNECTS.inc()
+            await asyncio.sleep(self.settings.retry)
+
+    async def _follow(self):
+        leader = self.settings.leader
+        reader, writer, host = await open_connection(leader)
+        prefix = "" if leader.startswith("unix:") else urlsplit(leader).path.rstrip("/")
+        try:
+            start = self.data.version if self._synced else -1
+            writer.write((
+                f"GET {prefix}/api/replication/stream?from={start}&epoch={self._epoch} HTTP/1.1\r\n"
+                f"Host: {host}\r\nX-Secret: {self._secret}\r\nAccept: application/x-ndjson\r\n\r\n"
+            ).encode("latin-1"))
+            await writer.drain()
+            status, headers = await read_head(reader)
+            if status != 200:
+                raise ConnectionError(f"leader answered HTTP {status}")
+            self.connected = True
+            REPLICATION_CONNECTED.set(1)
+
+            buf = b""
+            async for chunk in read_chunks(reader):
+                buf += chunk
+                *lines, buf = buf.split(b"\n")
+                for line in lines:
+                    if line and not await self._handle(json.loads(line)):
+                        self._synced = False
+                        return
+        finally:
+            writer.close()
+
+    async def _handle(self, item: Dict[str, Any]) -> bool:
+        """应用一个条目；返回 False 表示需要重新全量同步"""
+        self._contact = time.time()
+        kind = item.get("type")
+        if kind == "log":
+            records = []
+            for raw in item.get("upsert", ()):
+                try:
+                    records.append(self.data.parse_record(raw))
+                except ValueError as e:
+                    logging.error(f"Skipping replicated device {raw.get('id')!r}: {e}")
+            await self.data.replicate(item, records)
+            if "version" in item:
+                self._synced = True
+                self.leader_version = item["version"]
+                self._lag = max(0.0, time.time() - item["time"])
+        elif kind == "hello":
+            if item["epoch"] != self._epoch:
+                self._synced = False
+                self._epoch = item["epoch"]
+                self.leader_version = None
+        elif kind == "heartbeat":
+            self.leader_version = item["version"]
+            if self.data.version >= item["version"]:
+                self._lag = 0.0
+        elif kind == "resync":
+            return False
+        return True
+
+
+async def start_replication(data, config) -> None:
+    """lifespan 启动阶段（恢复状态之后）按 replication.role 开启复制日志或启动 follower"""
+    settings = config.replication
+    if settings.role == "leader":
+        data.enable_replication_log(settings.log_entries, settings.log_bytes)
+    elif settings.role == "follower":
+        if not settings.leader:
+            raise RuntimeError("replication.role is follower but replication.leader is not set")
+        data.read_only = True
+        data.follower = Follower(data, settings, config.main.secret)
+        await data.follower.start()
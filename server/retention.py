@@ -0,0 +1,364 @@
+"""
+历史数据的保留与降采样
+
+原始历史（history.py 的转换 + 采样）保留 history.retention_days 天，之后按时间顺序分批转成
+每台设备每分钟一行的汇总；分钟汇总保留 minute_days 天后按整点合并成小时汇总；
+小时汇总保留 hour_days 天后删除。每行:
+    (时间, 主要应用, using 比例, 最低电量, 最高电量, 有数据的秒数)
+- 主要应用: 这段时间里停留最久的应用
+- using 比例: 有数据的时间里处于使用中的比例
+- 两条原始记录间隔超过 max_gap 秒视为设备离线，中间不计入
+
+每一步只处理 retention_chunk 条（Data.maintain_history 经写入者逐步提交，步与步之间让出事件循环），
+不会长时间阻塞上报。分钟 / 小时按 UTC 对齐。
+
+导出 / 状态文件中每行一条（见 backup.py）:
+    {"type": "rollup", "resolution": "minute", "device": ..., "time": ..., "app": ...,
+     "using": 0.75, "battery_min": 40, "battery_max": 41, "seconds": 60.0}
+"""
+
+import bisect
+import math
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MINUTE = 60
+HOUR = 3600
+
+# 电量缺失时在数组中的占位
+NO_BATTERY = -1
+
+RESOLUTIONS = {"minute": MINUTE, "hour": HOUR}
+
+
+class Series:
+    """一台设备某个粒度的汇总，按时间追加的列"""
+
+    __slots__ = ("times", "apps", "using", "battery_min", "battery_max", "seconds")
+
+    def __init__(self):
+        self.times = array("d")
+        self.apps: List[Optional[str]] = []
+        self.using = array("f")
+        self.battery_min = array("h")
+        self.battery_max = array("h")
+        self.seconds = array("f")
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def append(self, ts: float, app: Optional[str], using: float, bmin: int, bmax: int, seconds: float):
+        if self.times and ts < self.times[-1]:
+            # 导入的旧数据: 插入到正确的位置（少见）
+            pos = bisect.bisect_right(self.times, ts)
+            self.times.insert(pos, ts)
+            self.apps.insert(pos, app)
+            self.using.insert(pos, using)
+            self.battery_min.insert(pos, bmin)
+            self.battery_max.insert(pos, bmax)
+            self.seconds.insert(pos, seconds)
+            return
+        self.times.append(ts)
+        self.apps.append(app)
+        self.using.append(using)
+        self.battery_min.append(bmin)
+        self.battery_max.append(bmax)
+        self.seconds.append(seconds)
+
+    def count_before(self, ts: float) -> int:
+        return bisect.bisect_left(self.times, ts)
+
+    def drop(self, count: int):
+        """删除最旧的 count 行"""
+        del self.times[:count]
+        del self.apps[:count]
+        del self.using[:count]
+        del self.battery_min[:count]
+        del self.battery_max[:count]
+        del self.seconds[:count]
+
+    def row(self, i: int) -> Dict[str, Any]:
+        bmin, bmax = self.battery_min[i], self.battery_max[i]
+        return {
+            "time": self.times[i],
+            "app": self.apps[i],
+            "using": round(self.using[i], 4),
+            "battery_min": None if bmin == NO_BATTERY else bmin,
+            "battery_max": None if bmax == NO_BATTERY else bmax,
+            "seconds": round(self.seconds[i], 3),
+        }
+
+    def rows(self, start: float, end: float, limit: int) -> List[Dict[str, Any]]:
+        lo = bisect.bisect_left(self.times, start)
+        hi = min(bisect.bisect_right(self.times, end), lo + limit)
+        return [self.row(i) for i in range(lo, hi)]
+
+
+class _Bucket:
+    """正在累计的一分钟"""
+
+    __slots__ = ("start", "apps", "using", "covered", "bmin", "bmax")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.apps: Dict[Optional[str], float] = {}
+        self.using = 0.0
+        self.covered = 0.0
+        self.bmin = NO_BATTERY
+        self.bmax = NO_BATTERY
+
+    def battery(self, value: Optional[int]):
+        if value is None:
+            return
+        if self.bmin == NO_BATTERY or value < self.bmin:
+            self.bmin = value
+        if value > self.bmax:
+            self.bmax = value
+
+
+def _dominant(apps: Dict[Optional[str], float]) -> Optional[str]:
+    if len(apps) == 1:
+        return next(iter(apps))
+    named = {app: seconds for app, seconds in apps.items() if app is not None}
+    return max(named, key=named.get) if named else None
+
+
+class Rollups:
+    """分钟 / 小时汇总；只由写入者修改"""
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.minute: Dict[str, Series] = {}
+        self.hour: Dict[str, Series] = {}
+        # 降采样进度: 设备 -> 上一条原始记录 (时间, 应用名, using, 电量) / 正在累计的分钟
+        self._carry: Dict[str, tuple] = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        # 分钟 -> 小时、过期删除时按设备轮转，每步从上次停下的设备继续
+        self._devices: List[str] = []
+        self._cursor = 0
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.minute.values()) + sum(len(s) for s in self.hour.values())
+
+    # ---- 原始记录 -> 分钟 ----
+
+    def feed(self, ts: float, device: str, app: Optional[str], using: Optional[bool], battery: Optional[int]):
+        """按时间顺序喂入一条原始记录；上一条记录到这一条之间的时间计入上一条的状态"""
+        prev = self._carry.get(device)
+        if prev is not None and 0 <= ts - prev[0] <= self.settings.max_gap:
+            self._span(device, prev[0], ts, prev[1], prev[2], prev[3])
+        elif prev is not None:
+            self._close(device)
+        self._carry[device] = (ts, app, using, battery)
+        bucket = self._bucket(device, ts)
+        bucket.battery(battery)
+
+    def _bucket(self, device: str, ts: float) -> _Bucket:
+        start = ts - ts % MINUTE
+        bucket = self._buckets.get(device)
+        if bucket is not None and bucket.start != start:
+            self._finish(device, bucket)
+            bucket = None
+        if bucket is None:
+            bucket = self._buckets[device] = _Bucket(start)
+        return bucket
+
+    def _span(self, device: str, start: float, end: float, app, using, battery):
+        while start < end:
+            bucket = self._bucket(device, start)
+            stop = min(end, bucket.start + MINUTE)
+            seconds = stop - start
+            bucket.apps[app] = bucket.apps.get(app, 0.0) + seconds
+            bucket.covered += seconds
+            if using:
+                bucket.using += seconds
+            bucket.battery(battery)
+            start = stop
+
+    def _finish(self, device: str, bucket: _Bucket):
+        del self._buckets[device]
+        if bucket.covered <= 0 and bucket.bmin == NO_BATTERY:
+            return
+        using = bucket.using / bucket.covered if bucket.covered > 0 else 0.0
+        series = self.minute.get(device)
+        if series is None:
+            series = self.minute[device] = Series()
+        series.append(bucket.start, _dominant(bucket.apps), using, bucket.bmin, bucket.bmax, bucket.covered)
+
+    def _close(self, device: str):
+        self._carry.pop(device, None)
+        bucket = self._buckets.get(device)
+        if bucket is not None:
+            self._finish(device, bucket)
+
+    def settle(self, frontier: float):
+        """已处理到 frontier: 之后不会再有记录延续的设备（离线超过 max_gap）结束其区间"""
+        for device in [d for d, prev in self._carry.items() if frontier - prev[0] > self.settings.max_gap]:
+            self._close(device)
+
+    # ---- 分钟 -> 小时 / 过期 ----
+
+    def compact(self, now: float, budget: int) -> bool:
+        """把早于 minute_days 的分钟汇总合并到小时，并删除早于 hour_days 的小时汇总
+
+        每步最多处理约 budget 行（每访问一台设备也计 1），从上次停下的设备继续；-> 是否还有剩余
+        """
+        minute_cutoff = now - self.settings.minute_days * 86400
+        minute_cutoff -= minute_cutoff % HOUR  # 只合并完整的小时
+        hour_cutoff = now - self.settings.hour_days * 86400
+        if self._cursor >= len(self._devices):
+            self._devices = sorted(set(self.minute) | set(self.hour))
+            self._cursor = 0
+        done = 0
+        while self._cursor < len(self._devices) and done < budget:
+            device = self._devices[self._cursor]
+            minutes = self.minute.get(device)
+            if minutes is not None:
+                count = minutes.count_before(minute_cutoff)
+                if count > budget - done:
+                    # 超出本步预算: 截到预算内最后一个整点，同一小时不拆到两步里（一小时最多 60 行）
+                    boundary = minutes.times[budget - done]
+                    boundary -= boundary % HOUR
+                    count = minutes.count_before(boundary) or minutes.count_before(boundary + HOUR)
+                if count:
+                    self._to_hours(device, minutes, count)
+                    done += count
+                if not len(minutes):
+                    del self.minute[device]
+                elif minutes.count_before(minute_cutoff):
+                    continue  # 本设备还没处理完，预算用完时下一步从这里继续
+            hours = self.hour.get(device)
+            if hours is not None:
+                count = hours.count_before(hour_cutoff)
+                if count:
+                    hours.drop(count)
+                    done += count
+                if not len(hours):
+                    del self.hour[device]
+            self._cursor += 1
+            done += 1
+        return self._cursor < len(self._devices)
+
+    def _to_hours(self, device: str, minutes: Series, count: int):
+        hours = self.hour.get(device)
+        if hours is None:
+            hours = self.hour[device] = Series()
+        group_start = None
+        apps: Dict[Optional[str], float] = {}
+        using = covered = 0.0
+        bmin = bmax = NO_BATTERY
+
+        def flush():
+            if group_start is not None:
+                hours.append(group_start, _dominant(apps), using / covered if covered else 0.0, bmin, bmax, covered)
+
+        for i in range(count):
+            ts = minutes.times[i]
+            start = ts - ts % HOUR
+            if start != group_start:
+                flush()
+                group_start, apps, using, covered, bmin, bmax = start, {}, 0.0, 0.0, NO_BATTERY, NO_BATTERY
+            seconds = minutes.seconds[i]
+            app = minutes.apps[i]
+            apps[app] = apps.get(app, 0.0) + seconds
+            using += minutes.using[i] * seconds
+            covered += seconds
+            lo, hi = minutes.battery_min[i], minutes.battery_max[i]
+            if lo != NO_BATTERY:
+                bmin = lo if bmin == NO_BATTERY else min(bmin, lo)
+                bmax = max(bmax, hi)
+        flush()
+        minutes.drop(count)
+
+    # ---- 查询 / 导出 / 导入 ----
+
+    def series(self, resolution: str, device: str) -> Optional[Series]:
+        return (self.minute if resolution == "minute" else self.hour).get(device)
+
+    def _copy(
+        self, start: float = 0.0, end: float = math.inf, device: Optional[str] = None, resolution: Optional[str] = None,
+    ) -> List[Tuple[str, str, Series]]:
+        """复制范围内各设备的列（写入者之后还会修改原来的列）；须在事件循环上调用"""
+        tables = []
+        for name, table in (("hour", self.hour), ("minute", self.minute)):
+            if resolution is not None and name != resolution:
+                continue
+            for dev, series in table.items():
+                if device is not None and dev != device:
+                    continue
+                lo, hi = bisect.bisect_left(series.times, start), bisect.bisect_right(series.times, end)
+                if lo >= hi:
+                    continue
+                copy = Series()
+                copy.times = series.times[lo:hi]
+                copy.apps = series.apps[lo:hi]
+                copy.using = series.using[lo:hi]
+                copy.battery_min = series.battery_min[lo:hi]
+                copy.battery_max = series.battery_max[lo:hi]
+                copy.seconds = series.seconds[lo:hi]
+                tables.append((name, dev, copy))
+        return tables
+
+    def export_records(self) -> Iterator[Dict[str, Any]]:
+        """快照各设备的列（复制），之后可在任意线程迭代"""
+        tables = self._copy()
+
+        def rows():
+            for resolution, device, series in tables:
+                for i in range(len(series)):
+                    yield {"type": "rollup", "resolution": resolution, "device": device, **series.row(i)}
+
+        return rows()
+
+    def scan(
+        self, start: float = 0.0, end: float = math.inf, device: Optional[str] = None, resolution: Optional[str] = None,
+    ) -> Iterator[tuple]:
+        """列式导出（columnar.py）用，同 export_records
+
+        -> (粒度, 设备, 时间, 主要应用, using 比例, 最低电量, 最高电量, 有数据的秒数)，缺失的电量为 None
+        """
+        tables = self._copy(start, end, device, resolution)
+
+        def rows():
+            for name, dev, series in tables:
+                for i in range(len(series)):
+                    bmin, bmax = series.battery_min[i], series.battery_max[i]
+                    yield (
+                        name, dev, series.times[i], series.apps[i], series.using[i],
+                        None if bmin == NO_BATTERY else bmin, None if bmax == NO_BATTERY else bmax, series.seconds[i],
+                    )
+
+        return rows()
+
+    def import_row(self, row: tuple):
+        resolution, device, ts, app, using, bmin, bmax, seconds = row
+        table = self.minute if resolution == "minute" else self.hour
+        series = table.get(device)
+        if series is None:
+            series = table[device] = Series()
+        series.append(ts, app, using, bmin, bmax, seconds)
+
+
+def parse_row(item: Dict[str, Any]) -> tuple:
+    """校验一条 rollup 记录；不合法时抛出 ValueError"""
+    resolution, device, ts = item.get("resolution"), item.get("device"), item.get("time")
+    if resolution not in RESOLUTIONS:
+        raise ValueError("invalid rollup resolution")
+    if not isinstance(device, str) or not device:
+        raise ValueError("invalid rollup device")
+    numbers = [ts, item.get("using"), item.get("seconds")]
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) and math.isfinite(v) for v in numbers):
+        raise ValueError("invalid rollup values")
+    app = item.get("app")
+    if app is not None and not isinstance(app, str):
+        raise ValueError("invalid rollup app")
+    batteries = []
+    for key in ("battery_min", "battery_max"):
+        value = item.get(key)
+        if value is None:
+            batteries.append(NO_BATTERY)
+        elif isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 100:
+            batteries.append(value)
+        else:
+            raise ValueError(f"invalid rollup {key}")
+    return (resolution, device, float(ts), app, float(numbers[1]), batteries[0], batteries[1], float(numbers[2]))
@@ -0,0 +1,79 @@
+import datetime
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from data import Data
+from tenants import request_config, request_data
+from utils import is_authenticated
+
+router = APIRouter()
+
+get_data = request_data
+
+RANGE_HELP = "today / yesterday / 7d / 2026-10-01 / 2026-10-01..2026-10-07"
+
+
+def _check_access(config, data: Data, authenticated: bool):
+    """analytics.public 时允许匿名访问，但隐私模式开启或有规则隐藏应用名时仍需认证"""
+    if authenticated:
+        return
+    if not config.analytics.public or data.private or data.redactor.hides_field("active_app.name"):
+        raise HTTPException(status_code=403, detail="Secret is invalid or missing")
+
+
+def _parse_range(data: Data, value: str, now: float):
+    try:
+        return data.analytics.parse_range(value, now)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _range_resp(first: int, last: int):
+    return {"from": datetime.date.fromordinal(first).isoformat(), "to": datetime.date.fromordinal(last).isoformat()}
+
+
+@router.get("/api/analytics/apps")
+async def app_usage(
+    range: str = Query("today", description=RANGE_HELP),
+    device: Optional[str] = Query(None, description="只统计这台设备"),
+    limit: int = Query(20, ge=1, le=1000, description="返回使用时长最多的前几个应用"),
+    config=Depends(request_config),
+    data: Data = Depends(get_data),
+    authenticated: bool = Depends(is_authenticated),
+):
+    """范围内每个应用的使用时长（秒），含仍在进行中的使用"""
+    _check_access(config, data, authenticated)
+    now = time.time()
+    first, last = _parse_range(data, range, now)
+    totals = data.analytics.apps(first, last, now, device)
+    top = sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return {
+        "range": _range_resp(first, last),
+        "device": device,
+        "total": round(sum(totals.values()), 1),
+        "apps": [{"name": name, "seconds": round(seconds, 1)} for name, seconds in top],
+    }
+
+
+@router.get("/api/analytics/heatmap")
+async def activity_heatmap(
+    range: str = Query("7d", description=RANGE_HELP),
+    device: Optional[str] = Query(None, description="只统计这台设备"),
+    config=Depends(request_config),
+    data: Data = Depends(get_data),
+    authenticated: bool = Depends(is_authenticated),
+):
+    """范围内每天 24 个小时的使用秒数（按 analytics.timezone 划分）"""
+    _check_access(config, data, authenticated)
+    now = time.time()
+    first, last = _parse_range(data, range, now)
+    rows = data.analytics.heatmap(first, last, now, device)
+    return {
+        "range": _range_resp(first, last),
+        "device": device,
+        "days": [
+            {"day": datetime.date.fromordinal(day).isoformat(), "hours": [round(s, 1) for s in hours]}
+            for day, hours in rows.items()
+        ],
+    }
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Query, Security
+from fastapi.responses import PlainTextResponse
+from profiling import profiler
+from utils import verify_secret
+
+router = APIRouter()
+
+
+# start / stop 必须在事件循环线程上执行: cProfile 的 enable / disable 只作用于调用它的线程
+@router.get("/api/debug/profile/start")
+async def profile_start(
+    requests: int = Query(100, ge=1, le=100000),
+    mode: str = Query("stack", pattern="^(stack|cprofile)$"),
+    interval_ms: float = Query(1.0, gt=0, le=1000),
+    path: str = Query("", description="只剖析以此前缀开头的请求路径"),
+    _: bool = Security(verify_secret),
+):
+    profiler.start(requests, mode=mode, interval=interval_ms / 1000, path_prefix=path)
+    return {"success": True, "profile": profiler.summary()}
+
+
+@router.get("/api/debug/profile/stop")
+async def profile_stop(_: bool = Security(verify_secret)):
+    profiler.stop()
+    return {"success": True, "profile": profiler.summary()}
+
+
+@router.get("/api/debug/profile")
+def profile_result(
+    format: str = Query("summary", pattern="^(summary|pstats|collapsed)$"),
+    sort: str = Query("cumulative"),
+    limit: int = Query(50, ge=1, le=1000),
+    _: bool = Security(verify_secret),
+):
+    if format == "summary":
+        return {"success": True, "profile": profiler.summary()}
+    try:
+        if format == "collapsed":
+            text = profiler.collapsed()
+        else:
+            text = profiler.pstats_text(sort=sort, limit=limit)
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return PlainTextResponse(text)
@@ -1,42 +1,129 @@
-from fastapi import APIRouter, Depends, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from typing import Optional
 import time
 from models.device_status import DeviceStatus
-from models.api import DeviceInfo
+from custom import CustomFieldError
 from data import Data
+import latency
+from tenants import request_data
 from utils import verify_secret
 
 router = APIRouter()
 
-
-def get_data() -> Data:
-    from main import data_store
-
-    return data_store
+get_data = request_data
 
 
 @router.post("/api/device/report/")
-def report_device_status(
+async def report_device_status(
     status: DeviceStatus,
     _: bool = Security(verify_secret),
     data: Data = Depends(get_data),
 ):
-    now = time.time()
+    # 在事件循环上提交给单写者，不再经过线程池
+    try:
+        await data.update_device(status, now=time.time())
+    except CustomFieldError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {"success": True, "message": "Device status updated"}
+
+
+@router.get("/api/device/private")
+async def set_private_mode(
+    private: Optional[bool] = Query(None),
+    isprivate: Optional[bool] = Query(None),  # 兼容 win_settings.py 客户端
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    mode = private if private is not None else isprivate
+    if mode is None:
+        raise HTTPException(status_code=400, detail="'private' arg must be boolean")
+    await data.set_private(mode)
+    return {"success": True, "private": data.private}
+
+
+@router.get("/api/device/remove")
+async def remove_device(
+    id: Optional[str] = Query(None),
+    name: Optional[str] = Query(None),  # 旧文档中的参数名
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    device_id = id or name
+    if not device_id:
+        raise HTTPException(status_code=400, detail="Missing device id!")
+    if await data.remove_device(device_id) is None:
+        raise HTTPException(status_code=404, detail=f"Device not found: {device_id}")
+    return {"success": True, "removed": [device_id]}
+
+
+@router.get("/api/device/remove_prefix")
+async def remove_devices_with_prefix(
+    prefix: str = Query(..., min_length=1),
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    removed = await data.remove_devices_with_prefix(prefix)
+    return {"success": True, "removed": [d.id for d in removed]}
 
-    dev_entry = DeviceInfo(
-        id=status.device_id,
-        name=status.device_name,
-        last_seen=now,
-        battery_percent=status.battery_percent,
-        battery_status=status.battery_status,
-        active_app=status.active_app.dict() if status.active_app else None,
-    )
 
-    # 替换或新增
-    for i, dev in enumerate(data.device_list):
-        if dev.id == status.device_id:  # 使用 .id 而不是 ["id"]
-            data.device_list[i] = dev_entry
-            break
+@router.get("/api/device/clear")
+async def clear_devices(
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    removed = await data.clear_devices()
+    return {"success": True, "count": len(removed)}
+
+
+@router.get("/api/device/latency")
+async def device_latency(
+    device: Optional[str] = Query(None, description="只返回这台设备"),
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    """上报延迟: 每台设备的时钟偏差估计与平滑后的分段延迟，以及进程内的整体分布（秒）"""
+    if device is not None:
+        entry = data.latency.get(device)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"No latency samples for device: {device}")
+        devices = {device: entry.as_dict()}
     else:
-        data.device_list.append(dev_entry)
+        devices = data.latency.per_device()
+    return {"success": True, "devices": devices, "aggregate": latency.aggregate()}
 
-    return {"success": True, "message": "Device status updated"}
+
+@router.get("/api/device/battery")
+async def device_battery(
+    device: Optional[str] = Query(None, description="只返回这台设备"),
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    """电量遥测: 每台设备估计的充放电速率、预计耗尽 / 充满时间，以及最近的电量变化序列"""
+    if device is not None:
+        entry = data.battery.get(device)
+        if entry is None:
+            raise HTTPException(status_code=404, detail=f"No battery samples for device: {device}")
+        devices = {device: entry.as_dict()}
+    else:
+        devices = data.battery.per_device()
+    return {"success": True, "devices": devices}
+
+
+@router.get("/api/device/classify")
+async def classify_window(
+    app: Optional[str] = Query(None, description="应用名"),
+    title: Optional[str] = Query(None, description="窗口标题"),
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    """用服务端窗口标题规则（classifier.rules）检查一个应用名 / 标题会被如何处理，不修改状态"""
+    if app is None and title is None:
+        raise HTTPException(status_code=400, detail="'app' or 'title' is required")
+    rule = data.classifier.classify(app, title) if data.classifier is not None else None
+    return {
+        "success": True,
+        "rules": len(data.classifier) if data.classifier is not None else 0,
+        "action": rule.action if rule is not None else None,
+        "rule": rule.as_dict() if rule is not None else None,
+    }
@@ -0,0 +1,77 @@
+import math
+import time
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from fastapi.responses import StreamingResponse
+import columnar
+from data import Data
+from history import SearchError, parse_time
+from tenants import request_data
+from utils import verify_secret
+
+router = APIRouter()
+
+get_data = request_data
+
+ROLLUP_MAX_LIMIT = 10080
+
+
+@router.get("/api/history/rollups")
+async def history_rollups(
+    device: str = Query(..., description="设备 ID"),
+    resolution: Literal["minute", "hour"] = Query("minute", description="汇总粒度"),
+    start: Optional[str] = Query(None, alias="from", description="起始时间（Unix 时间戳或 ISO 8601）"),
+    end: Optional[str] = Query(None, alias="to", description="结束时间（Unix 时间戳或 ISO 8601）"),
+    limit: int = Query(1440, ge=1, le=ROLLUP_MAX_LIMIT, description="最多返回的行数"),
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    """降采样后的历史汇总（早于 history.retention_days 的数据），按时间从旧到新返回"""
+    if data.history is None:
+        raise HTTPException(status_code=404, detail="History is not enabled (history.enabled)")
+    try:
+        lo = parse_time(start, 0.0)
+        hi = parse_time(end, math.inf)
+    except SearchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    series = data.history.rollups.series(resolution, device)
+    rows = series.rows(lo, hi, limit) if series is not None else []
+    return {
+        "device": device,
+        "resolution": resolution,
+        "count": len(rows),
+        "rows": rows,
+    }
+
+
+@router.get("/api/history/export")
+async def export_history(
+    table: Literal["history", "rollups"] = Query("history", description="history: 原始历史；rollups: 降采样后的汇总"),
+    fmt: str = Query("csv", alias="format", description="csv / scol / parquet / columnar（有 pyarrow 时为 parquet，否则为 scol）"),
+    start: Optional[str] = Query(None, alias="from", description="起始时间（Unix 时间戳或 ISO 8601）"),
+    end: Optional[str] = Query(None, alias="to", description="结束时间（Unix 时间戳或 ISO 8601）"),
+    device: Optional[str] = Query(None, description="只导出这台设备"),
+    resolution: Optional[Literal["minute", "hour"]] = Query(None, description="rollups: 只导出这个粒度"),
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    """流式导出历史 / 汇总（columnar.py）；导出的是请求时的数据，之后的上报不影响"""
+    if data.history is None:
+        raise HTTPException(status_code=404, detail="History is not enabled (history.enabled)")
+    try:
+        fmt = columnar.resolve_format(fmt)
+        lo = parse_time(start, 0.0)
+        hi = parse_time(end, math.inf)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if table == "history":
+        rows = data.history.scan(lo, hi, device)
+    else:
+        rows = data.history.rollups.scan(lo, hi, device, resolution)
+    filename = time.strftime(f"sleepy-{table}-%Y%m%d-%H%M%S.{fmt}")
+    return StreamingResponse(
+        columnar.chunks(table, rows, fmt),
+        media_type=columnar.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from metrics import REGISTRY
+
+router = APIRouter()
+
+# Prometheus 文本格式 0.0.4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics_exposition():
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
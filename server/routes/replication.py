@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from fastapi.responses import StreamingResponse
+from data import Data
+from replication import stream_log
+from tenants import request_config, request_data
+from utils import verify_secret
+
+router = APIRouter()
+
+get_data = request_data
+
+
+@router.get("/api/replication/stream")
+async def replication_stream(
+    start: int = Query(-1, alias="from", description="follower 已应用的版本，-1 表示全量同步"),
+    epoch: str = Query("", description="上次连接时 leader 返回的 epoch"),
+    _: bool = Security(verify_secret),
+    config=Depends(request_config),
+    data: Data = Depends(get_data),
+):
+    """follower 订阅的复制日志（NDJSON 长连接），格式见 replication.py"""
+    if data.replication_log is None:
+        raise HTTPException(status_code=404, detail="This instance is not a replication leader")
+    return StreamingResponse(
+        stream_log(data, data.replication_log, start, epoch, config.replication.heartbeat),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/replication/status")
+async def replication_status(
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    if data.follower is not None:
+        return data.follower.status()
+    log = data.replication_log
+    if log is not None:
+        return {
+            "role": "leader",
+            "epoch": log.epoch,
+            "version": data.version,
+            "log_entries": len(log),
+            "oldest_version": log.evicted_upto,
+        }
+    return {"role": "none", "version": data.version}
@@ -0,0 +1,44 @@
+import math
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Security
+from data import Data
+from history import Query as SearchQuery, SearchError, parse_time
+from tenants import request_data
+from utils import verify_secret
+
+router = APIRouter()
+
+get_data = request_data
+
+SEARCH_MAX_LIMIT = 500
+
+
+@router.get("/api/search")
+async def search_history(
+    q: str = Query(..., description='查询: 词 / 前缀* / "短语"，空格分隔的条件全部满足'),
+    start: Optional[str] = Query(None, alias="from", description="起始时间（Unix 时间戳或 ISO 8601）"),
+    end: Optional[str] = Query(None, alias="to", description="结束时间（Unix 时间戳或 ISO 8601）"),
+    device: Optional[str] = Query(None, description="只搜索这台设备"),
+    limit: int = Query(50, ge=1, le=SEARCH_MAX_LIMIT, description="最多返回的条数"),
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    """在设备历史的应用名与窗口标题中搜索，按时间从新到旧返回"""
+    if data.history is None:
+        raise HTTPException(status_code=404, detail="History is not enabled (history.enabled)")
+    try:
+        query = SearchQuery(q)
+        lo = parse_time(start, 0.0)
+        hi = parse_time(end, math.inf)
+        t0 = time.perf_counter()
+        hits = data.history.search(query, lo, hi, device, limit)
+    except SearchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "query": q,
+        "count": len(hits),
+        "took_ms": round((time.perf_counter() - t0) * 1000, 3),
+        "hits": hits,
+    }
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Security
+from fastapi.responses import StreamingResponse
+import time
+import backup
+from data import Data
+from tenants import request_config, request_data
+from utils import verify_secret
+
+router = APIRouter()
+
+get_data = request_data
+
+
+@router.get("/api/state/export")
+async def export_state(
+    gzip: bool = Query(False, description="gzip 压缩输出"),
+    _: bool = Security(verify_secret),
+    data: Data = Depends(get_data),
+):
+    """流式导出当前快照（NDJSON）；导出期间的新上报不影响已取得的快照"""
+    chunks = backup.export_lines(data.current, data.extra_records())
+    filename = time.strftime("sleepy-state-%Y%m%d-%H%M%S.ndjson")
+    if gzip:
+        chunks = backup.gzip_chunks(chunks)
+        filename += ".gz"
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/api/state/import")
+async def import_state(
+    request: Request,
+    mode: str = Query("replace", pattern="^(replace|merge)$", description="replace: 先清空设备；merge: 按 id 覆盖"),
+    _: bool = Security(verify_secret),
+    config=Depends(request_config),
+    data: Data = Depends(get_data),
+):
+    """从请求体流式导入 /api/state/export 的输出（可为 gzip），不把整个文件读入内存"""
+    try:
+        result = await backup.import_stream(
+            data, request.stream(), len(config.status.status_list), replace=mode == "replace"
+        )
+    except backup.BackupFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "mode": mode, **result}
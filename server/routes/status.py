@@ -1,22 +1,39 @@
-from fastapi import APIRouter, Query, Depends, Request, Security
+from fastapi import APIRouter, Query, Depends, Request, Security, HTTPException
 from typing import Optional
 import time
 from models.api import DeviceInfo, QueryResponse, SetResponse, StatusInfo
-from utils import verify_secret
-from config import get_config
+from utils import verify_secret, is_authenticated
+from tenants import request_config, request_data
 from data import Data
-from fastapi.responses import StreamingResponse
+from custom import QUERY_PREFIX as CUSTOM_QUERY_PREFIX
+from encoding import assemble_list, dumps, parse_fields
+from store import SORT_KEYS
+from fastapi.responses import Response, StreamingResponse
+from latency import APPLY_TO_SSE
+from lifecycle import lifecycle
+from metrics import SSE_DELIVERY
 import json
 import asyncio
 
 router = APIRouter()
 
-# 依赖项：获取全局实例
-def get_data() -> Data:
-    # 实际项目中可从 app.state 或 DI 容器获取
-    from main import data_store
+# 长轮询最长等待时间（秒）
+LONG_POLL_MAX_WAIT = 60
 
-    return data_store
+# 单页最多返回的设备数
+QUERY_MAX_LIMIT = 1000
+
+# 所有活跃 SSE 连接的待发送队列（用于队列深度指标）
+subscriber_queues = set()
+
+
+def close_event_streams():
+    """让所有 SSE 流发完已排队的事件后结束（关闭时调用）"""
+    for queue in subscriber_queues:
+        queue.put_nowait(None)
+
+# 依赖项：获取请求所属租户（或主实例）的数据
+get_data = request_data
 
 
 def get_metadata(config):
@@ -32,24 +49,30 @@ async def status_event_generator(data: Data):
     """生成 SSE 事件流"""
     queue = asyncio.Queue()
 
-    def on_update(payload):
-        # 将更新放入队列
-        asyncio.create_task(queue.put(json.dumps(payload)))
+    async def on_update(payload):
+        # 将更新放入队列（附带入队时间和写入者应用时间，用于统计投递延迟）
+        queue.put_nowait((time.perf_counter(), payload.get("applied_at"), json.dumps(payload)))
 
     # 注册监听器
     data.add_listener(on_update)
+    subscriber_queues.add(queue)
     try:
         # 先发送当前状态
-        initial = {
-            "status_id": data.status_id,
-            "last_updated": data.last_updated,
-            "device_count": len(data.device_list)
-        }
+        initial = data.snapshot("snapshot")
         yield f"data: {json.dumps(initial)}\n\n"
 
         # 持续等待新事件
         while True:
-            payload = await queue.get()
+            item = await queue.get()
+            if item is None:
+                # 服务端正在关闭: 此前排队的事件都已发出，告诉客户端稍后重连
+                retry = int(lifecycle.retry_after * 1000)
+                yield f"retry: {retry}\ndata: {json.dumps({'event': 'shutdown', 'retry': retry})}\n\n"
+                return
+            queued_at, applied_at, payload = item
+            SSE_DELIVERY.observe(time.perf_counter() - queued_at)
+            if applied_at is not None:
+                APPLY_TO_SSE.observe(max(0.0, time.time() - applied_at))
             yield f"data: {payload}\n\n"
             queue.task_done()
     except asyncio.CancelledError:
@@ -57,16 +80,52 @@ async def status_event_generator(data: Data):
     finally:
         # 取消监听
         data.remove_listener(on_update)
+        subscriber_queues.discard(queue)
 
 
 @router.get("/api/status/query", response_model=QueryResponse)
-def query_status(
-    config=Depends(get_config),
+async def query_status(
+    request: Request,
+    since: Optional[int] = Query(None, description="客户端已有的状态版本号"),
+    wait: float = Query(0, ge=0, le=LONG_POLL_MAX_WAIT, description="版本未变化时最多等待的秒数"),
+    fields: Optional[str] = Query(None, description="只返回设备的这些字段，逗号分隔"),
+    device: Optional[str] = Query(None, description="只返回这些设备 id，逗号分隔"),
+    using: Optional[bool] = Query(None, description="按是否正在使用过滤设备"),
+    sort: Optional[str] = Query(None, description="设备排序方式: using_first / last_seen / name"),
+    cursor: int = Query(0, ge=0, description="分页游标（上一页返回的 next_cursor）"),
+    limit: Optional[int] = Query(None, ge=1, le=QUERY_MAX_LIMIT, description="每页设备数"),
+    config=Depends(request_config),
     data: Data = Depends(get_data),
+    authenticated: bool = Depends(is_authenticated),
 ):
+    """其余以 custom. 开头的查询参数按自定义字段过滤，如 ?custom.location=office"""
+    try:
+        selected_fields = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if sort is not None and sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort: {sort}; available: {', '.join(SORT_KEYS)}")
+    ids = [i for i in device.split(",") if i] if device else None
+    custom = {}
+    for name, value in request.query_params.items():
+        if name.startswith(CUSTOM_QUERY_PREFIX):
+            key = name[len(CUSTOM_QUERY_PREFIX):]
+            if not data.filterable_custom_key(key, authenticated):
+                raise HTTPException(status_code=400, detail=f"Custom field is not filterable: {key}")
+            custom[key] = value
+
+    # 整个响应基于同一个已发布快照
+    snap = data.current
+
+    # 条件查询 / 长轮询: 版本未变化时挂起等待，超时返回 304
+    if since is not None and snap.version == since:
+        snap = await data.wait_for_change(since, wait) if wait > 0 else None
+        if snap is None:
+            return Response(status_code=304)
+
     # 获取当前状态信息
     try:
-        st_obj = config.status.status_list[data.status_id]
+        st_obj = config.status.status_list[snap.status_id]
         st_info = StatusInfo(
             id=st_obj.id,
             name=st_obj.name,
@@ -79,29 +138,32 @@ def query_status(
             id=-1, name="[未知]", color="#888", icon="❓", description=""
         )
 
-    # 直接使用已经存在的DeviceInfo对象列表，无需重新创建
-    devices = data.device_list
-
-    resp = QueryResponse(
-        success=True,
-        time=time.time(),
-        status=st_info,
-        device=devices,
-        last_updated=data.last_updated,
+    # 携带 secret 时返回完整数据，否则为脱敏后的公开数据；设备部分由预编码片段直接拼接
+    frags, next_cursor = data.select_devices(
+        snap, authenticated, ids=ids, using=using, custom=custom, sort=sort, cursor=cursor, limit=limit
     )
 
-    return resp
+    head = dumps({"success": True, "time": time.time(), "status": st_info.model_dump()})
+    tail = dumps({
+        "last_updated": snap.last_updated,
+        "version": snap.version,
+        "next_cursor": next_cursor,
+        "meta": None,
+        "metrics": None,
+    })
+    body = head[:-1] + b',"device":' + assemble_list(frags, selected_fields) + b"," + tail[1:]
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/api/status/set", response_model=SetResponse)
 async def set_status(
     status: int = Query(..., ge=0),
     _: bool = Security(verify_secret),  # ← 关键：用 Security 而不是 Depends
-    config=Depends(get_config),
+    config=Depends(request_config),
     data: Data = Depends(get_data),
 ):
     # 切换状态
-    if data.set_status(status, config):
+    if await data.set_status(status, config):
         # 构造新状态信息
         st_obj = config.status.status_list[status]
         new_status = StatusInfo(
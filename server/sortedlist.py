@@ -0,0 +1,143 @@
+"""
+分桶有序列表
+
+思路同 sortedcontainers.SortedList：数据分成若干个有序小桶，另存每个桶的最大值。
+查找是两次 bisect，插入 / 删除只移动一个桶内的元素，在十万级规模下基本等价于 O(log n)。
+不引入第三方依赖。
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Iterable, Iterator, List, Optional
+
+DEFAULT_LOAD = 512
+
+
+class SortedList:
+    def __init__(self, iterable: Iterable = (), load: int = DEFAULT_LOAD):
+        self._load = load
+        self._lists: List[list] = []
+        self._maxes: List[Any] = []
+        self._len = 0
+        values = sorted(iterable)
+        for i in range(0, len(values), load):
+            chunk = values[i:i + load]
+            self._lists.append(chunk)
+            self._maxes.append(chunk[-1])
+        self._len = len(values)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator:
+        for lst in self._lists:
+            yield from lst
+
+    def __reversed__(self) -> Iterator:
+        for lst in reversed(self._lists):
+            yield from reversed(lst)
+
+    def __contains__(self, value) -> bool:
+        pos = bisect_left(self._maxes, value)
+        if pos == len(self._maxes):
+            return False
+        lst = self._lists[pos]
+        idx = bisect_left(lst, value)
+        return idx < len(lst) and lst[idx] == value
+
+    def clear(self):
+        self._lists = []
+        self._maxes = []
+        self._len = 0
+
+    def add(self, value):
+        maxes = self._maxes
+        if not maxes:
+            self._lists.append([value])
+            maxes.append(value)
+            self._len = 1
+            return
+        pos = bisect_left(maxes, value)
+        if pos == len(maxes):
+            pos -= 1
+            self._lists[pos].append(value)
+            maxes[pos] = value
+        else:
+            insort(self._lists[pos], value)
+        self._len += 1
+        self._split(pos)
+
+    def _split(self, pos: int):
+        lst = self._lists[pos]
+        if len(lst) > 2 * self._load:
+            tail = lst[self._load:]
+            del lst[self._load:]
+            self._maxes[pos] = lst[-1]
+            self._lists.insert(pos + 1, tail)
+            self._maxes.insert(pos + 1, tail[-1])
+
+    def discard(self, value) -> bool:
+        maxes = self._maxes
+        pos = bisect_left(maxes, value)
+        if pos == len(maxes):
+            return False
+        lst = self._lists[pos]
+        idx = bisect_left(lst, value)
+        if idx == len(lst) or lst[idx] != value:
+            return False
+        del lst[idx]
+        self._len -= 1
+        if not lst:
+            del self._lists[pos]
+            del maxes[pos]
+        elif idx == len(lst):
+            maxes[pos] = lst[-1]
+        return True
+
+    def remove(self, value):
+        if not self.discard(value):
+            raise ValueError(f"{value!r} not in list")
+
+    def irange(self, minimum: Optional[Any] = None, maximum: Optional[Any] = None,
+               inclusive=(True, True), reverse: bool = False) -> Iterator:
+        """按值域迭代；minimum / maximum 为 None 表示不设界"""
+        if reverse:
+            return reversed(list(self.irange(minimum, maximum, inclusive)))
+        return self._irange(minimum, maximum, inclusive)
+
+    def _irange(self, minimum, maximum, inclusive) -> Iterator:
+        lists, maxes = self._lists, self._maxes
+        if minimum is None:
+            pos, idx = 0, 0
+        else:
+            finder = bisect_left if inclusive[0] else bisect_right
+            pos = finder(maxes, minimum)
+            if pos == len(maxes):
+                return
+            idx = finder(lists[pos], minimum)
+        while pos < len(lists):
+            lst = lists[pos]
+            for value in lst[idx:]:
+                if maximum is not None and (value > maximum or (value == maximum and not inclusive[1])):
+                    return
+                yield value
+            pos += 1
+            idx = 0
+
+    def iter_from(self, index: int = 0) -> Iterator:
+        """从第 index 个元素（按位置）开始顺序迭代"""
+        lists = self._lists
+        pos = 0
+        while pos < len(lists) and index >= len(lists[pos]):
+            index -= len(lists[pos])
+            pos += 1
+        if pos == len(lists):
+            return
+        yield from lists[pos][max(0, index):]
+        for lst in lists[pos + 1:]:
+            yield from lst
+
+    def first(self):
+        return self._lists[0][0] if self._lists else None
+
+    def last(self):
+        return self._lists[-1][-1] if self._lists else None
@@ -0,0 +1,259 @@
+"""
+已发布的只读状态快照
+
+写入者（Data 的单写者任务）每提交一批变更就发布一个新的 Snapshot，
+读取者只持有快照引用，永远看到一致的时间点视图，无需加锁。
+
+设备集合采用结构共享（copy-on-write）:
+- PVector: 按首次上报顺序存放设备记录，分成固定大小的块；
+  一批变更只复制被改动的块，其余块与上一个快照共享。
+  槽位一经分配不再改变（也是分页游标），设备删除后留下空槽；整块都空时换成共享的空块释放内存，
+  清空时新设备从下一个整块开始编号，不重用旧槽位
+- PMap: 设备 id -> 槽位，按哈希分桶；只在新增 / 删除设备时复制对应的桶
+两者都有一个 Builder（transient）版本供写入者在一批之内原地修改，freeze() 后即不再改动。
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from records import DeviceRecord
+
+MAP_BITS = 10
+MAP_BUCKETS = 1 << MAP_BITS
+MAP_MASK = MAP_BUCKETS - 1
+VECTOR_CHUNK = 256
+
+_EMPTY_BUCKET: Dict[Any, Any] = {}
+# 已释放的块（其中的槽位全部为空）
+_RELEASED: tuple = ()
+
+
+class PMap:
+    """持久化哈希映射（只读）"""
+
+    __slots__ = ("_buckets", "_len")
+
+    def __init__(self, buckets: Tuple[dict, ...] = (_EMPTY_BUCKET,) * MAP_BUCKETS, length: int = 0):
+        self._buckets = buckets
+        self._len = length
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, key) -> bool:
+        return key in self._buckets[hash(key) & MAP_MASK]
+
+    def get(self, key, default=None):
+        return self._buckets[hash(key) & MAP_MASK].get(key, default)
+
+    def builder(self) -> "PMapBuilder":
+        return PMapBuilder(self)
+
+
+class PMapBuilder:
+    """PMap 的可写版本；桶在第一次修改时复制（每次 freeze 之后重新计数）"""
+
+    __slots__ = ("_buckets", "_owned", "_len")
+
+    def __init__(self, base: PMap):
+        self._buckets = list(base._buckets)
+        self._owned = set()
+        self._len = len(base)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __contains__(self, key) -> bool:
+        return key in self._buckets[hash(key) & MAP_MASK]
+
+    def get(self, key, default=None):
+        return self._buckets[hash(key) & MAP_MASK].get(key, default)
+
+    def _own(self, idx: int) -> dict:
+        if idx not in self._owned:
+            self._buckets[idx] = dict(self._buckets[idx])
+            self._owned.add(idx)
+        return self._buckets[idx]
+
+    def set(self, key, value):
+        bucket = self._own(hash(key) & MAP_MASK)
+        if key not in bucket:
+            self._len += 1
+        bucket[key] = value
+
+    def pop(self, key, default=None):
+        idx = hash(key) & MAP_MASK
+        if key not in self._buckets[idx]:
+            return default
+        self._len -= 1
+        return self._own(idx).pop(key)
+
+    def freeze(self) -> PMap:
+        self._owned = set()
+        return PMap(tuple(self._buckets), self._len)
+
+
+class PVector:
+    """持久化分块向量（只读），槽位可以是 None（已删除）"""
+
+    __slots__ = ("_chunks", "_size")
+
+    def __init__(self, chunks: Tuple[tuple, ...] = (), size: int = 0):
+        self._chunks = chunks
+        self._size = size
+
+    def __getitem__(self, pos: int):
+        return self._chunks[pos // VECTOR_CHUNK][pos % VECTOR_CHUNK]
+
+    def __iter__(self) -> Iterator:
+        for chunk in self._chunks:
+            for item in chunk:
+                if item is not None:
+                    yield item
+
+    def slots(self) -> int:
+        return self._size
+
+    def items_from(self, pos: int = 0) -> Iterator[Tuple[int, Any]]:
+        """从槽位 pos 开始按顺序迭代 (槽位, 元素)，跳过空槽"""
+        idx, off = divmod(max(0, pos), VECTOR_CHUNK)
+        base = idx * VECTOR_CHUNK
+        for chunk in self._chunks[idx:]:
+            for i in range(off, len(chunk)):
+                item = chunk[i]
+                if item is not None:
+                    yield base + i, item
+            base += VECTOR_CHUNK
+            off = 0
+
+    def builder(self) -> "PVectorBuilder":
+        return PVectorBuilder(self)
+
+    @classmethod
+    def starting_at(cls, pos: int) -> "PVector":
+        """空向量，新元素从槽位 pos（向上取整到整块）开始编号"""
+        chunks = -(-pos // VECTOR_CHUNK)
+        return cls((_RELEASED,) * chunks, chunks * VECTOR_CHUNK)
+
+
+class PVectorBuilder:
+    __slots__ = ("_chunks", "_owned", "_size")
+
+    def __init__(self, base: PVector):
+        self._chunks: List[Any] = list(base._chunks)
+        self._owned = set()
+        self._size = base._size
+
+    def __getitem__(self, pos: int):
+        return self._chunks[pos // VECTOR_CHUNK][pos % VECTOR_CHUNK]
+
+    def __iter__(self) -> Iterator:
+        for chunk in self._chunks:
+            for item in chunk:
+                if item is not None:
+                    yield item
+
+    def slots(self) -> int:
+        return self._size
+
+    def _own(self, idx: int) -> list:
+        if idx not in self._owned:
+            self._chunks[idx] = list(self._chunks[idx])
+            self._owned.add(idx)
+        return self._chunks[idx]
+
+    def append(self, item) -> int:
+        pos = self._size
+        idx = pos // VECTOR_CHUNK
+        if idx == len(self._chunks):
+            self._chunks.append([])
+            self._owned.add(idx)
+        self._own(idx).append(item)
+        self._size += 1
+        return pos
+
+    def set(self, pos: int, item):
+        self._own(pos // VECTOR_CHUNK)[pos % VECTOR_CHUNK] = item
+
+    def release_empty(self) -> int:
+        """把全部为空的整块换成共享的空块（不含仍在追加的最后一块），返回释放的块数；槽位编号不变"""
+        released = 0
+        for idx in range(self._size // VECTOR_CHUNK):
+            chunk = self._chunks[idx]
+            if chunk is not _RELEASED and chunk.count(None) == len(chunk):
+                self._chunks[idx] = _RELEASED
+                self._owned.discard(idx)
+                released += 1
+        return released
+
+    def freeze(self) -> PVector:
+        for idx in self._owned:
+            self._chunks[idx] = tuple(self._chunks[idx])
+        self._owned = set()
+        return PVector(tuple(self._chunks), self._size)
+
+
+class DeviceView:
+    """快照中的设备集合：按首次上报顺序迭代，支持按 id 查找
+
+    encoded 与 records 槽位一一对应，存放 (完整片段, 脱敏片段) 预编码 JSON（见 encoding.py）。
+    """
+
+    __slots__ = ("_slots", "_records", "_encoded")
+
+    def __init__(self, slots: PMap = PMap(), records: PVector = PVector(), encoded: PVector = PVector()):
+        self._slots = slots
+        self._records = records
+        self._encoded = encoded
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __iter__(self) -> Iterator[DeviceRecord]:
+        return iter(self._records)
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._slots
+
+    def get(self, device_id: str) -> Optional[DeviceRecord]:
+        pos = self._slots.get(device_id)
+        return None if pos is None else self._records[pos]
+
+    def record(self, slot: int) -> Optional[DeviceRecord]:
+        return self._records[slot]
+
+    def slot_of(self, device_id: str) -> Optional[int]:
+        return self._slots.get(device_id)
+
+    def encoded(self, slot: int):
+        return self._encoded[slot]
+
+    def encoded_from(self, slot: int = 0) -> Iterator[Tuple[int, Any]]:
+        return self._encoded.items_from(slot)
+
+
+class Snapshot:
+    """一次提交后的完整状态；cache 用于存放由本快照派生、可随快照复用的数据（如响应视图）"""
+
+    __slots__ = ("version", "status_id", "last_updated", "private", "switch_count", "devices", "cache")
+
+    def __init__(
+        self,
+        version: int,
+        status_id: int,
+        last_updated: float,
+        private: bool,
+        switch_count: int,
+        devices: DeviceView,
+    ):
+        self.version = version
+        self.status_id = status_id
+        self.last_updated = last_updated
+        self.private = private
+        self.switch_count = switch_count
+        self.devices = devices
+        self.cache: Dict[str, Any] = {}
+
+    def __setattr__(self, name, value):
+        if hasattr(self, name):
+            raise AttributeError("Snapshot is immutable")
+        object.__setattr__(self, name, value)
@@ -0,0 +1,85 @@
+"""
+状态备份命令行工具（只依赖标准库）
+
+    python statectl.py export -u http://127.0.0.1:8080 -s <secret> -o backup.ndjson.gz --gzip
+    python statectl.py import -u http://127.0.0.1:8080 -s <secret> -i backup.ndjson.gz [--merge]
+
+多租户时 URL 带上租户前缀即可，如 http://host:8080/t/alice。
+secret 也可以通过环境变量 SLEEPY_SECRET 提供。导出和导入都按块流式读写，不会把整个文件读入内存。
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import urllib.error
+import urllib.parse
+import urllib.request
+
+CHUNK = 1 << 16
+
+
+def _request(url: str, secret: str, **kwargs) -> urllib.request.Request:
+    req = urllib.request.Request(url, **kwargs)
+    req.add_header("X-Secret", secret)
+    return req
+
+
+def export_state(base: str, secret: str, output: str, gzip: bool) -> int:
+    url = f"{base}/api/state/export" + ("?gzip=true" if gzip else "")
+    with urllib.request.urlopen(_request(url, secret)) as resp:
+        if output == "-":
+            shutil.copyfileobj(resp, sys.stdout.buffer, CHUNK)
+            return 0
+        with open(output, "wb") as f:
+            shutil.copyfileobj(resp, f, CHUNK)
+    print(f"exported to {output} ({os.path.getsize(output)} bytes)", file=sys.stderr)
+    return 0
+
+
+def import_state(base: str, secret: str, source: str, merge: bool) -> int:
+    query = urllib.parse.urlencode({"mode": "merge" if merge else "replace"})
+    with open(source, "rb") as f:
+        # 文件对象作为请求体时 http.client 按块发送
+        req = _request(f"{base}/api/state/import?{query}", secret, data=f, method="POST")
+        req.add_header("Content-Length", str(os.fstat(f.fileno()).st_size))
+        req.add_header("Content-Type", "application/x-ndjson")
+        with urllib.request.urlopen(req) as resp:
+            result = json.load(resp)
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Sleepy state export / import")
+    parser.add_argument("-u", "--url", default="http://127.0.0.1:8080", help="服务端地址（可带租户前缀）")
+    parser.add_argument("-s", "--secret", default=os.environ.get("SLEEPY_SECRET"), help="默认取 SLEEPY_SECRET")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exp = sub.add_parser("export", help="导出状态到文件")
+    exp.add_argument("-o", "--output", required=True, help="输出文件，- 为标准输出")
+    exp.add_argument("--gzip", action="store_true", help="由服务端 gzip 压缩")
+
+    imp = sub.add_parser("import", help="从导出文件恢复状态（支持 gzip）")
+    imp.add_argument("-i", "--input", required=True)
+    imp.add_argument("--merge", action="store_true", help="保留现有设备，按 id 覆盖")
+
+    args = parser.parse_args(argv)
+    if not args.secret:
+        parser.error("secret is required (--secret or SLEEPY_SECRET)")
+    base = args.url.rstrip("/")
+    try:
+        if args.command == "export":
+            return export_state(base, args.secret, args.output, args.gzip)
+        return import_state(base, args.secret, args.input, args.merge)
+    except urllib.error.HTTPError as e:
+        print(f"HTTP {e.code}: {e.read().decode('utf-8', 'replace')}", file=sys.stderr)
+        return 1
+    except urllib.error.URLError as e:
+        print(f"request failed: {e.reason}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
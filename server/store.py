@@ -0,0 +1,212 @@
+"""
+设备存储（仅由写入者修改）
+
+- 设备记录（紧凑的 DeviceRecord，见 records.py）按首次上报顺序放在分块向量里，id -> 槽位放在分桶哈希映射里，
+  freeze() 生成与上一个快照结构共享的只读 DeviceView（见 state.py）
+- 槽位是未排序分页的游标，一经分配不再改变: 删除留下空槽，定期释放已全部为空的块；清空后新设备接着编号
+- 每条记录同时保存预编码的 JSON 片段（完整 / 脱敏），查询时直接拼接
+- 另维护几份有序索引（只在写入者所在的事件循环上同步读取）:
+  - 有序 id: 按前缀批量删除只访问命中的区间
+  - using / 非 using 的槽位集合: ?using= 过滤与分页不扫描全部设备
+  - 几种排序方式（SORT_KEYS）各一份有序列表: 每次上报 O(log n) 调整位置，
+    ?sort= 查询直接按顺序读取，不再逐请求排序
+  - 配置中声明的自定义字段键: 值 -> 槽位集合，?custom.<键>= 过滤只访问命中的设备
+"""
+
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from custom import MISSING, index_value, lookup
+from encoding import EncodedDevice
+from records import DeviceRecord
+from sortedlist import SortedList
+from state import DeviceView, PMap, PVector
+
+# 每删除这么多台设备检查一次，释放已全部为空的块
+RELEASE_INTERVAL = 1024
+
+# using 优先时的分组顺序: 使用中 -> 未使用 -> 未知
+USING_RANK = {True: 0, False: 1, None: 2}
+
+# 排序方式 -> 排序键；末尾带上槽位，保证键唯一且相同值时按首次上报顺序
+SORT_KEYS: Dict[str, Callable[[DeviceRecord, int], tuple]] = {
+    "name": lambda entry, pos: (entry.name, pos),
+    "last_seen": lambda entry, pos: (-entry.last_seen, pos),  # 最近上报的在前
+    "using_first": lambda entry, pos: (USING_RANK[entry.using], entry.name, pos),
+}
+
+# 记录 -> (完整编码, 脱敏编码；脱敏后隐藏的设备为 None)
+Encoder = Callable[[DeviceRecord], Tuple[EncodedDevice, Optional[EncodedDevice]]]
+
+
+class DeviceStore:
+    def __init__(self, encode: Optional[Encoder] = None, custom_indexes: Sequence[str] = ()):
+        self._encode = encode or (lambda entry: (None, None))
+        self._custom_keys = tuple(custom_indexes)
+        # 变更记录（复制日志用，见 replication.py）: 上次取走以来改动过的 id，以及期间是否清空过
+        self._changes: Optional[Dict[str, None]] = None
+        self._cleared = False
+        self._reset()
+
+    def _reset(self, next_slot: int = 0):
+        self._slots = PMap().builder()
+        self._records = PVector.starting_at(next_slot).builder()
+        self._encoded = PVector.starting_at(next_slot).builder()
+        self._removed = 0
+        self._ids = SortedList()
+        self._using = SortedList()
+        self._idle = SortedList()
+        self._orders = {name: SortedList() for name in SORT_KEYS}
+        # 自定义字段索引: 键 -> {index_value(值): 槽位}
+        self._custom: Dict[str, Dict[str, SortedList]] = {key: {} for key in self._custom_keys}
+        self._view = DeviceView()
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def track_changes(self):
+        """开始记录改动过的设备 id"""
+        if self._changes is None:
+            self._changes = {}
+
+    def take_changes(self) -> Tuple[bool, List[str]]:
+        """-> (上次取走以来是否清空过, 改动过的 id)；id 当前不在存储中表示已删除"""
+        cleared, ids = self._cleared, list(self._changes or ())
+        if self._changes is not None:
+            self._changes = {}
+        self._cleared = False
+        return cleared, ids
+
+    def __contains__(self, device_id: str) -> bool:
+        return device_id in self._slots
+
+    def __iter__(self) -> Iterator[DeviceRecord]:
+        return iter(self._records)
+
+    def get(self, device_id: str) -> Optional[DeviceRecord]:
+        pos = self._slots.get(device_id)
+        return None if pos is None else self._records[pos]
+
+    def values(self) -> List[DeviceRecord]:
+        return list(self._records)
+
+    def _index(self, pos: int, old: Optional[DeviceRecord], new: Optional[DeviceRecord]):
+        before = old.using if old is not None else None
+        after = new.using if new is not None else None
+        if before != after:
+            if before is not None:
+                (self._using if before else self._idle).discard(pos)
+            if after is not None:
+                (self._using if after else self._idle).add(pos)
+
+        for key in self._custom_keys:
+            old_value = lookup(old.custom, key, MISSING) if old is not None else MISSING
+            new_value = lookup(new.custom, key, MISSING) if new is not None else MISSING
+            if old_value != new_value or type(old_value) is not type(new_value):
+                index = self._custom[key]
+                if old_value is not MISSING:
+                    old_text = index_value(old_value)
+                    bucket = index[old_text]
+                    bucket.discard(pos)
+                    if not bucket:
+                        del index[old_text]
+                if new_value is not MISSING:
+                    index.setdefault(index_value(new_value), SortedList()).add(pos)
+
+        for name, key in SORT_KEYS.items():
+            old_key = key(old, pos) if old is not None else None
+            new_key = key(new, pos) if new is not None else None
+            if old_key != new_key:
+                order = self._orders[name]
+                if old_key is not None:
+                    order.discard(old_key)
+                if new_key is not None:
+                    order.add(new_key)
+
+    def upsert(self, entry: DeviceRecord) -> Optional[DeviceRecord]:
+        """写入设备，返回被替换的旧记录（新设备返回 None）"""
+        self._dirty = True
+        if self._changes is not None:
+            self._changes[entry.id] = None
+        encoded = self._encode(entry)
+        pos = self._slots.get(entry.id)
+        if pos is None:
+            pos = self._records.append(entry)
+            self._encoded.append(encoded)
+            self._slots.set(entry.id, pos)
+            self._ids.add(entry.id)
+            self._index(pos, None, entry)
+            return None
+        old = self._records[pos]
+        self._records.set(pos, entry)
+        self._encoded.set(pos, encoded)
+        self._index(pos, old, entry)
+        return old
+
+    def remove(self, device_id: str) -> Optional[DeviceRecord]:
+        pos = self._slots.pop(device_id)
+        if pos is None:
+            return None
+        self._dirty = True
+        if self._changes is not None:
+            self._changes[device_id] = None
+        entry = self._records[pos]
+        self._records.set(pos, None)
+        self._encoded.set(pos, None)
+        self._ids.discard(device_id)
+        self._index(pos, entry, None)
+        self._removed += 1
+        if self._removed >= RELEASE_INTERVAL:
+            self._removed = 0
+            self._records.release_empty()
+            self._encoded.release_empty()
+        return entry
+
+    def clear(self) -> List[DeviceRecord]:
+        removed = self.values()
+        # 不重用旧槽位: 清空前拿到的游标继续翻页时，从清空后新上报的第一台设备开始
+        self._reset(self._records.slots())
+        self._dirty = True
+        if self._changes is not None:
+            self._changes = {}
+            self._cleared = True
+        return removed
+
+    def ids_with_prefix(self, prefix: str) -> List[str]:
+        out = []
+        for device_id in self._ids.irange(minimum=prefix):
+            if not device_id.startswith(prefix):
+                break
+            out.append(device_id)
+        return out
+
+    def remove_prefix(self, prefix: str) -> List[DeviceRecord]:
+        return [self.remove(device_id) for device_id in self.ids_with_prefix(prefix)]
+
+    def slots_by_using(self, using: bool, start: int = 0) -> Iterator[int]:
+        """按槽位顺序迭代 using 标记为指定值的设备槽位"""
+        return (self._using if using else self._idle).irange(minimum=start)
+
+    def is_custom_indexed(self, key: str) -> bool:
+        return key in self._custom
+
+    def custom_count(self, key: str, value: str) -> int:
+        bucket = self._custom[key].get(value)
+        return len(bucket) if bucket is not None else 0
+
+    def slots_by_custom(self, key: str, value: str, start: int = 0) -> Iterator[int]:
+        """按槽位顺序迭代 custom[key] 等于 value（index_value 形式）的设备槽位"""
+        bucket = self._custom[key].get(value)
+        return bucket.irange(minimum=start) if bucket is not None else iter(())
+
+    def slots_sorted(self, sort: str, start: int = 0) -> Iterator[Tuple[int, int]]:
+        """按排序方式从第 start 个位置开始迭代 (位置, 槽位)"""
+        order = self._orders[sort]
+        return ((pos, key[-1]) for pos, key in enumerate(order.iter_from(start), start))
+
+    def freeze(self) -> DeviceView:
+        """返回当前内容的只读视图；未改动的块 / 桶与上一个视图共享"""
+        if self._dirty:
+            self._view = DeviceView(self._slots.freeze(), self._records.freeze(), self._encoded.freeze())
+            self._dirty = False
+        return self._view
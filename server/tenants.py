@@ -0,0 +1,288 @@
+"""
+多租户: 一个进程托管多个独立的状态页
+
+- 租户由路径前缀（/t/<租户>/api/...）或 Host（<租户><host_suffix>）确定，
+  TenantMiddleware 把租户对象放进 scope["tenant"]，并像 Mount 一样把路径前缀并入 root_path，
+  路由无需区分租户
+- 每个租户有自己的 AppConfig（tenants/<租户>.yaml 覆盖在主配置之上）和 Data
+- 第一次访问时加载；没有进行中的请求（含 SSE / 长轮询）且空闲超过 idle_timeout 后卸载。
+  配置了 main.state_file 时，卸载（以及进程关闭）会把租户的完整状态写入
+  <directory>/<租户>.state.ndjson.gz，加载时恢复；否则只在内存中保留当前状态 / 隐私模式 / 切换次数，
+  设备列表在下次上报时重建
+- 卸载期间（停止写入、保存状态）到达的请求等卸载完成后再重新加载，不会读到保存之前的旧状态
+- 不在 scope 中的请求属于主实例（main.data_store / 主配置），未启用多租户时行为不变
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+import backup
+from fastapi import Request
+from starlette.routing import get_route_path
+
+from config import get_config
+from config.schema import AppConfig
+from data import Data
+from metrics import counter, gauge
+
+TENANT_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+# 租户可访问的接口（统计、历史与搜索读取的也是租户自己的 Data）；指标、调试、复制等进程级接口只属于主实例
+TENANT_ROUTES = ("/api/status/", "/api/device/", "/api/state/", "/api/analytics/", "/api/history/", "/api/search")
+
+TENANTS_LOADED = gauge("sleepy_tenants_loaded", "Tenants currently loaded in memory")
+TENANT_LOADS = counter("sleepy_tenant_loads", "Tenant load operations")
+TENANT_EVICTIONS = counter("sleepy_tenant_evictions", "Tenants unloaded after being idle")
+
+
+class TenantError(Exception):
+    """租户不存在或配置无效"""
+
+
+class Tenant:
+    __slots__ = ("name", "config", "data", "active", "last_used")
+
+    def __init__(self, name: str, config: AppConfig, data: Data):
+        self.name = name
+        self.config = config
+        self.data = data
+        self.active = 0  # 进行中的请求数
+        self.last_used = time.monotonic()
+
+
+def _merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(out.get(key), dict):
+            out[key] = _merge(out[key], value)
+        else:
+            out[key] = value
+    return out
+
+
+class TenantRegistry:
+    def __init__(self, config: AppConfig):
+        self.settings = config.tenants
+        self.enabled = self.settings.enabled
+        self._root = config
+        self._directory = Path(self.settings.directory)
+        # 与主实例一致: 配置了状态文件时，租户状态也持久化
+        self._persist = bool(config.main.state_file)
+        self._tenants: Dict[str, Tenant] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        # 正在卸载（停止写入、保存状态）的租户: 名称 -> 完成时 set 的 future；期间的请求等它完成后重新加载
+        self._evicting: Dict[str, asyncio.Future] = {}
+        # 已卸载租户的状态: 名称 -> (status_id, private, switch_count)
+        self._parked: Dict[str, Tuple[int, bool, int]] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tenants
+
+    def resolve(self, scope) -> Tuple[Optional[str], str]:
+        """-> (租户名或 None, 去掉租户前缀后的路由路径)"""
+        path = get_route_path(scope)
+        if self.settings.mode == "host":
+            host = ""
+            for key, value in scope["headers"]:
+                if key == b"host":
+                    host = value.decode("latin-1").split(":", 1)[0].lower()
+                    break
+            suffix = self.settings.host_suffix.lower()
+            if suffix and host.endswith(suffix) and len(host) > len(suffix):
+                return host[: -len(suffix)], path
+            return None, path
+
+        prefix = self.settings.path_prefix.rstrip("/") + "/"
+        if not path.startswith(prefix):
+            return None, path
+        name, sep, rest = path[len(prefix):].partition("/")
+        return name, "/" + rest
+
+    def state_path(self, name: str) -> Path:
+        return self._directory / f"{name}.state.ndjson.gz"
+
+    def release_waiters(self):
+        for tenant in self._tenants.values():
+            tenant.data.release_waiters()
+
+    def load_config(self, name: str) -> AppConfig:
+        if not TENANT_NAME.match(name):
+            raise TenantError(f"Invalid tenant name: {name}")
+        path = self._directory / f"{name}.yaml"
+        if not path.is_file():
+            raise TenantError(f"Unknown tenant: {name}")
+        try:
+            raw = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+            if not raw.get("main", {}).get("secret"):
+                raise ValueError("main.secret is required")
+            # 租户不能再嵌套租户
+            raw.pop("tenants", None)
+            return AppConfig(**_merge(json.loads(self._root.model_dump_json(exclude={"tenants"})), raw))
+        except (yaml.YAMLError, ValueError, TypeError) as e:
+            logging.error(f"Invalid tenant config {path}: {e}")
+            raise TenantError(f"Invalid tenant config: {name}")
+
+    async def acquire(self, name: str) -> Tenant:
+        """取得租户（必要时加载），请求结束后必须调用 release()"""
+        tenant = self._tenants.get(name)
+        while tenant is None:
+            evicting = self._evicting.get(name)
+            if evicting is not None:
+                # 否则会读到卸载前保存的旧状态，卸载完成后的保存又会覆盖新实例的文件
+                await asyncio.shield(evicting)
+                tenant = self._tenants.get(name)
+                continue
+            task = self._loading.get(name)
+            if task is None:
+                task = self._loading[name] = asyncio.create_task(self._load(name))
+                task.add_done_callback(lambda _: self._loading.pop(name, None))
+            tenant = await asyncio.shield(task)
+        tenant.active += 1
+        return tenant
+
+    def release(self, tenant: Tenant):
+        tenant.active -= 1
+        tenant.last_used = time.monotonic()
+
+    async def _load(self, name: str) -> Tenant:
+        config = self.load_config(name)
+        if len(self._tenants) >= self.settings.max_loaded:
+            await self._evict(self._lru_idle(len(self._tenants) - self.settings.max_loaded + 1))
+        data = Data(config, report_metrics=False)
+        parked = self._parked.pop(name, None)
+        if parked is not None:
+            data.restore(*parked)
+        await data.start()
+        path = self.state_path(name)
+        if self._persist and path.is_file():
+            try:
+                await backup.load(data, str(path), len(config.status.status_list))
+            except (OSError, backup.BackupFormatError) as e:
+                logging.error(f"Cannot restore tenant state {path}: {e}")
+                await data.clear_devices()
+        tenant = self._tenants[name] = Tenant(name, config, data)
+        TENANT_LOADS.inc()
+        TENANTS_LOADED.set(len(self._tenants))
+        return tenant
+
+    def _lru_idle(self, count: int):
+        idle = sorted((t for t in self._tenants.values() if t.active == 0), key=lambda t: t.last_used)
+        return idle[:count]
+
+    async def _evict(self, tenants, force: bool = False):
+        for tenant in tenants:
+            if (tenant.active and not force) or self._tenants.get(tenant.name) is not tenant:
+                continue
+            del self._tenants[tenant.name]
+            done = self._evicting[tenant.name] = asyncio.get_running_loop().create_future()
+            try:
+                await tenant.data.stop()
+                snap = tenant.data.current
+                extra = tenant.data.extra_records()
+                saved = False
+                if self._persist:
+                    try:
+                        await asyncio.to_thread(backup.save, snap, str(self.state_path(tenant.name)), extra)
+                        saved = True
+                    except OSError as e:
+                        logging.error(f"Cannot save tenant state for {tenant.name}: {e}")
+                if not saved:
+                    self._parked[tenant.name] = (snap.status_id, snap.private, snap.switch_count)
+            finally:
+                del self._evicting[tenant.name]
+                done.set_result(None)
+            TENANT_EVICTIONS.inc()
+        TENANTS_LOADED.set(len(self._tenants))
+
+    async def evict_idle(self, now: Optional[float] = None):
+        """卸载空闲超时的租户"""
+        deadline = (now or time.monotonic()) - self.settings.idle_timeout
+        await self._evict([t for t in self._tenants.values() if t.active == 0 and t.last_used <= deadline])
+
+    async def _sweep_loop(self):
+        interval = max(1.0, self.settings.idle_timeout / 4)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict_idle()
+            except Exception:
+                logging.exception("Tenant eviction failed")
+
+    async def start(self):
+        if self.enabled and self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        await self._evict(list(self._tenants.values()), force=True)
+
+
+class TenantMiddleware:
+    """纯 ASGI 中间件：按路径前缀 / Host 确定租户，并在请求期间持有它（防止被卸载）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        from main import tenant_registry as registry
+
+        if not registry.enabled:
+            return await self.app(scope, receive, send)
+        name, path = registry.resolve(scope)
+        if name is None:
+            return await self.app(scope, receive, send)
+
+        if not path.startswith(TENANT_ROUTES):
+            return await _error(send, 404, "Not Found")
+        try:
+            tenant = await registry.acquire(name)
+        except TenantError as e:
+            return await _error(send, 404, str(e))
+        try:
+            # 与 Mount 相同: path 保持完整，租户前缀并入 root_path，路由按剩余部分匹配
+            # 原地修改 scope，外层的指标中间件才能看到路由匹配结果
+            scope["root_path"] = scope.get("root_path", "") + get_route_path(scope)[: -len(path)]
+            scope["tenant"] = tenant
+            await self.app(scope, receive, send)
+        finally:
+            registry.release(tenant)
+
+
+async def _error(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# ---- 依赖项：按请求所属租户取配置和数据 ----
+
+def request_config(request: Request) -> AppConfig:
+    tenant = request.scope.get("tenant")
+    return tenant.config if tenant is not None else get_config()
+
+
+def request_data(request: Request) -> Data:
+    tenant = request.scope.get("tenant")
+    if tenant is not None:
+        return tenant.data
+    from main import data_store
+
+    return data_store
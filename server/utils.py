@@ -1,20 +1,40 @@
 from fastapi import Depends, Header, Security, HTTPException
 from fastapi.security import APIKeyQuery, APIKeyHeader
-from config import get_config
+from tenants import request_config
 
 # 声明 secret
 api_key_query = APIKeyQuery(name="secret", auto_error=False)
 
 
+def _pick_secret(secret_from_query, secret_from_header, authorization):
+    if secret_from_query or secret_from_header:
+        return secret_from_query or secret_from_header
+    if authorization and authorization.startswith("Bearer "):
+        return authorization[7:]
+    return None
+
+
 async def verify_secret(
     secret_from_query: str = Security(api_key_query),
-    config=Depends(get_config),
+    config=Depends(request_config),
     secret_from_header: str = Header(None, alias="X-Secret"),
+    authorization: str = Header(None),
 ):
-    secret = secret_from_query or secret_from_header
+    secret = _pick_secret(secret_from_query, secret_from_header, authorization)
     if not secret or secret != config.main.secret:
         raise HTTPException(
             status_code=403,
             detail="Secret is invalid or missing, make sure include it in URL:\"?=secret\" or Header:\"X-Secret: <secret>\"",
         )
     return True
+
+
+async def is_authenticated(
+    secret_from_query: str = Security(api_key_query),
+    config=Depends(request_config),
+    secret_from_header: str = Header(None, alias="X-Secret"),
+    authorization: str = Header(None),
+) -> bool:
+    """可选鉴权：不抛出异常，只返回请求是否携带了正确的 secret"""
+    secret = _pick_secret(secret_from_query, secret_from_header, authorization)
+    return bool(secret) and secret == config.main.secret
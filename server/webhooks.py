@@ -0,0 +1,412 @@
+"""
+Webhook 推送
+
+Data 的事件（状态切换、隐私模式、删除设备等）通过监听者进入 WebhookDispatcher。
+on_event() 只把事件放进各目标的缓冲区，不做任何 IO，不会拖慢写入任务和 SSE 广播。
+
+- 合并: 每个目标一个发送任务，收到事件后等待 coalesce 秒，把窗口内的事件合并为一次推送
+- 连接: httpclient.ConnectionPool 复用 keep-alive 连接
+- 重试: 失败（网络错误 / 超时 / 5xx / 408 / 429）的推送进入有界的重试队列，按指数退避 + 抖动重试；
+  其余 4xx 视为接收方拒绝，不再重试。配置 webhooks.queue_file 时队列以追加日志写入文件，
+  关闭时尚未发出的事件也写入其中，重启后继续推送
+- 签名: X-Sleepy-Signature: sha256=<hex>，为 HMAC-SHA256(secret, "<X-Sleepy-Timestamp>." + 请求体)
+
+请求体:
+    {"target": "bot", "delivery": "<id>", "events": [{"event": "status_updated", "version": 42, "status": {...}, ...}]}
+重试的推送可能晚于之后的推送到达，接收方可按 version 丢弃过期的事件。
+follower 不推送（由 leader 推送），租户的事件也不推送。
+"""
+
+import asyncio
+import hashlib
+import heapq
+import hmac
+import json
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from encoding import dumps
+from httpclient import ConnectionPool
+from metrics import counter, gauge, histogram
+
+WEBHOOK_DELIVERIES = counter("sleepy_webhook_deliveries", "Webhook delivery attempts by result", ("target", "result"))
+WEBHOOK_LATENCY = histogram("sleepy_webhook_latency_seconds", "Webhook request round trip", ("target",))
+WEBHOOK_DELAY = histogram(
+    "sleepy_webhook_delay_seconds",
+    "Oldest event's publish to successful delivery, including coalescing and retries",
+    ("target",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+WEBHOOK_DROPPED = counter("sleepy_webhook_dropped", "Webhook deliveries given up", ("target", "reason"))
+WEBHOOK_RETRY_QUEUE = gauge("sleepy_webhook_retry_queue", "Webhook deliveries waiting for retry")
+
+USER_AGENT = "sleepy-webhook/1"
+
+
+def sign(secret: str, timestamp: str, body: bytes) -> str:
+    digest = hmac.new(secret.encode("utf-8"), timestamp.encode("ascii") + b"." + body, hashlib.sha256)
+    return "sha256=" + digest.hexdigest()
+
+
+def _retryable(status: int) -> bool:
+    return status >= 500 or status in (408, 429)
+
+
+class RetryQueue:
+    """
+    待重试的推送，按到期时间取出；超过 max_items 时淘汰最旧的
+
+    path 不为空时持久化为追加日志（每行 {"op": "add", "item": {...}} 或 {"op": "done", "id": ...}），
+    加载时重放并压缩。只有推送失败时才写文件，正常情况下没有磁盘 IO。
+    """
+
+    def __init__(self, max_items: int, path: Optional[str] = None):
+        self.max_items = max_items
+        self.path = path
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._inflight: set = set()
+        self._file = None
+        self._lines = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def load(self):
+        if not self.path:
+            return
+        if os.path.isfile(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        continue  # 上次写到一半的行
+                    if op.get("op") == "add":
+                        self._items[op["item"]["id"]] = op["item"]
+                    elif op.get("op") == "done":
+                        self._items.pop(op.get("id"), None)
+            for item_id, item in self._items.items():
+                heapq.heappush(self._heap, (item["due"], item_id))
+        self._compact()
+        WEBHOOK_RETRY_QUEUE.set(len(self._items))
+
+    def _compact(self):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for item in self._items.values():
+                f.write(json.dumps({"op": "add", "item": item}, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._lines = len(self._items)
+
+    def _journal(self, op: Dict[str, Any]):
+        if self._file is None:
+            return
+        self._file.write(json.dumps(op, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._lines += 1
+        if self._lines > 2 * len(self._items) + 1000:
+            self._compact()
+
+    def put(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """加入或更新一项，返回因队列已满被淘汰的项"""
+        evicted = None
+        if item["id"] not in self._items and len(self._items) >= self.max_items:
+            oldest = next((i for i in self._items if i not in self._inflight), None)
+            if oldest is not None:
+                evicted = self._items[oldest]
+                self.remove(oldest)
+        self._items[item["id"]] = item
+        self._inflight.discard(item["id"])
+        heapq.heappush(self._heap, (item["due"], item["id"]))
+        self._journal({"op": "add", "item": item})
+        WEBHOOK_RETRY_QUEUE.set(len(self._items))
+        return evicted
+
+    def remove(self, item_id: str):
+        if self._items.pop(item_id, None) is not None:
+            self._journal({"op": "done", "id": item_id})
+        self._inflight.discard(item_id)
+        WEBHOOK_RETRY_QUEUE.set(len(self._items))
+
+    def _top(self) -> Optional[Tuple[float, str]]:
+        # 堆中过期的项（已删除 / 已重新安排 / 正在重试）惰性丢弃
+        while self._heap:
+            due, item_id = self._heap[0]
+            item = self._items.get(item_id)
+            if item is not None and item["due"] == due and item_id not in self._inflight:
+                return due, item_id
+            heapq.heappop(self._heap)
+        return None
+
+    def next_due(self) -> Optional[float]:
+        top = self._top()
+        return top[0] if top else None
+
+    def take_due(self, now: float) -> List[Dict[str, Any]]:
+        """取出已到期的项（直到 put / remove 之前不会再次取出）"""
+        out = []
+        while True:
+            top = self._top()
+            if top is None or top[0] > now:
+                return out
+            heapq.heappop(self._heap)
+            self._inflight.add(top[1])
+            out.append(self._items[top[1]])
+
+    def release(self, item_id: str):
+        """把 take_due 取出、但未能处理完的项放回队列，按原到期时间再次取出"""
+        item = self._items.get(item_id)
+        if item is not None and item_id in self._inflight:
+            self._inflight.discard(item_id)
+            heapq.heappush(self._heap, (item["due"], item_id))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _Target:
+    __slots__ = ("settings", "pending", "wake")
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.pending: List[Dict[str, Any]] = []
+        self.wake = asyncio.Event()
+
+
+class WebhookDispatcher:
+    def __init__(self, config):
+        self.settings = config.webhooks
+        self._status_list = config.status.status_list
+        self.targets = {t.name: _Target(t) for t in self.settings.targets}
+        self.pool = ConnectionPool(self.settings.pool_size)
+        self.queue = RetryQueue(self.settings.queue_size, self.settings.queue_file)
+        self._retry_wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._closing = False
+        self.queue.load()
+        if len(self.queue):
+            logging.info(f"Resuming {len(self.queue)} pending webhook deliveries")
+        for target in self.targets.values():
+            self._tasks.append(asyncio.create_task(self._send_loop(target)))
+        self._tasks.append(asyncio.create_task(self._retry_loop()))
+
+    async def stop(self):
+        """停止发送；尚未发出的事件放入重试队列（配置了 queue_file 时下次启动继续推送）"""
+        tasks, self._tasks = self._tasks, []
+        # 请求恰好完成时 wait_for 可能吞掉取消（Python < 3.12），循环同时检查 _closing
+        self._closing = True
+        for target in self.targets.values():
+            target.wake.set()
+        self._retry_wake.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for target in self.targets.values():
+            while target.pending:
+                delivery, body, applied_at = self._take_batch(target)
+                self._schedule(target.settings.name, delivery, body, applied_at, attempts=0, due=time.time())
+        self.pool.close()
+        self.queue.close()
+
+    # ---- 事件入口（Data 监听者） ----
+
+    async def on_event(self, payload: Dict[str, Any]):
+        event = payload.get("event")
+        item = None
+        for target in self.targets.values():
+            if event in target.settings.events:
+                if item is None:
+                    item = self._event_body(payload)
+                target.pending.append(item)
+                target.wake.set()
+
+    def _event_body(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        item = dict(payload)
+        status_id = item.get("status_id")
+        if status_id is not None and 0 <= status_id < len(self._status_list):
+            item["status"] = self._status_list[status_id].model_dump()
+        return item
+
+    # ---- 发送 ----
+
+    def _take_batch(self, target: _Target) -> Tuple[str, str, float]:
+        """-> (delivery id, 请求体, 最早事件的发布时间)"""
+        limit = target.settings.max_batch
+        batch, target.pending = target.pending[:limit], target.pending[limit:]
+        delivery = os.urandom(8).hex()
+        body = dumps({"target": target.settings.name, "delivery": delivery, "events": batch}).decode("utf-8")
+        applied_at = min((e.get("applied_at") or time.time() for e in batch), default=time.time())
+        return delivery, body, applied_at
+
+    async def _send_loop(self, target: _Target):
+        while not self._closing:
+            try:
+                await self._send_pending(target)
+            except Exception:
+                # 不能让一个异常永久停掉该目标的推送: 记录后稍等再继续（未发出的事件仍在 pending 中）
+                logging.exception(f"Webhook {target.settings.name} send loop failed")
+                await asyncio.sleep(self.settings.retry_base)
+                target.wake.set()
+
+    async def _send_pending(self, target: _Target):
+        await target.wake.wait()
+        # 合并窗口: 窗口内的后续事件一起发出
+        await asyncio.sleep(target.settings.coalesce)
+        target.wake.clear()
+        while target.pending and not self._closing:
+            delivery, body, applied_at = self._take_batch(target)
+            try:
+                result = await self._attempt(target.settings, delivery, body, applied_at, attempt=1)
+            except asyncio.CancelledError:
+                # 关闭时正在发送: 不确定对方是否收到，按未发送处理（接收方可按 delivery 去重）
+                self._schedule(target.settings.name, delivery, body, applied_at, attempts=0, due=time.time())
+                raise
+            if result == "retry":
+                self._schedule(target.settings.name, delivery, body, applied_at, attempts=1)
+
+    async def _attempt(self, settings, delivery: str, body: str, applied_at: float, attempt: int) -> str:
+        """推送一次 -> "ok" / "retry" / "rejected" """
+        raw = body.encode("utf-8")
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": USER_AGENT,
+            "X-Sleepy-Delivery": delivery,
+            "X-Sleepy-Attempt": str(attempt),
+            "X-Sleepy-Timestamp": timestamp,
+        }
+        if settings.secret:
+            headers["X-Sleepy-Signature"] = sign(settings.secret, timestamp, raw)
+        name = settings.name
+        started = time.perf_counter()
+        try:
+            status, _, _ = await asyncio.wait_for(
+                self.pool.request(settings.url, "POST", raw, headers), self.settings.timeout
+            )
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            WEBHOOK_DELIVERIES.labels(name, "error").inc()
+            # 只记录第一次失败，之后的重试见指标
+            log = logging.warning if attempt == 1 else logging.debug
+            log(f"Webhook {name} delivery {delivery} attempt {attempt} failed: {e!r}")
+            return "retry"
+        except Exception:
+            # 意料之外的错误（如客户端的 bug）也按失败重试，不让发送 / 重试任务退出
+            WEBHOOK_DELIVERIES.labels(name, "error").inc()
+            logging.exception(f"Webhook {name} delivery {delivery} attempt {attempt} failed")
+            return "retry"
+        WEBHOOK_LATENCY.labels(name).observe(time.perf_counter() - started)
+        if 200 <= status < 300:
+            WEBHOOK_DELIVERIES.labels(name, "ok").inc()
+            WEBHOOK_DELAY.labels(name).observe(max(0.0, time.time() - applied_at))
+            return "ok"
+        WEBHOOK_DELIVERIES.labels(name, str(status)).inc()
+        if _retryable(status):
+            log = logging.warning if attempt == 1 else logging.debug
+            log(f"Webhook {name} delivery {delivery} attempt {attempt}: HTTP {status}")
+            return "retry"
+        logging.error(f"Webhook {name} rejected delivery {delivery}: HTTP {status}")
+        WEBHOOK_DROPPED.labels(name, "rejected").inc()
+        return "rejected"
+
+    # ---- 重试 ----
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.settings.retry_max, self.settings.retry_base * 2 ** max(0, attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _schedule(
+        self, name: str, delivery: str, body: str, applied_at: float, attempts: int, due: Optional[float] = None,
+    ):
+        item = {
+            "id": delivery,
+            "target": name,
+            "body": body,
+            "applied_at": applied_at,
+            "attempts": attempts,
+            "due": due if due is not None else time.time() + self._backoff(attempts),
+        }
+        evicted = self.queue.put(item)
+        if evicted is not None:
+            WEBHOOK_DROPPED.labels(evicted["target"], "queue_full").inc()
+        self._retry_wake.set()
+
+    async def _retry_loop(self):
+        while not self._closing:
+            try:
+                await self._retry_due()
+            except Exception:
+                logging.exception("Webhook retry loop failed")
+                await asyncio.sleep(self.settings.retry_base)
+
+    async def _retry_due(self):
+        """等到最早的重试到期（或被唤醒），然后重试全部到期项"""
+        due = self.queue.next_due()
+        self._retry_wake.clear()
+        if due is None or due > time.time():
+            timeout = None if due is None else due - time.time()
+            try:
+                await asyncio.wait_for(self._retry_wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return
+        by_target: Dict[str, List[Dict[str, Any]]] = {}
+        for item in self.queue.take_due(time.time()):
+            by_target.setdefault(item["target"], []).append(item)
+        # 不同目标并行重试，同一目标按到期顺序依次重试；一个目标出错不影响其他目标
+        results = await asyncio.gather(
+            *(self._retry_target(name, items) for name, items in by_target.items()), return_exceptions=True
+        )
+        failed = False
+        for (name, items), result in zip(by_target.items(), results):
+            if isinstance(result, Exception):
+                failed = True
+                logging.error(f"Webhook {name} retry failed: {result!r}")
+                # 出错时尚未处理的项放回队列（已处理的项不在 inflight 中，release 不影响）
+                for item in items:
+                    self.queue.release(item["id"])
+        if failed:
+            await asyncio.sleep(self.settings.retry_base)
+
+    async def _retry_target(self, name: str, items: List[Dict[str, Any]]):
+        target = self.targets.get(name)
+        for item in items:
+            if self._closing:
+                return  # 留在队列中，下次启动继续
+            if target is None:
+                WEBHOOK_DROPPED.labels(name, "unknown_target").inc()
+                self.queue.remove(item["id"])
+                continue
+            attempts = item["attempts"] + 1
+            result = await self._attempt(target.settings, item["id"], item["body"], item["applied_at"], attempts)
+            if result != "retry":
+                self.queue.remove(item["id"])
+            elif attempts >= self.settings.max_attempts:
+                WEBHOOK_DROPPED.labels(name, "attempts").inc()
+                logging.error(f"Webhook {name} delivery {item['id']} dropped after {attempts} attempts")
+                self.queue.remove(item["id"])
+            else:
+                self._schedule(name, item["id"], item["body"], item["applied_at"], attempts)
+
+
+async def start_webhooks(data, config) -> Optional[WebhookDispatcher]:
+    """lifespan 启动阶段: 配置了 webhooks.targets 时开始推送主实例的事件（follower 不推送）"""
+    if not config.webhooks.targets or config.replication.role == "follower":
+        return None
+    dispatcher = WebhookDispatcher(config)
+    await dispatcher.start()
+    data.add_listener(dispatcher.on_event)
+    return dispatcher
@@ -0,0 +1,15 @@
+"""
+测试复用 bench/ 的进程内 ASGI / 本地 uvicorn 驱动（bench.common），
+服务端模块以顶层名导入，与基准测试相同
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.common import setup_path  # noqa: E402
+
+setup_path()
@@ -0,0 +1,32 @@
+"""单写者: 多个客户端同时上报同一组设备（含并发的首次上报）时不丢失更新、不产生重复设备"""
+
+import asyncio
+
+from bench.actor import _check, _drive
+from bench.common import Target, load_secret
+
+WORKERS = 32
+DEVICES = 64
+REPORTS = 200
+
+
+async def _run(path: str, listing: str, prefix: str):
+    async with Target("asgi", load_secret()) as target:
+        report = path.format(secret=target.secret)
+        _, _, history = await _drive(target, report, WORKERS, DEVICES, REPORTS, prefix=prefix)
+        sess = await target.session()
+        r = await sess.request("GET", listing.format(secret=target.secret))
+        await sess.close()
+        return _check(r.json()["device"], history)
+
+
+def test_single_writer_keeps_every_update():
+    lost, duplicates = asyncio.run(_run("/api/device/report/?secret={secret}", "/api/status/query?secret={secret}", "actor"))
+    assert (lost, duplicates) == (0, 0)
+
+
+def test_check_detects_legacy_race():
+    # 旧版在查找与写入之间被切换线程时，并发的首次上报会追加重复设备，重复项此后不再更新（丢失）
+    lost, duplicates = asyncio.run(_run("/__bench/legacy_report?preempt=1&secret={secret}", "/__bench/legacy_devices", "legacy"))
+    assert duplicates > 0
+    assert lost > 0
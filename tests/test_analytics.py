@@ -0,0 +1,27 @@
+"""应用使用时长: 没有上报 is_active（Unknown）的设备也计入统计，明确未在使用时结束区间"""
+
+from analytics import AppAnalytics
+from config import get_config
+from models.device_status import DeviceStatus
+from records import DeviceRecord
+
+START = 1_760_000_000.0
+
+
+def _report(analytics: AppAnalytics, offset: float, app: str, **fields):
+    status = DeviceStatus(device_id="pc", device_name="PC", timestamp=START + offset, active_app={"name": app}, **fields)
+    analytics.observe(DeviceRecord.from_report(status, START + offset))
+
+
+def test_reports_without_is_active_are_counted():
+    analytics = AppAnalytics(get_config().analytics)
+    for offset in range(0, 600, 60):
+        _report(analytics, offset, "Code.exe")
+    _report(analytics, 600, "Chrome.exe")
+    _report(analytics, 900, "Chrome.exe", is_active="Locked")
+
+    now = START + 3600
+    first, last = analytics.day_of(START), analytics.day_of(now)
+    assert analytics.apps(first, last, now) == {"Code.exe": 600.0, "Chrome.exe": 300.0}
+    assert analytics.apps(first, last, now, device="pc") == {"Code.exe": 600.0, "Chrome.exe": 300.0}
+    assert sum(sum(hours) for hours in analytics.heatmap(first, last, now).values()) == 900.0
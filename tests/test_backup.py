@@ -0,0 +1,62 @@
+"""状态导入: status 记录中不合法的数值报 BackupFormatError，损坏的状态文件改名为 .bad 后以空状态启动"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+import backup
+from config import get_config
+from data import Data
+from lifecycle import warm_start
+
+
+def _export(**status) -> bytes:
+    lines = [
+        {"type": "header", "format": backup.FORMAT, "version": backup.VERSION, "devices": 0},
+        {"type": "status", "status_id": 0, "private": False, **status},
+        {"type": "end", "devices": 0},
+    ]
+    return b"".join(json.dumps(line).encode() + b"\n" for line in lines)
+
+
+async def _chunks(body: bytes):
+    yield body
+
+
+def _import(body: bytes):
+    config = get_config()
+    return asyncio.run(backup.import_stream(Data(config, report_metrics=False), _chunks(body), len(config.status.status_list)))
+
+
+@pytest.mark.parametrize("field, value", [
+    ("switch_count", "abc"),
+    ("switch_count", [1]),
+    ("switch_count", True),
+    ("switch_count", 1.5),
+    ("last_updated", "abc"),
+    ("last_updated", float("inf")),
+    ("version", {"a": 1}),
+    ("version", -1),
+])
+def test_invalid_status_numbers(field, value):
+    with pytest.raises(backup.BackupFormatError, match=f"line 2: invalid {field}"):
+        _import(_export(**{field: value}))
+
+
+def test_valid_status_numbers():
+    result = _import(_export(switch_count=3, last_updated=1751782809, version=7))
+    assert result["status"] is True
+
+
+def test_corrupt_state_file_is_set_aside(tmp_path):
+    path = str(tmp_path / "state.ndjson")
+    with open(path, "wb") as f:
+        f.write(_export(switch_count="abc"))
+    config = get_config()
+    config = config.model_copy(update={"main": config.main.model_copy(update={"state_file": path})})
+    data = Data(config, report_metrics=False)
+    assert asyncio.run(warm_start(data, config)) is False
+    assert not os.path.exists(path) and os.path.exists(path + ".bad")
+    assert len(data.current.devices) == 0
@@ -0,0 +1,50 @@
+"""/api/status/query 的未排序分页: 翻页期间删除 / 清空设备时游标仍然有效"""
+
+import asyncio
+
+from bench.common import Target, load_secret
+from bench.hot_paths import report_body
+
+DEVICES = 4000
+LIMIT = 500
+
+
+async def _page(sess, secret: str, cursor: int):
+    r = await sess.request("GET", f"/api/status/query?fields=id&limit={LIMIT}&cursor={cursor}&secret={secret}")
+    assert r.status == 200, r.body
+    body = r.json()
+    return [d["id"] for d in body["device"]], body["next_cursor"]
+
+
+async def _scenario(secret: str):
+    async with Target("asgi", secret) as target:
+        sess = await target.session()
+        for i in range(DEVICES):
+            r = await sess.request("POST", f"/api/device/report/?secret={secret}", report_body(f"p-{i:04d}", i))
+            assert r.status == 200, r.body
+
+        seen, cursor = [], 0
+        for _ in range(DEVICES // LIMIT // 2 + 1):
+            ids, cursor = await _page(sess, secret, cursor)
+            seen += ids
+        # 删除已经翻过的一半设备（足以触发释放空块），剩下的页不应跳过或重复
+        for prefix in ("p-0", "p-1"):
+            r = await sess.request("GET", f"/api/device/remove_prefix?prefix={prefix}&secret={secret}")
+            assert r.status == 200, r.body
+        while cursor is not None:
+            ids, cursor = await _page(sess, secret, cursor)
+            seen += ids
+        assert seen == [f"p-{i:04d}" for i in range(DEVICES)]
+
+        # 清空后用清空前的游标继续翻页: 只看到清空后新上报的设备
+        _, cursor = await _page(sess, secret, 0)
+        r = await sess.request("GET", f"/api/device/clear?secret={secret}")
+        assert r.status == 200, r.body
+        r = await sess.request("POST", f"/api/device/report/?secret={secret}", report_body("after-clear", 0))
+        assert r.status == 200, r.body
+        ids, _ = await _page(sess, secret, cursor)
+        assert ids == ["after-clear"]
+
+
+def test_cursor_survives_removals_and_clear():
+    asyncio.run(_scenario(load_secret()))
@@ -0,0 +1,67 @@
+"""主从复制: 一个 leader + 两个本机 uvicorn follower 子进程（见 bench/replication.py）"""
+
+import asyncio
+
+from bench.common import load_secret
+from bench.hot_paths import report_body
+from bench.replication import _devices, _Node, _status, _wait_version
+
+DEVICES = 200
+
+
+async def _report(conn, secret: str, start: int, stop: int):
+    for i in range(start, stop):
+        r = await conn.request("POST", f"/api/device/report/?secret={secret}", report_body(f"dev-{i}", i))
+        assert r.status == 200, r.body
+
+
+async def _converged(leader, followers, secret: str):
+    """等所有 follower 追上 leader 当前版本，并与 leader 的设备列表、状态完全一致"""
+    version = (await _status(leader, secret))["version"]
+    expected = await _devices(leader, secret)
+    for conn in followers:
+        await _wait_version(conn, secret, version)
+        assert await _devices(conn, secret) == expected
+    return expected
+
+
+async def _scenario(secret: str):
+    auth = {"X-Secret": secret}
+    with _Node("leader") as leader, _Node("follower", leader.url) as f1, _Node("follower", leader.url) as f2:
+        lconn = await leader.connection()
+        c1, c2 = await f1.connection(), await f2.connection()
+
+        # 上报 + 切换状态后两个 follower 收敛
+        await _report(lconn, secret, 0, DEVICES)
+        r = await lconn.request("GET", "/api/status/set?status=1", headers=auth)
+        assert r.status == 200, r.body
+        expected = await _converged(lconn, [c1, c2], secret)
+        assert len(expected[2]) == DEVICES and expected[1] == 1
+
+        # follower 只读: 上报与切换状态都返回 409，且不改变 follower 的数据
+        for conn in (c1, c2):
+            r = await conn.request("POST", f"/api/device/report/?secret={secret}", report_body("rogue", 0))
+            assert r.status == 409, r.status
+            r = await conn.request("GET", "/api/status/set?status=0", headers=auth)
+            assert r.status == 409, r.status
+            assert await _devices(conn, secret) == expected
+
+        # 停掉 f2，期间 leader 继续写入；重启后 f2 追上，之后的写入也照常同步
+        await c2.close()
+        f2.__exit__()
+        await _report(lconn, secret, DEVICES, DEVICES * 2)
+        r = await lconn.request("GET", "/api/status/set?status=0", headers=auth)
+        assert r.status == 200, r.body
+        f2.__enter__()
+        c2 = await f2.connection()
+        expected = await _converged(lconn, [c1, c2], secret)
+        assert len(expected[2]) == DEVICES * 2 and expected[1] == 0
+        await _report(lconn, secret, 0, 10)
+        await _converged(lconn, [c1, c2], secret)
+
+        for conn in (lconn, c1, c2):
+            await conn.close()
+
+
+def test_followers_converge_catch_up_and_reject_writes():
+    asyncio.run(_scenario(load_secret()))
@@ -0,0 +1,38 @@
+"""历史全文检索: 单个汉字匹配 bigram 的任意位置（活动段、封存段、合并后的段）"""
+
+import pytest
+
+from config import get_config
+from history import HistoryStore, Query, merge_segments
+
+TITLES = ["腾讯会议", "开会", "会", "议程", "Weekly sync 会议室", "微信"]
+
+
+def _store(stage: str) -> HistoryStore:
+    store = HistoryStore(get_config().history)
+    for ts, title in enumerate(TITLES):
+        store.add(float(ts), "pc", "app", title, True)
+    if stage != "active":
+        store.sealed.append(store.active.seal())
+        store.active = type(store.active)()
+    if stage == "merged":
+        store.sealed = [merge_segments(store.sealed)]
+    return store
+
+
+def _titles(store: HistoryStore, q: str):
+    return sorted(e["title"] for e in store.search(Query(q)))
+
+
+@pytest.mark.parametrize("stage", ["active", "sealed", "merged"])
+def test_single_cjk_char_matches_either_position(stage):
+    store = _store(stage)
+    assert _titles(store, "议") == sorted(["腾讯会议", "议程", "Weekly sync 会议室"])
+    assert _titles(store, "会") == sorted(["腾讯会议", "开会", "会", "Weekly sync 会议室"])
+    assert _titles(store, "会*") == _titles(store, "会")
+    assert _titles(store, '"议"') == _titles(store, "议")
+    assert _titles(store, "会 weekly") == ["Weekly sync 会议室"]
+    assert _titles(store, "会议") == sorted(["腾讯会议", "Weekly sync 会议室"])
+    assert _titles(store, "程") == ["议程"]
+    assert _titles(store, "室 议") == ["Weekly sync 会议室"]
+    assert _titles(store, "饭") == []
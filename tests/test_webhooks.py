@@ -0,0 +1,130 @@
+"""Webhook 推送: 合并、签名、重试退避、持久化队列重放与不合规的响应（本地接收端见 bench/webhooks.py）"""
+
+import asyncio
+import time
+
+import pytest
+
+from bench.webhooks import SECRET, Receiver
+from config import get_config
+from config.schema import WebhookTarget
+from httpclient import read_head
+from webhooks import WebhookDispatcher
+
+
+def _dispatcher(receiver: Receiver, coalesce: float = 0.05, queue_file=None) -> WebhookDispatcher:
+    config = get_config()
+    settings = config.webhooks.model_copy(update={
+        "targets": [WebhookTarget(name="test", url=receiver.url, secret=SECRET, coalesce=coalesce, max_batch=1000)],
+        "timeout": 2,
+        "retry_base": 0.05,
+        "retry_max": 0.4,
+        "queue_file": queue_file,
+    })
+    return WebhookDispatcher(config.model_copy(update={"webhooks": settings}))
+
+
+def _event(n: int):
+    return {"event": "status_updated", "status_id": 0, "version": n, "applied_at": time.time()}
+
+
+async def _until(cond, timeout: float = 10):
+    deadline = time.time() + timeout
+    while not cond():
+        assert time.time() < deadline, "webhook deliveries did not arrive in time"
+        await asyncio.sleep(0.01)
+
+
+def _run(scenario):
+    async def main():
+        receiver = await Receiver().start()
+        try:
+            await scenario(receiver)
+        finally:
+            await receiver.close()
+    asyncio.run(main())
+
+
+def test_coalesce_and_sign():
+    async def scenario(receiver):
+        dispatcher = _dispatcher(receiver, coalesce=0.3)
+        await dispatcher.start()
+        for n in range(20):
+            await dispatcher.on_event(_event(n))
+        await _until(lambda: len(receiver.events()) == 20)
+        await dispatcher.stop()
+        assert len(receiver.deliveries) == 1
+        assert [e["version"] for e in receiver.events()] == list(range(20))
+        assert receiver.deliveries[0][1]["events"][0]["status"]["id"] == 0
+        assert receiver.bad_signatures == 0
+    _run(scenario)
+
+
+def test_retry_with_backoff():
+    async def scenario(receiver):
+        receiver.fail_until = time.time() + 0.6
+        dispatcher = _dispatcher(receiver)
+        await dispatcher.start()
+        await dispatcher.on_event(_event(1))
+        await _until(lambda: receiver.events())
+        await dispatcher.stop()
+        assert [e["version"] for e in receiver.events()] == [1]
+        # 第一次推送 + 至少两次重试都失败，重试间隔按指数增长（抖动为 0.5 ~ 1 倍，相邻两次不会变短）
+        gaps = [b - a for a, b in zip(receiver.failures, receiver.failures[1:])]
+        assert len(gaps) >= 2
+        assert all(later >= earlier * 0.8 for earlier, later in zip(gaps, gaps[1:])), gaps
+        assert max(gaps) <= 0.4 + 0.1
+    _run(scenario)
+
+
+def test_durable_queue_replayed_after_restart(tmp_path):
+    queue_file = str(tmp_path / "webhooks.queue")
+
+    async def scenario(receiver):
+        receiver.fail_until = float("inf")
+        dispatcher = _dispatcher(receiver, queue_file=queue_file)
+        await dispatcher.start()
+        for n in range(3):
+            await dispatcher.on_event(_event(n))
+        await _until(lambda: receiver.failures)
+        await dispatcher.stop()
+
+        receiver.fail_until = 0
+        dispatcher = _dispatcher(receiver, queue_file=queue_file)
+        await dispatcher.start()
+        await _until(lambda: len(receiver.events()) == 3)
+        await _until(lambda: len(dispatcher.queue) == 0)
+        await dispatcher.stop()
+        assert sorted(e["version"] for e in receiver.events()) == [0, 1, 2]
+    _run(scenario)
+
+
+@pytest.mark.parametrize("reply", [b"HTTP/1.1\r\n\r\n", b"garbage\r\n\r\n", b"HTTP/1.1 abc OK\r\n\r\n"])
+def test_malformed_response_is_retried(reply):
+    async def scenario(receiver):
+        receiver.reply = reply
+        dispatcher = _dispatcher(receiver)
+        await dispatcher.start()
+        await dispatcher.on_event(_event(1))
+        await _until(lambda: len(dispatcher.queue) == 1)
+        # 发送和重试任务都还在运行，接收端恢复后照常送达
+        assert not any(task.done() for task in dispatcher._tasks)
+        receiver.reply = None
+        await dispatcher.on_event(_event(2))
+        await _until(lambda: sorted(e["version"] for e in receiver.events()) == [1, 2])
+        assert not any(task.done() for task in dispatcher._tasks)
+        await dispatcher.stop()
+    _run(scenario)
+
+
+def test_read_head_rejects_malformed_status_line():
+    async def head(raw: bytes):
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await read_head(reader)
+
+    assert asyncio.run(head(b"HTTP/1.1 204 No Content\r\nX-A: 1\r\n\r\n")) == (204, {"x-a": "1"})
+    for raw in (b"HTTP/1.1\r\n\r\n", b"HTTP/1.1 20 OK\r\n\r\n", b"SSH-2.0-OpenSSH\r\n\r\n"):
+        with pytest.raises(ValueError):
+            asyncio.run(head(raw))